@@ -25,7 +25,9 @@ def run_invoice_validation_as_module(invoice_py_path: str) -> None:
     spec = importlib.util.spec_from_file_location("invoice_mod", p)
     mod = importlib.util.module_from_spec(spec)  # type: ModuleType
     spec.loader.exec_module(mod)
-    
+    # 스크립트는 __main__ 가드로 보호됨 (프로세스 풀 워커 재실행 방지) → 명시적 실행
+    mod.main()
+
     # 원본 검증 완료 후 Enhanced 처리가 필요한 경우
     print("[INFO] Invoice validation completed, applying enhanced processing...")
 
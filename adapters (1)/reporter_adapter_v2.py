@@ -10,6 +10,8 @@ import pandas as pd
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from hvdc_workbook_utils import validate_stage_headers
+
 # 기존 HVDC Excel Reporter 모듈 동적 로드
 import importlib.util
 spec = importlib.util.spec_from_file_location("hvdc_excel_reporter_final_sqm_rev",
@@ -53,27 +55,28 @@ def compute_flow_and_sqm_v2(hitachi_path: str, siemens_path: str) -> dict:
 
 def validate_file_paths(hitachi_path: str, siemens_path: str) -> dict:
     """
-    파일 경로 검증 및 통계
+    파일 경로 검증 및 통계 (+ 헤더 행 필수 컬럼 확인, 본문 미파싱)
     
     Returns:
-        dict: 파일 검증 결과
+        dict: 파일 검증 결과 (파일별 headers_ok / missing_columns 포함)
     """
-    hitachi_exists = Path(hitachi_path).exists()
-    siemens_exists = Path(siemens_path).exists()
+    result = {}
+    for key, path in (("hitachi_file", hitachi_path), ("siemens_file", siemens_path)):
+        exists = Path(path).exists()
+        headers = validate_stage_headers(path, "reporter") if exists else {}
+        result[key] = {
+            "path": path,
+            "exists": exists,
+            "size_mb": Path(path).stat().st_size / (1024*1024) if exists else 0,
+            "headers_ok": headers.get("headers_ok", False),
+            "missing_columns": headers.get("missing_columns", []),
+        }
+        if "error" in headers:
+            result[key]["error"] = headers["error"]
     
-    return {
-        "hitachi_file": {
-            "path": hitachi_path,
-            "exists": hitachi_exists,
-            "size_mb": Path(hitachi_path).stat().st_size / (1024*1024) if hitachi_exists else 0
-        },
-        "siemens_file": {
-            "path": siemens_path, 
-            "exists": siemens_exists,
-            "size_mb": Path(siemens_path).stat().st_size / (1024*1024) if siemens_exists else 0
-        },
-        "both_exist": hitachi_exists and siemens_exists
-    }
+    result["both_exist"] = result["hitachi_file"]["exists"] and result["siemens_file"]["exists"]
+    result["headers_ok"] = result["hitachi_file"]["headers_ok"] and result["siemens_file"]["headers_ok"]
+    return result
 
 if __name__ == "__main__":
     # 테스트 실행
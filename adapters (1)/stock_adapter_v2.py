@@ -11,6 +11,8 @@ import pandas as pd
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from hvdc_workbook_utils import read_workbook_meta, missing_columns, STOCK_SHEET_COLUMNS
+
 # 기존 STOCK.py 기반 분석 (있는 환경)
 import importlib.util
 spec = importlib.util.spec_from_file_location("stock", 
@@ -29,12 +31,16 @@ try:
 except Exception:
     HVDCUnifiedStockTracker = None
 
-def build_stock_snapshots_v2(stock_excel_path: str) -> Dict[str, Any]:
+def build_stock_snapshots_v2(stock_excel_path: str, write_summary: bool = False,
+                             parse_workers: int = 0) -> Dict[str, Any]:
     """
     Stock 스냅샷 v2 - 최신일자/타임라인 정보 보강
+    메모리 내 분석: 워크북 1회 파싱, 요약은 1회 생성, 파일 쓰기는 write_summary=True일 때만
     
     Args:
         stock_excel_path: Stock Excel 파일 경로
+        write_summary: True면 요약을 별도 파일(_onhand_summary.xlsx)로 저장
+        parse_workers: 시트 병렬 파싱 워커 수 (0/1이면 직렬)
     
     Returns:
         dict: {
@@ -45,14 +51,16 @@ def build_stock_snapshots_v2(stock_excel_path: str) -> Dict[str, Any]:
     """
     print(f"[INFO] Stock Adapter v2 - Loading: {stock_excel_path}")
     
-    # 1) 기존 파이프라인 유지 (analyze_hvdc_inventory + InventoryTracker)
-    print("[INFO] Running HVDC inventory analysis...")
-    analyze_hvdc_inventory(stock_excel_path, show_details=False)
-    
+    # 1) 재고 추적 분석 (InventoryTracker, 메모리 내)
     print("[INFO] Running inventory tracking analysis...")
-    tr = InventoryTracker(stock_excel_path)
-    tr.run_analysis()
-    summary_df = tr.create_summary()
+    tr = InventoryTracker(stock_excel_path, parse_workers=parse_workers)
+    summary_df = tr.analyze()
+    if summary_df is None:
+        summary_df = tr.create_summary()
+    
+    if write_summary:
+        print("[INFO] Writing stock summary workbook...")
+        tr.export_summary()
     
     print(f"[INFO] Stock summary created: {len(summary_df)} records")
     
@@ -149,31 +157,30 @@ def _create_basic_timeline(summary_df: pd.DataFrame) -> dict:
 
 def validate_stock_data(stock_excel_path: str) -> dict:
     """
-    Stock 데이터 검증
+    Stock 데이터 검증 (메타데이터만 읽음)
+    read_only 모드로 시트명·헤더만 확인하고 시트 본문은 파싱하지 않음
+    (행 수는 <dimension> 기준, 크기 정보가 없는 파일이면 None)
     
     Returns:
-        dict: 검증 결과
+        dict: 검증 결과 (sheet_stats[시트]에 missing_columns 포함)
     """
     try:
-        xl = pd.ExcelFile(stock_excel_path)
-        sheets = xl.sheet_names
-        
         # 주요 시트 확인
-        required_sheets = ['종합_SKU요약', '날짜별_추이', '월별_분석']
+        required_sheets = list(STOCK_SHEET_COLUMNS)
+        meta = read_workbook_meta(stock_excel_path, sheets=required_sheets, count_rows=False)
+        sheets = meta["sheet_names"]
         found_sheets = [s for s in required_sheets if s in sheets]
         
-        # 시트별 레코드 수
+        # 시트별 레코드 수 + 필수 컬럼
         sheet_stats = {}
         for sheet in found_sheets:
-            try:
-                df = xl.parse(sheet)
-                sheet_stats[sheet] = {
-                    "rows": len(df),
-                    "columns": len(df.columns),
-                    "columns_list": list(df.columns)
-                }
-            except Exception as e:
-                sheet_stats[sheet] = {"error": str(e)}
+            stats = meta["sheets"][sheet]
+            sheet_stats[sheet] = {
+                "rows": stats["rows"],
+                "columns": stats["columns"],
+                "columns_list": stats["columns_list"],
+                "missing_columns": missing_columns(stats["headers"], STOCK_SHEET_COLUMNS[sheet])
+            }
         
         return {
             "file_exists": Path(stock_excel_path).exists(),
@@ -181,6 +188,7 @@ def validate_stock_data(stock_excel_path: str) -> dict:
             "found_required_sheets": found_sheets,
             "sheet_stats": sheet_stats,
             "validation_passed": len(found_sheets) >= 2
+                and not any(s["missing_columns"] for s in sheet_stats.values())
         }
         
     except Exception as e:
@@ -22,6 +22,19 @@ INVOICE_MATCHING = {
         "max_combinations": 1000000,   # 조합 수 제한
         "timeout_seconds": 300         # 타임아웃 (5분)
     },
+    "multistart": {          # 대형 후보 풀 multi-start local search (vendor별 재시작 수/예산)
+        "default": {"restarts": 1, "seed": 0, "max_evals": None},  # max_evals None → max_combinations
+        "HE": {"restarts": 8},
+        "SIM": {"restarts": 8},
+        "workers": 0                   # 재시작 병렬 프로세스 수 (코드 단위 병렬 실행 시 직렬)
+    },
+    "fuzzy": {               # 후보 없음 시 퍼지 코드 fallback (n-gram blocking)
+        "enabled": False,
+        "threshold": 0.9,              # SequenceMatcher 유사도 하한
+        "top_k": 3,                    # 후보 풀에 넣을 최대 유사 코드 수
+        "ngram": 3,
+        "max_candidates": 50           # 코드당 채점할 최대 후보 수
+    },
     "validation": {
         "min_gw_threshold": 0.1,       # 최소 GW 임계값
         "min_cbm_threshold": 0.001,    # 최소 CBM 임계값
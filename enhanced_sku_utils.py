@@ -3,37 +3,20 @@ HVDC SKU Master Hub - Enhanced Utilities
 정확도·추적성·운영성·비용산정 개선을 위한 유틸리티 모음
 """
 
-import re
+import bisect
 import hashlib
+import heapq
 import json
 import pandas as pd
 import duckdb
-from typing import Dict, List, Optional, Tuple
-from itertools import combinations
 import numpy as np
 
+from hvdc_code_utils import normalize_sku, normalize_series  # noqa: F401 (normalize_sku 재노출)
+
 # =============================================================================
 # 1. SKU 키 정규화 & 조인 가드
 # =============================================================================
 
-def normalize_sku(s):
-    """
-    SKU 키 정규화: 대소문자·공백·선행 0·하이픈 표준화
-    
-    Args:
-        s: SKU 문자열
-        
-    Returns:
-        정규화된 SKU 문자열
-    """
-    if s is None: 
-        return None
-    s = str(s).strip().upper()
-    s = re.sub(r'\s+', '', s)           # 모든 공백 제거
-    s = s.replace('–', '-').replace('—', '-')  # 대시 통일
-    s = re.sub(r'^0+(?=[A-Z0-9])', '', s)     # 선행 0 제거(혼용 케이스 방지)
-    return s
-
 def guarded_join(left, right, on='SKU', how='left'):
     """
     정규화된 조인 수행 with 품질 리포트
@@ -46,10 +29,9 @@ def guarded_join(left, right, on='SKU', how='left'):
     Returns:
         조인된 DataFrame
     """
-    left = left.copy()
-    right = right.copy()
-    left[on] = left[on].map(normalize_sku)
-    right[on] = right[on].map(normalize_sku)
+    # 고유 키 단위 정규화 (assign은 CoW 기반이라 원본 프레임 전체 복사 없음)
+    left = left.assign(**{on: normalize_series(left[on], normalize_sku)})
+    right = right.assign(**{on: normalize_series(right[on], normalize_sku)})
     
     # 조인 전 키 품질 리포트
     dup_l = left[on].duplicated().sum()
@@ -127,42 +109,121 @@ def row_hash(row, cols):
                       sort_keys=True, default=str)
     return hashlib.sha1(blob.encode()).hexdigest()
 
-def upsert_sku_master(hub_df, db="out/sku_master.duckdb", table="sku_master"):
+def hash_rows(df, cols=None) -> pd.Series:
+    """
+    벡터화 행 해시 (변경 감지용, row_hash의 일괄 버전)
+    컬럼은 이름순으로 고정, 정수/실수 컬럼은 float64로 맞춰 결측 유무에 따른 dtype 변동에도 같은 해시
+
+    Args:
+        df: DataFrame
+        cols: 해시 계산할 컬럼 목록 (None이면 row_hash 제외 전체)
+
+    Returns:
+        pd.Series: uint64 해시 (원래 index 유지)
+    """
+    cols = sorted(c for c in (df.columns if cols is None else cols) if c != 'row_hash')
+    frame = df[cols].copy()
+    for c in cols:
+        if pd.api.types.is_numeric_dtype(frame[c]) and not pd.api.types.is_bool_dtype(frame[c]):
+            frame[c] = frame[c].astype('float64')
+    return pd.util.hash_pandas_object(frame, index=False)
+
+def _quote(name) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _ensure_upsert_table(con, table, key):
+    """
+    기존 테이블을 UPSERT 가능한 형태로 보강 (데이터 유지)
+    - 누락 컬럼(row_hash 포함) 추가
+    - key에 PK/UNIQUE가 없으면 중복 key는 마지막 적재 행만 남기고 UNIQUE 인덱스 생성
+      (다른 인덱스가 있으면 DuckDB가 ADD PRIMARY KEY를 거부하므로 UNIQUE 인덱스 사용)
+    """
+    existing = {r[0] for r in con.execute(f"DESCRIBE {table}").fetchall()}
+    for name, dtype, *_ in con.execute("DESCRIBE SELECT * FROM _upsert_new").fetchall():
+        if name not in existing:
+            con.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(name)} {dtype}")
+
+    has_pk = con.execute("""
+        SELECT count(*) FROM duckdb_constraints()
+        WHERE table_name = ? AND constraint_type IN ('PRIMARY KEY', 'UNIQUE')
+          AND constraint_column_names = [?]
+    """, [table, key]).fetchone()[0]
+    has_unique = con.execute("""
+        SELECT count(*) FROM duckdb_indexes()
+        WHERE table_name = ? AND is_unique AND expressions IN (?, ?)
+    """, [table, f"[{key}]", f"[{_quote(key)}]"]).fetchone()[0]
+    if not (has_pk or has_unique):
+        con.execute(f"""
+            DELETE FROM {table} WHERE {_quote(key)} IS NOT NULL
+              AND rowid NOT IN (SELECT max(rowid) FROM {table} GROUP BY {_quote(key)})
+        """)
+        con.execute(f"CREATE UNIQUE INDEX {table}_{key}_key ON {table}({_quote(key)})")
+
+def upsert_sku_master(hub_df, db="out/sku_master.duckdb", table="sku_master", key="SKU") -> dict:
     """
     증분 UPSERT로 SKU Master 업데이트
+    - 행 해시는 hash_rows()로 일괄 계산해 row_hash 컬럼에 저장
+    - key(SKU) 기준 INSERT ... ON CONFLICT DO UPDATE, 해시가 바뀐 행만 전송
+    - 기존 테이블(전체 재생성본/구버전 append 누적본)은 데이터를 유지한 채 key·row_hash 보강
+      (row_hash가 없던 행은 첫 UPSERT에서 한 번 updated로 집계)
+    - hub_df에 없는 SKU는 삭제하지 않음
     
     Args:
         hub_df: 업데이트할 DataFrame
         db: DuckDB 데이터베이스 경로
         table: 테이블명
-    """
-    con = duckdb.connect(db)
-    
-    # 테이블이 없으면 생성
-    con.execute(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM hub_df LIMIT 0")
-    
-    # 해시 생성
-    cols = [c for c in hub_df.columns if c != 'row_hash']
-    hub_df_with_hash = hub_df.copy()
-    hub_df_with_hash['row_hash'] = hub_df_with_hash.apply(lambda r: row_hash(r, cols), axis=1)
+        key: 기본 키 컬럼
     
-    # 새 데이터 등록
-    con.register('new_data', hub_df_with_hash)
+    Returns:
+        dict: inserted / updated / unchanged 행 수 (+ 입력에서 제외된 key 결측/중복 행 수 skipped)
+    """
+    new = hub_df.drop(columns=['row_hash'], errors='ignore')
+    new = new[new[key].notna()].drop_duplicates(subset=[key], keep='last')
+    skipped = len(hub_df) - len(new)
+    if skipped:
+        print(f"[WARN] {key} 결측/중복 {skipped}행 제외 (중복은 마지막 행 사용)")
+    new = new.assign(row_hash=hash_rows(new).to_numpy())
     
-    # UPSERT 실행
-    con.execute(f"""
-        CREATE TABLE IF NOT EXISTS {table}_hash AS SELECT row_hash FROM {table} LIMIT 0;
+    con = duckdb.connect(db)
+    con.register('_upsert_new', new)
+    k = _quote(key)
+    try:
+        # 스키마 보강은 트랜잭션 밖에서 (트랜잭션 내 DELETE는 UNIQUE 인덱스 생성 시 보이지 않음)
+        exists = con.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = ?", [table]).fetchone()[0]
+        if exists:
+            _ensure_upsert_table(con, table, key)
+        else:
+            con.execute(f"CREATE TABLE {table} AS SELECT * FROM _upsert_new LIMIT 0")
+            con.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({k})")
         
-        INSERT INTO {table}
-        SELECT n.* EXCLUDE(row_hash) FROM new_data n
-        LEFT JOIN (
-            SELECT *, sha1(to_json(*)) AS row_hash 
-            FROM {table}
-        ) o USING(row_hash)
-        WHERE o.row_hash IS NULL;
-    """)
-    
-    con.close()
+        con.execute("BEGIN TRANSACTION")
+        try:
+            inserted, updated, unchanged = con.execute(f"""
+                SELECT count(*) FILTER (WHERE o.{k} IS NULL),
+                       count(*) FILTER (WHERE o.{k} IS NOT NULL AND o.row_hash IS DISTINCT FROM n.row_hash),
+                       count(*) FILTER (WHERE o.row_hash = n.row_hash)
+                FROM _upsert_new n LEFT JOIN {table} o ON o.{k} = n.{k}
+            """).fetchone()
+            
+            # 신규/변경 행만 전송
+            if inserted or updated:
+                sets = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in new.columns if c != key)
+                con.execute(f"""
+                    INSERT INTO {table} BY NAME
+                    SELECT n.* FROM _upsert_new n LEFT JOIN {table} o ON o.{k} = n.{k}
+                    WHERE o.row_hash IS DISTINCT FROM n.row_hash
+                    ON CONFLICT ({k}) DO UPDATE SET {sets}
+                """)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+    finally:
+        con.unregister('_upsert_new')
+        con.close()
+    
+    return {"inserted": inserted, "updated": updated, "unchanged": unchanged, "skipped": skipped}
 
 # =============================================================================
 # 4. 톨러런스 프로파일 (창고·벤더별 가중치)
@@ -194,35 +255,132 @@ def get_tolerance(vendor, warehouse):
 # 5. FAIL 케이스 자동 처방(Top‑N 대안 조합)
 # =============================================================================
 
-def topn_alternatives(units_df, k, gw_tgt, cbm_tgt, n=3):
+def _suffix_k_sums(vals, kmax):
+    """
+    suffix 구간 k개 최소/최대 합 테이블 (분기 한정용)
+
+    Returns:
+        (lo, hi): lo[i, m] / hi[i, m] = vals[i:] 중 m개 최소합 / 최대합 (m <= kmax)
+    """
+    n = len(vals)
+    lo = np.full((n + 1, kmax + 1), np.inf)
+    hi = np.full((n + 1, kmax + 1), -np.inf)
+    lo[:, 0] = 0.0
+    hi[:, 0] = 0.0
+    ordered = []
+    for i in range(n - 1, -1, -1):
+        bisect.insort(ordered, vals[i])
+        m = min(kmax, len(ordered))
+        lo[i, 1:m + 1] = np.cumsum(ordered[:m])
+        hi[i, 1:m + 1] = np.cumsum(ordered[:-m - 1:-1])
+    return lo, hi
+
+def topn_alternatives(units_df, k, gw_tgt, cbm_tgt, n=3, max_nodes=300000):
     """
     FAIL 케이스에 대한 Top-N 대안 조합 제안
-    
+    크기 k-2..k+2 조합을 DFS로 탐색하며 크기 n 힙만 유지 (메모리 O(n))
+    남은 선택의 suffix 최소/최대 합으로 오차 하한을 계산해 힙 최악값보다 나쁜 분기는 가지치기
+
+    탐색은 2단계 (예산 내 완료 시 결과는 탐색 순서와 무관):
+    1) 평균 유닛(목표/k)에 가까운 순서로 짧게 탐색 → 좋은 후보로 힙을 먼저 채움
+    2) 큰 유닛부터 탐색 → suffix 합 범위가 좁아 하한이 빨리 조여짐
+
     Args:
         units_df: 유닛 데이터프레임
         k: 목표 패키지 수
         gw_tgt: 목표 중량
         cbm_tgt: 목표 부피
         n: 제안할 대안 수
-        
+        max_nodes: 탐색 노드 예산 (소진 시 그때까지의 Top-N 반환, None이면 무제한)
+
     Returns:
-        대안 조합 목록
+        대안 조합 목록 (err 오름차순, 동률은 조합 크기 → 인덱스 사전순)
     """
-    cand = []
-    idx = list(range(min(len(units_df), 22)))  # 안전 상한
-    gw = units_df["G.W(kgs)"].values[idx]
-    cbm = units_df["CBM"].values[idx]
-    
-    for r in range(max(1, k-2), min(k+2, len(idx))+1):
-        for comb in combinations(idx, r):
-            gw_s = float(gw[list(comb)].sum())
-            cbm_s = float(cbm[list(comb)].sum())
-            err = abs(gw_s-gw_tgt) + abs(cbm_s-cbm_tgt)
-            cand.append((err, comb, gw_s, cbm_s))
-    
-    cand.sort(key=lambda x: x[0])
-    return [{"err": e, "pick": list(map(int, c)), "gw": g, "cbm": b} 
-            for e, c, g, b in cand[:n]]
+    N = len(units_df)
+    r_min, r_max = max(1, k-2), min(k+2, N)
+    if n <= 0 or r_min > r_max:
+        return []
+
+    gw = units_df["G.W(kgs)"].values
+    cbm = units_df["CBM"].values
+    gw_all = gw.astype(float)
+    cbm_all = cbm.astype(float)
+    gw_scale = max(abs(gw_tgt), 1e-6)
+    cbm_scale = max(abs(cbm_tgt), 1e-6)
+    # 부분합 누적 순서에 따른 부동소수 오차로 동률 후보를 잘라내지 않도록 여유값
+    eps = 1e-9 * (np.abs(gw_all).sum() + np.abs(cbm_all).sum() + 1.0)
+
+    # max-heap: (-err, -r, -comb) → heap[0]이 현재 최악 후보
+    heap = []
+    in_heap = set()
+    path = []
+    nodes = [0, None]  # [방문 노드 수, 현재 탐색의 노드 상한]
+
+    def gap(need, lo, hi):
+        return max(0.0, lo - need, need - hi)
+
+    def push(order):
+        comb = sorted(int(order[p]) for p in path)
+        key_comb = tuple(-c for c in comb)
+        if key_comb in in_heap:
+            return
+        gw_s = float(gw[comb].sum())
+        cbm_s = float(cbm[comb].sum())
+        err = abs(gw_s-gw_tgt) + abs(cbm_s-cbm_tgt)
+        entry = ((-err, -len(comb), key_comb), gw_s, cbm_s)
+        if len(heap) < n:
+            heapq.heappush(heap, entry)
+        elif entry[0] > heap[0][0]:
+            in_heap.discard(heapq.heapreplace(heap, entry)[0][2])
+        else:
+            return
+        in_heap.add(key_comb)
+
+    def run(order, budget):
+        gw_f, cbm_f = gw_all[order], cbm_all[order]
+        lo_gw, hi_gw = _suffix_k_sums(gw_f, r_max)
+        lo_cbm, hi_cbm = _suffix_k_sums(cbm_f, r_max)
+
+        def search(start, left, p_gw, p_cbm):
+            if left == 0:
+                push(order)
+                return
+            m = left - 1
+            for i in range(start, N - left + 1):
+                if nodes[1] is not None and nodes[0] >= nodes[1]:
+                    return
+                nodes[0] += 1
+                q_gw, q_cbm = p_gw + gw_f[i], p_cbm + cbm_f[i]
+                if len(heap) == n:
+                    bound = (gap(gw_tgt - q_gw, lo_gw[i+1, m], hi_gw[i+1, m]) +
+                             gap(cbm_tgt - q_cbm, lo_cbm[i+1, m], hi_cbm[i+1, m]))
+                    if bound > -heap[0][0][0] + eps:
+                        continue
+                path.append(i)
+                search(i + 1, m, q_gw, q_cbm)
+                path.pop()
+
+        # k에 가까운 크기부터 탐색, 노드 예산은 남은 크기들에 균등 분배 (미사용분 이월)
+        sizes = sorted(range(r_min, r_max+1), key=lambda r: (abs(r - k), r))
+        start_nodes = nodes[0]
+        nodes[1] = None
+        for j, r in enumerate(sizes):
+            if budget is not None:
+                used = nodes[0] - start_nodes
+                nodes[1] = nodes[0] + (budget - used) // (len(sizes) - j)
+            search(0, r, 0.0, 0.0)
+
+    # 1) 시드: 평균 유닛에 가까운 순서 (예산의 1/5, 무제한이거나 k<=0이면 생략)
+    if max_nodes is not None and k > 0:
+        dev = np.abs(gw_all - gw_tgt / k) / gw_scale + np.abs(cbm_all - cbm_tgt / k) / cbm_scale
+        run(np.argsort(dev, kind="stable"), max_nodes // 5)
+    # 2) 전체: 큰 유닛부터 (남은 예산)
+    rest = None if max_nodes is None else max_nodes - nodes[0]
+    run(np.argsort(-(gw_all / gw_scale + cbm_all / cbm_scale), kind="stable"), rest)
+
+    best = sorted(heap, reverse=True)
+    return [{"err": -key[0], "pick": [-c for c in key[2]], "gw": g, "cbm": b}
+            for key, g, b in best]
 
 # =============================================================================
 # 6. 일 단위 점유·과금(월 스냅샷 → 일자 누적)
@@ -405,6 +563,7 @@ if __name__ == "__main__":
     print("- normalize_sku()")
     print("- guarded_join()")
     print("- validate_flow_transitions()")
+    print("- hash_rows()")
     print("- upsert_sku_master()")
     print("- get_tolerance()")
     print("- topn_alternatives()")
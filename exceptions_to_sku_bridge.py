@@ -4,12 +4,17 @@ Exceptions→SKU 귀속 브릿지 스크립트
 HVDC Invoice Validation Dashboard의 예외 케이스를 SKU 축에 매핑
 """
 
+import os
+import sys
 import pandas as pd
 import numpy as np
 import duckdb
 from pathlib import Path
 import re
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from hvdc_code_utils import expand_code_frame, expand_numeric_code
 
 class ExceptionsToSKUBridge:
     """Invoice Exceptions를 SKU에 귀속시키는 브릿지"""
@@ -75,30 +80,17 @@ class ExceptionsToSKUBridge:
         if pd.isna(hvdc_code_raw) or not str(hvdc_code_raw).strip():
             return []
         
-        codes = []
-        code_str = str(hvdc_code_raw).strip()
-        
-        # 쉼표로 분리된 코드들 처리
-        if ',' in code_str:
-            parts = [p.strip() for p in code_str.split(',')]
-            base_code = parts[0]
-            
-            # 첫 번째 코드 추가
-            if base_code:
-                codes.append(base_code.zfill(4))
-            
-            # 나머지 코드들 확장
-            for part in parts[1:]:
-                if len(part) == 2:  # '90' 형태
-                    expanded_code = base_code[:2] + part
-                    codes.append(expanded_code.zfill(4))
-                elif len(part) >= 3:  # '0090' 형태
-                    codes.append(part.zfill(4))
-        else:
-            # 단일 코드
-            codes.append(code_str.zfill(4))
-        
-        return list(set(codes))  # 중복 제거
+        return list(expand_numeric_code(str(hvdc_code_raw).strip()))  # 중복 제거된 번호 코드
+    
+    def expand_hvdc_frame(self, hvdc_codes: pd.Series) -> pd.DataFrame:
+        """
+        HVDC CODE Series 확장 → (raw_code, hvdc_code) 매핑 프레임
+        고유 RAW 값만 확장 (expand_code_frame + expand_numeric_code)
+        """
+        codes = hvdc_codes.dropna()
+        codes = codes.astype(str).str.strip()
+        frame = expand_code_frame(codes[codes != ""], expand=expand_numeric_code)
+        return frame.rename(columns={"full_code": "hvdc_code"})
     
     def create_sku_hvdc_mapping(self, sku_df: pd.DataFrame) -> Dict[str, List[str]]:
         """SKU에서 HVDC Code를 역추적하여 매핑 생성"""
@@ -145,9 +137,6 @@ class ExceptionsToSKUBridge:
         
         print(f"🔄 {len(hvdc_sku_map):,}개 HVDC Code → SKU 매핑 생성")
         
-        # Exceptions 매핑 시도
-        matched_exceptions = []
-        
         hvdc_col = None
         for col in exceptions_df.columns:
             if 'HVDC' in col.upper() or 'CODE' in col.upper():
@@ -160,38 +149,37 @@ class ExceptionsToSKUBridge:
         
         print(f"🔍 HVDC Code 컬럼 사용: {hvdc_col}")
         
-        for idx, row in exceptions_df.iterrows():
-            hvdc_raw = row.get(hvdc_col, '')
-            expanded_codes = self.expand_hvdc_codes(hvdc_raw)
-            
-            matched_skus = []
-            for hvdc_code in expanded_codes:
-                if hvdc_code in hvdc_sku_map:
-                    matched_skus.extend(hvdc_sku_map[hvdc_code])
-            
-            # 매칭된 SKU가 있으면 각 SKU에 대해 레코드 생성
-            if matched_skus:
-                for sku in set(matched_skus):  # 중복 제거
-                    exception_record = {
-                        'SKU': sku,
-                        'Invoice_Codes': hvdc_raw,
-                        'Expanded_Codes': ','.join(expanded_codes),
-                        'Err_GW': row.get('Err_GW', 0.0) if 'Err_GW' in row else 0.0,
-                        'Err_CBM': row.get('Err_CBM', 0.0) if 'Err_CBM' in row else 0.0,
-                        'Match_Status': 'FAIL',
-                        'Original_Row_Index': idx
-                    }
-                    
-                    # 추가 컬럼들 복사
-                    for col in exceptions_df.columns:
-                        if col not in exception_record:
-                            exception_record[f'Orig_{col}'] = row[col]
-                    
-                    matched_exceptions.append(exception_record)
+        # RAW 코드 확장 프레임 ⋈ HVDC Code → SKU 매핑 (행별 루프 대신 조인)
+        expansion = self.expand_hvdc_frame(exceptions_df[hvdc_col])
+        hvdc_sku = pd.DataFrame([(code, sku) for code, skus in hvdc_sku_map.items() for sku in skus],
+                                columns=['hvdc_code', 'SKU'])
+        expanded_str = expansion.groupby('raw_code', sort=False)['hvdc_code'].agg(','.join)
+        
+        raw = exceptions_df[hvdc_col]
+        ex = pd.DataFrame({'_pos': np.arange(len(exceptions_df)),
+                           '_raw_code': raw.where(raw.isna(), raw.astype(str).str.strip()).to_numpy()})
+        pairs = (ex.merge(expansion, left_on='_raw_code', right_on='raw_code')
+                   .merge(hvdc_sku, on='hvdc_code')
+                   .drop_duplicates(['_pos', 'SKU'])
+                   .sort_values('_pos', kind='stable'))
         
-        if matched_exceptions:
-            result_df = pd.DataFrame(matched_exceptions)
-            print(f"✅ {len(matched_exceptions):,}건의 Exception→SKU 매핑 완료")
+        if not pairs.empty:
+            rows = exceptions_df.iloc[pairs['_pos'].to_numpy()]
+            result_df = pd.DataFrame({
+                'SKU': pairs['SKU'].to_numpy(),
+                'Invoice_Codes': rows[hvdc_col].to_numpy(),
+                'Expanded_Codes': pairs['raw_code'].map(expanded_str).to_numpy(),
+                'Err_GW': rows['Err_GW'].to_numpy() if 'Err_GW' in rows.columns else 0.0,
+                'Err_CBM': rows['Err_CBM'].to_numpy() if 'Err_CBM' in rows.columns else 0.0,
+                'Match_Status': 'FAIL',
+                'Original_Row_Index': rows.index.to_numpy(),
+            })
+            # 추가 컬럼들 복사
+            for col in exceptions_df.columns:
+                if col not in result_df.columns:
+                    result_df[f'Orig_{col}'] = rows[col].to_numpy()
+            
+            print(f"✅ {len(result_df):,}건의 Exception→SKU 매핑 완료")
             return result_df
         else:
             print("⚠️ 매핑된 Exception이 없습니다")
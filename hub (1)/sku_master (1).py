@@ -172,7 +172,8 @@ def save_as_parquet_duckdb(hub_df: pd.DataFrame, out_dir="out", use_incremental=
     if use_incremental and os.path.exists(db):
         # 증분 UPSERT 사용
         print("[INFO] Using incremental UPSERT for SKU Master update")
-        upsert_sku_master(hub_df_copy, db, "sku_master")
+        stats = upsert_sku_master(hub_df_copy, db, "sku_master")
+        print(f"[INFO] UPSERT: inserted={stats['inserted']}, updated={stats['updated']}, unchanged={stats['unchanged']}")
         # Parquet은 전체 덮어쓰기 (성능상 이유)
         hub_df_copy.to_parquet(pq, index=False)
     else:
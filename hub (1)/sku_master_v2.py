@@ -12,6 +12,7 @@ import duckdb
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from enhanced_sku_utils import add_provenance, validate_sku_master_quality
+from hvdc_code_utils import normalize_series
 
 @dataclass
 class SkuMasterRow:
@@ -33,18 +34,6 @@ class SkuMasterRow:
     err_gw: Optional[float]
     err_cbm: Optional[float]
 
-def _norm_code(s: Optional[str]) -> Optional[str]:
-    """
-    HVDC 코드 정규화 (기존 enhanced_sku_utils.normalize_sku와 동일 로직)
-    """
-    if s is None: 
-        return None
-    s = str(s).strip().upper()
-    s = s.replace(' ', '')
-    while '--' in s: 
-        s = s.replace('--', '-')
-    return s
-
 def build_sku_master_v2(
     stock_summary_df: pd.DataFrame,
     reporter_stats: Dict,
@@ -174,7 +163,7 @@ def build_sku_master_v2(
     
     if hvdc_code_col:
         print(f"[INFO] Using HVDC code column: {hvdc_code_col}")
-        base["hvdc_code_norm"] = dfp[hvdc_code_col].map(_norm_code)
+        base["hvdc_code_norm"] = normalize_series(dfp[hvdc_code_col])
     else:
         print("[WARN] No HVDC code column found")
         base["hvdc_code_norm"] = None
@@ -240,7 +229,8 @@ def save_hub_v2(hub_df: pd.DataFrame, out_dir: str = "out", use_incremental: boo
     if use_incremental and pathlib.Path(db).exists():
         print("[INFO] Using incremental UPSERT for SKU Master v2 update")
         from enhanced_sku_utils import upsert_sku_master
-        upsert_sku_master(hub_df, db, "sku_master")
+        stats = upsert_sku_master(hub_df, db, "sku_master")
+        print(f"[INFO] UPSERT: inserted={stats['inserted']}, updated={stats['updated']}, unchanged={stats['unchanged']}")
     else:
         print("[INFO] Creating new SKU Master v2 database")
         con = duckdb.connect(db)
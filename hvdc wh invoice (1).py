@@ -18,12 +18,20 @@
 # OR whose parts(1..4) match the invoice parts (for each expanded code). Vendor filtering enhanced with ontology rules.
 # Subset matching (k packages) is done on this pooled candidate set. Tolerance ±0.10.
 
+
+import os
+import sys
+import json
+import hashlib
 import pandas as pd
 import numpy as np
-from itertools import combinations
 from pathlib import Path
-import re
-from difflib import SequenceMatcher
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from invoice_matching import explode_by_pkg, run_match_tasks, MatchCache, RevalidationStore, code_fingerprint
+import hvdc_code_utils
+from hvdc_code_utils import FuzzyCodeIndex, expand_code_frame
+from config.recon_settings import INVOICE_MATCHING
 
 INVOICE_PATH = r"C:\cursor mcp\HVDC PJT\HVDC WH DATA\HVDC WH INVOICE_1.xlsx"
 ALL_PATH     = r"C:\cursor mcp\HVDC PJT\HVDC WH DATA\HVDC WH ALL.xlsx"
@@ -33,6 +41,28 @@ MAX_EXACT_N  = 18
 USE_MONTH_FILTER = False
 ALL_DATE_COL     = "입고일자"
 INV_DATE_COL     = "Operation Date"
+# Parallel matching (ProcessPoolExecutor) - 0/1이면 직렬 실행, 결과는 직렬과 동일 순서로 병합
+PARALLEL_WORKERS   = 0
+PARALLEL_CHUNKSIZE = 8
+# Anytime 탐색 예산 (config/recon_settings.py) - 코드별 평가 횟수 상한 + 전체 실행 시간(코드 간 공평 분배)
+MAX_COMBINATIONS = INVOICE_MATCHING["method"].get("max_combinations")
+TIMEOUT_SECONDS  = INVOICE_MATCHING["method"].get("timeout_seconds")
+# 매칭 결과 캐시 (DuckDB) - 실행 간 변경 없는 코드는 solve 생략, None이면 비활성
+# main()은 파일명만 받아 out_path와 같은 폴더에 생성 (경로를 주면 그대로 사용)
+MATCH_CACHE_NAME = "invoice_match_cache.duckdb"
+MATCH_CACHE_DB   = OUT_PATH.with_name(MATCH_CACHE_NAME)
+# 증분 재검증 (DuckDB) - 인보이스 행/후보 풀 지문이 바뀐 코드만 재검증, None이면 매 실행 전체 재검증
+REVALIDATE_NAME  = "invoice_revalidation.duckdb"
+REVALIDATE_DB    = OUT_PATH.with_name(REVALIDATE_NAME)
+# 퍼지 fallback - FULL/파트 일치 후보가 없을 때 n-gram 인덱스로 유사 코드 Top-k 사용
+FUZZY_MATCHING   = INVOICE_MATCHING.get("fuzzy", {})
+FUZZY_FALLBACK   = FUZZY_MATCHING.get("enabled", False)
+# Multi-start local search - vendor별 재시작 수/seed/평가 예산 (config/recon_settings.py)
+MULTISTART       = INVOICE_MATCHING.get("multistart", {})
+# 스트리밍 모드 - 코드 청크 단위로 Parquet 데이터셋에 기록 + 체크포인트 재개, None이면 일괄 실행
+STREAM_DIR         = None
+STREAM_CHUNK_CODES = 200
+STREAM_DUCKDB      = None   # 청크 결과를 함께 적재할 DuckDB 경로 (선택)
 # Enhanced Vendor Classification (from Ontology System)
 VENDOR_ALLOWED = {"HE", "SIM"}  # Primary vendors
 VENDOR_EXTENDED = {"HE", "SIM", "SCT", "SEI", "PPL", "MOSB", "ALM", "SHU", "NIE", "ALS", "SKM", "SAS"}  # Extended vendor list
@@ -43,12 +73,9 @@ WAREHOUSE_OUTDOOR = {"DSV Outdoor", "DSV MZP", "MOSB"}
 WAREHOUSE_SITE = {"AGI", "DAS", "MIR", "SHU"}
 WAREHOUSE_DANGEROUS = {"AAA Storage", "Dangerous Storage"}
 
-def to_num(s): 
+def to_num(s):
     return pd.to_numeric(s, errors="coerce")
 
-def close2(a, b, tol=TOL): 
-    return (a is not None) and (b is not None) and abs(a - b) <= tol
-
 # Ontology-based Utility Functions
 def normalize_hvdc_code(code: str) -> str:
     """
@@ -62,48 +89,8 @@ def normalize_hvdc_code(code: str) -> str:
     if not code or not isinstance(code, str):
         return ""
     
-    # 공백 제거 및 대문자로 변환
-    normalized = str(code).strip().upper()
-    
-    # 특수문자 제거 (하이픈 제외)
-    normalized = re.sub(r'[^\w\-]', '', normalized)
-    
-    # 연속된 하이픈을 하나로 통합
-    normalized = re.sub(r'-+', '-', normalized)
-    
-    return normalized
-
-def normalize_code_num(code: str) -> str:
-    """HVDC CODE 숫자 부분 정규화 (예: 0014, 014, 14 → 14)"""
-    if not isinstance(code, str): 
-        code = str(code)
-    m = re.search(r'(\d+)$', code)
-    return str(int(m.group(1))) if m else code
-
-def codes_match(code1: str, code2: str, threshold: float = 0.9) -> bool:
-    """
-    HVDC 코드 매칭 - 유사도 기반 (온톨로지 시스템 기반)
-    
-    Args:
-        code1, code2: 비교할 코드들
-        threshold: 매칭 임계값
-    Returns:
-        bool: 매칭 여부
-    """
-    if not code1 or not code2:
-        return False
-    
-    # 코드 정규화
-    norm_code1 = normalize_hvdc_code(code1)
-    norm_code2 = normalize_hvdc_code(code2)
-    
-    # 완전 일치 확인
-    if norm_code1 == norm_code2:
-        return True
-    
-    # 유사도 계산
-    similarity = SequenceMatcher(None, norm_code1, norm_code2).ratio()
-    return similarity >= threshold
+    # 공통 정규화 계층 (hub/exceptions와 동일 규칙, 메모이제이션)
+    return hvdc_code_utils.normalize_hvdc_code(code)
 
 def is_valid_hvdc_vendor(vendor_code: str, extended_mode: bool = False) -> bool:
     """
@@ -125,6 +112,21 @@ def is_valid_hvdc_vendor(vendor_code: str, extended_mode: bool = False) -> bool:
     else:
         return vendor_upper in VENDOR_ALLOWED
 
+def multistart_params(vendor):
+    """
+    vendor별 multi-start 설정 (default 위에 vendor 항목 덮어쓰기)
+
+    Args:
+        vendor: 벤더 코드 (code3)
+    Returns:
+        tuple: (restarts, seed, max_evals)
+    """
+    cfg = {"restarts": 1, "seed": 0, "max_evals": None}
+    cfg.update(MULTISTART.get("default", {}))
+    if vendor:
+        cfg.update(MULTISTART.get(vendor, {}))
+    return int(cfg["restarts"]), int(cfg["seed"]), cfg["max_evals"] or MAX_COMBINATIONS
+
 def classify_warehouse_type(location: str) -> str:
     """
     창고 위치 분류 (온톨로지 시스템 기반)
@@ -174,719 +176,523 @@ def split_hvdc_code(code: str):
     
     return parts[:5]
 
+def split_hvdc_codes(codes: pd.Series) -> pd.DataFrame:
+    """
+    split_hvdc_code 벡터화 버전 (고유값만 정규화 → 원래 행으로 take)
+
+    Args:
+        codes: HVDC CODE Series
+    Returns:
+        DataFrame: 행별 파트 1..5 (codes와 같은 index, 없으면 None)
+    """
+    codes_idx, uniques = pd.factorize(codes)
+    uniq = pd.Series(uniques, dtype=object)
+
+    # normalize_hvdc_code와 동일 규칙 (공통 계층), 문자열이 아닌 값은 파트 없음
+    norm = pd.Series([hvdc_code_utils.normalize_hvdc_code(u) if isinstance(u, str) else None
+                      for u in uniq], dtype=object).str.strip("-")
+    parts = norm.str.split("-", expand=True) if len(norm) else pd.DataFrame(index=norm.index)
+    parts = parts.reindex(columns=range(5)).astype(object)
+    parts = parts.where(parts.notna() & (parts != ""), None)
+
+    # factorize 결측(-1) → 마지막 빈 행
+    parts.loc[len(parts)] = [None] * 5
+    taken = parts.to_numpy()[np.where(codes_idx < 0, len(parts) - 1, codes_idx)]
+    # dtype=object: pandas 3 문자열 dtype 추론 시 None → NaN으로 바뀌는 것 방지 (split_hvdc_code와 동일하게 None)
+    return pd.DataFrame(taken, index=codes.index, columns=range(5), dtype=object)
+
+def classify_warehouse_types(locations: pd.Series) -> pd.Categorical:
+    """classify_warehouse_type 벡터화 버전 (고유 위치만 분류 → 범주형 매핑)"""
+    codes_idx, uniques = pd.factorize(locations)
+    labels = np.array([classify_warehouse_type(u) for u in uniques] + ["Unknown"], dtype=object)
+    return pd.Categorical(labels[np.where(codes_idx < 0, len(labels) - 1, codes_idx)],
+                          categories=["Indoor", "Outdoor", "Site", "Dangerous", "Unknown"])
+
 def extract_parts(df, col_full="HVDC CODE", p1="HVDC CODE 1", p2="HVDC CODE 2", p3="HVDC CODE 3", p4="HVDC CODE 4", p5="HVDC CODE 5"):
     """
     Enhanced HVDC CODE 파트 추출 함수 (온톨로지 시스템 기반)
-    정규화 및 유효성 검증 포함
+    정규화 및 유효성 검증 포함 (고유 코드 단위 벡터화)
     """
     for c in [p1,p2,p3,p4,p5]:
         if c not in df.columns:
             df[c] = None
-    
-    def fill_row(row):
-        parts = split_hvdc_code(row.get(col_full))
-        for i,(cn,val) in enumerate(zip([p1,p2,p3,p4,p5], parts), start=1):
-            if pd.isna(row.get(cn)) or row.get(cn) is None:
-                row[cn] = val
-        return row
-    
-    df = df.apply(fill_row, axis=1)
-    
+
+    # 비어 있는 파트만 FULL 코드 분해 결과로 채움
+    split = split_hvdc_codes(df[col_full]) if col_full in df.columns else None
+    for i, cn in enumerate([p1,p2,p3,p4,p5]):
+        if split is None:
+            continue
+        missing = df[cn].isna()
+        if missing.any():
+            df[cn] = df[cn].astype(object).where(~missing, split[i])
+
     # 정규화 및 유효성 검증
     for c in [p1,p2,p3,p4,p5]:
         df[c] = df[c].astype(str).str.strip().str.upper().replace({"NAN": None, "NONE": None})
     
-    # 벤더 코드 (Part 3) 유효성 검증 - 확장 모드 사용
+    # 벤더 코드 (Part 3) 유효성 검증 - 확장 모드 사용 (정규화 후 값이므로 집합 포함 여부와 동일)
     if p3 in df.columns:
-        df[f"{p3}_VALID"] = df[p3].apply(lambda x: is_valid_hvdc_vendor(x, extended_mode=True))
+        df[f"{p3}_VALID"] = df[p3].isin(VENDOR_EXTENDED)
     
     # 창고 위치 분류 추가 (필요시)
     if 'Location' in df.columns:
-        df['WAREHOUSE_TYPE'] = df['Location'].apply(classify_warehouse_type)
+        df['WAREHOUSE_TYPE'] = classify_warehouse_types(df['Location'])
     
     return df
 
-def expand_combined_codes(code: str):
+def build_candidate_index(df, col_full="HVDC CODE", part_cols=("HVDC CODE 1", "HVDC CODE 2", "HVDC CODE 3", "HVDC CODE 4"), ym_col="_ym",
+                          fuzzy=False):
     """
-    Expand combined shorthand in a single string.
-    Returns a set of full codes.
+    후보 풀 조회용 해시 인덱스 생성 (ALL 시트 1회 스캔)
+    인보이스 코드마다 ALL 전체를 boolean 스캔하던 방식을 위치 배열 조회로 대체
+
+    Args:
+        df: extract_parts 적용된 ALL DataFrame
+        col_full: FULL 코드 컬럼명
+        part_cols: 파트(1..4) 컬럼명
+        ym_col: 월 파티션 컬럼명 (USE_MONTH_FILTER용)
+        fuzzy: FULL 코드 n-gram 인덱스 생성 여부 (퍼지 fallback용)
+
+    Returns:
+        dict: {"by_code": FULL 코드 → 행 위치, "by_parts": (p1,p2,p3,p4) → 행 위치, "ym": 행별 _ym 배열,
+               "fuzzy": FuzzyCodeIndex 또는 None}
     """
-    if not isinstance(code, str) or "," not in code:
-        return {code} if isinstance(code, str) else set()
-    code = code.replace(" ", "")
-    # Split by comma
-    parts = code.split(",")
-    base = parts[0]  # full first token
-    expanded = {base}
-    # Base prefix up to last '-' before number-ish segment
-    # Find the numeric block (with optional sub-suffix like -1)
-    m = re.match(r"^(.*-)(\d+)(-[A-Za-z0-9]+)?$", base)
-    if not m:
-        # Try a simpler: up to last '-' then remainder
-        prefix = base.rsplit("-", 1)[0] + "-"
-        num_suffix = base.rsplit("-", 1)[-1]
-        num_m = re.match(r"^(\d+)(-[A-Za-z0-9]+)?$", num_suffix)
-        if num_m:
-            num = num_m.group(1)
-            sub = num_m.group(2) or ""
-        else:
-            num = None
-            sub = ""
-    else:
-        prefix, num, sub = m.group(1), m.group(2), (m.group(3) or "")
-    # Pad helper
-    def pad4(x):
-        return f"{int(x):04d}"
-    for token in parts[1:]:
-        # token could be like '0325-2' or '90' or '0090' or '195'
-        t = token
-        # If token includes '-', treat entire numeric-sub pattern
-        if "-" in t:
-            # assume full replacement numeric-sub
-            num_part, sub_part = t.split("-", 1)
-            if num_part.isdigit():
-                full = f"{prefix}{pad4(num_part)}-{sub_part}"
-                expanded.add(full)
-            else:
-                # fallback: just add as-is if looks full
-                expanded.add(t)
-        else:
-            # purely digits => replace number, keep sub from base (if any? usually none)
-            if t.isdigit() and num is not None:
-                full = f"{prefix}{pad4(t)}{sub or ''}"
-                expanded.add(full)
-            else:
-                expanded.add(t)
-    return expanded
+    by_code = df.groupby(col_full, sort=False).indices
+    return {
+        "by_code": by_code,
+        "by_parts": df.groupby(list(part_cols), sort=False).indices,
+        "ym": df[ym_col].to_numpy() if ym_col in df.columns else None,
+        "fuzzy": FuzzyCodeIndex(by_code.keys(), n=FUZZY_MATCHING.get("ngram", 3)) if fuzzy else None,
+    }
 
-def explode_by_pkg(df_subset):
+def lookup_candidates(index, code_pos, parts, ym=None):
     """
-    패키지 단위로 데이터를 explode하여 각 패키지별 단위 데이터 생성
-    (ONTOLOGY 기반 개선)
-    
+    인덱스에서 후보 행 위치 조회 (FULL 코드 ∪ 파트 일치)
+
     Args:
-        df_subset: DataFrame with Pkg, G.W(kgs), CBM columns
-        
+        index: build_candidate_index 결과
+        code_pos: 확장 FULL 코드와 일치하는 ALL 행 위치 (join_expanded_codes 결과)
+        parts: 인보이스 파트 튜플 (p1, p2, p3, p4), None이면 FULL 코드만 조회
+        ym: 월 필터 값 (None이면 필터 미적용)
+
     Returns:
-        DataFrame: exploded data with unit weights/volumes per package
+        np.ndarray: ALL 행 위치 (원본 순서로 정렬)
     """
-    if df_subset.empty:
-        return pd.DataFrame(columns=["Pkg", "G.W(kgs)", "CBM"])
-    
-    exploded_rows = []
-    
-    for idx, row in df_subset.iterrows():
-        pkg_count = int(row.get("Pkg", 0))
-        if pkg_count <= 0:
-            continue
-            
-        unit_gw = float(row.get("G.W(kgs)", 0)) / pkg_count
-        unit_cbm = float(row.get("CBM", 0)) / pkg_count
-        
-        # 각 패키지별로 단위 데이터 생성
-        for pkg_idx in range(pkg_count):
-            exploded_rows.append({
-                "Original_Index": idx,
-                "Pkg_Unit": pkg_idx + 1,
-                "Pkg": 1,  # 각 단위는 1 패키지
-                "G.W(kgs)": unit_gw,
-                "CBM": unit_cbm
-            })
-    
-    return pd.DataFrame(exploded_rows)
-
-def exact_subset_match(pkgs_df, k, gw_tgt, cbm_tgt, tol=TOL):
-    idxs = list(pkgs_df.index)
-    arr_gw  = pkgs_df["G.W(kgs)"].values
-    arr_cbm = pkgs_df["CBM"].values
-    for comb in combinations(range(len(idxs)), k):
-        gw = float(np.sum(arr_gw[list(comb)]))
-        cbm = float(np.sum(arr_cbm[list(comb)]))
-        if close2(gw, gw_tgt, tol) and close2(cbm, cbm_tgt, tol):
-            picked = [idxs[i] for i in comb]
-            return True, picked, gw, cbm
-    return False, [], None, None
-
-def greedy_init(pkgs_df, k, gw_tgt, cbm_tgt):
-    w = pkgs_df["G.W(kgs)"].values
-    c = pkgs_df["CBM"].values
-    ratio_target = gw_tgt / max(cbm_tgt, 1e-6)
-    ratio = w / np.clip(c, 1e-6, None)
-    score2 = np.abs(ratio - ratio_target)
-    gw_norm = (w / max(gw_tgt, 1e-6))
-    cbm_norm = (c / max(cbm_tgt, 1e-6))
-    score = np.abs(gw_norm - gw_norm.mean()) + np.abs(cbm_norm - cbm_norm.mean())
-    s = 0.6*score2 + 0.4*score
-    picked = list(pkgs_df.assign(_s=s).sort_values("_s").index[:k])
-    gw_sum = float(pkgs_df.loc[picked, "G.W(kgs)"].sum())
-    cbm_sum = float(pkgs_df.loc[picked, "CBM"].sum())
-    return picked, gw_sum, cbm_sum
-
-def local_swap_improve(pkgs_df, picked, gw_tgt, cbm_tgt, tol=TOL, max_iter=400):
-    picked = list(picked)
-    all_idx = set(pkgs_df.index)
-    cur_gw  = float(pkgs_df.loc[picked, "G.W(kgs)"].sum())
-    cur_cbm = float(pkgs_df.loc[picked, "CBM"].sum())
-    def err(gw, cbm): return abs(gw - gw_tgt) + abs(cbm - cbm_tgt)
-    best_err = err(cur_gw, cur_cbm)
-    for _ in range(max_iter):
-        improved = False
-        for out_i in list(picked):
-            if out_i not in picked: 
-                continue
-            for in_i in list(all_idx - set(picked)):
-                new_gw  = cur_gw  - pkgs_df.at[out_i, "G.W(kgs)"] + pkgs_df.at[in_i, "G.W(kgs)"]
-                new_cbm = cur_cbm - pkgs_df.at[out_i, "CBM"]      + pkgs_df.at[in_i, "CBM"]
-                new_err = err(new_gw, new_cbm)
-                if new_err < best_err:
-                    new_picked = picked.copy()
-                    if out_i in new_picked:
-                        new_picked.remove(out_i)
-                        new_picked.append(in_i)
-                        picked = new_picked
-                        cur_gw, cur_cbm, best_err = new_gw, new_cbm, new_err
-                        improved = True
-                        if close2(cur_gw, gw_tgt, tol) and close2(cur_cbm, cbm_tgt, tol):
-                            return picked, cur_gw, cur_cbm
-            if improved: break
-        if not improved: break
-    return picked, cur_gw, cur_cbm
-
-def robust_greedy_local(values_gw, values_cbm, k, gw_tgt, cbm_tgt, tol=TOL, max_iter=300):
+    hits = [code_pos] if len(code_pos) else []
+    if parts is not None and parts in index["by_parts"]:
+        hits.append(index["by_parts"][parts])
+    if not hits:
+        return np.empty(0, dtype=np.intp)
+
+    pos = np.unique(np.concatenate(hits))
+
+    # 월 파티션: 후보 풀에 _ym 값이 하나라도 있을 때만 적용 (기존 스캔 방식과 동일)
+    if ym is not None and index["ym"] is not None:
+        ym_vals = index["ym"][pos]
+        if pd.notna(ym_vals).any():
+            pos = pos[ym_vals == ym]
+    return pos
+
+def join_expanded_codes(df_inv, df_all, col_full="HVDC CODE"):
     """
-    Enhanced robust greedy local search (ONTOLOGY 기반 개선)
-    기존 greedy_local 함수의 mutation 문제를 해결한 robust 버전
-    
+    인보이스 RAW 코드 확장 프레임과 ALL FULL 코드를 1회 조인
+
     Args:
-        values_gw, values_cbm: numpy arrays of weights/volumes
-        k: number of items to select
-        gw_tgt, cbm_tgt: target weights/volumes
-        tol: tolerance for matching
-        max_iter: maximum iterations for local search
-        
+        df_inv: 인보이스 DataFrame
+        df_all: ALL DataFrame
+        col_full: FULL 코드 컬럼명
+
     Returns:
-        tuple: (success, picked_indices, sum_gw, sum_cbm)
+        tuple: ((raw_code, full_code) 확장 프레임, RAW 코드 → ALL 행 위치 배열)
     """
-    n = len(values_gw)
-    if n < k or k <= 0:
-        return False, [], None, None
-        
-    # Enhanced scoring system with ontology-based weights
-    ratio_target = gw_tgt / max(cbm_tgt, 1e-6)
-    ratio = values_gw / np.clip(values_cbm, 1e-6, None)
-    score2 = np.abs(ratio - ratio_target)
-    
-    # Normalized scores for balance
-    gw_norm = (values_gw / max(gw_tgt, 1e-6))
-    cbm_norm = (values_cbm / max(cbm_tgt, 1e-6))
-    score = np.abs(gw_norm - gw_norm.mean()) + np.abs(cbm_norm - cbm_norm.mean())
-    
-    # Combined scoring with enhanced weights
-    combined_score = 0.6 * score2 + 0.4 * score
-    
-    # Initial greedy selection - immutable approach
-    picked_indices = list(np.argsort(combined_score)[:k])
-    gw = float(values_gw[picked_indices].sum())
-    cbm = float(values_cbm[picked_indices].sum())
-    
-    # Early return if already optimal
-    if close2(gw, gw_tgt, tol) and close2(cbm, cbm_tgt, tol):
-        return True, picked_indices, gw, cbm
-
-    def calculate_error(indices):
-        """Calculate total error for given indices"""
-        if len(indices) == 0:
-            return float('inf')
-        gw_sum = values_gw[indices].sum()
-        cbm_sum = values_cbm[indices].sum()
-        return abs(gw_sum - gw_tgt) + abs(cbm_sum - cbm_tgt)
-
-    # Robust local search with immutable operations
-    best_indices = picked_indices.copy()
-    best_error = calculate_error(np.array(best_indices))
-    
-    for iteration in range(max_iter):
-        improved = False
-        current_indices = best_indices.copy()
-        
-        # Try swapping each selected item
-        for i in range(k):
-            current_set = set(current_indices)
-            out_idx = current_indices[i]
-            
-            best_local_error = best_error
-            best_replacement = None
-            
-            # Try all possible replacements
-            for in_idx in range(n):
-                if in_idx in current_set:
-                    continue
-                    
-                # Create trial indices without mutation
-                trial_indices = current_indices.copy()
-                trial_indices[i] = in_idx
-                
-                trial_error = calculate_error(np.array(trial_indices))
-                
-                if trial_error < best_local_error:
-                    best_local_error = trial_error
-                    best_replacement = in_idx
-                    
-                    # Early termination if perfect match found
-                    if trial_error == 0:
-                        break
-            
-            # Apply best improvement if found
-            if best_replacement is not None and best_local_error < best_error:
-                current_indices[i] = best_replacement
-                best_error = best_local_error
-                improved = True
-                
-                # Check if target reached
-                gw_sum = float(values_gw[current_indices].sum())
-                cbm_sum = float(values_cbm[current_indices].sum())
-                if close2(gw_sum, gw_tgt, tol) and close2(cbm_sum, cbm_tgt, tol):
-                    return True, current_indices, gw_sum, cbm_sum
-        
-        # Update best solution if improved
-        if improved:
-            best_indices = current_indices.copy()
-        else:
-            break  # No improvement found, terminate
-    
-    # Final calculation
-    final_gw = float(values_gw[best_indices].sum())
-    final_cbm = float(values_cbm[best_indices].sum())
-    success = close2(final_gw, gw_tgt, tol) and close2(final_cbm, cbm_tgt, tol)
-    
-    return success, best_indices, final_gw, final_cbm
+    expansion = expand_code_frame(df_inv[col_full])
+    all_codes = pd.DataFrame({"full_code": df_all[col_full].to_numpy(dtype=object),
+                              "pos": np.arange(len(df_all), dtype=np.intp)})
+    joined = expansion.merge(all_codes, on="full_code", how="inner")
+    code_pos = {raw: np.unique(g) for raw, g in joined.groupby("raw_code", sort=False)["pos"]}
+    return expansion, code_pos
 
-def find_subset_match(pkgs_df, k, gw_tgt, cbm_tgt, tol=TOL):
+def lookup_fuzzy_candidates(index, codes, ym=None):
     """
-    Enhanced subset matching with robust algorithms (ONTOLOGY 기반)
+    퍼지 fallback 후보 조회: 확장 코드별 유사 코드 Top-k → 해당 FULL 코드 행 위치
+
+    Args:
+        index: build_candidate_index(fuzzy=True) 결과
+        codes: 확장된 FULL 코드 집합
+        ym: 월 필터 값 (None이면 필터 미적용)
+
+    Returns:
+        tuple: (ALL 행 위치, [(정규화 코드, 유사도)] 유사도 내림차순)
     """
-    N = len(pkgs_df)
-    if N < k or k <= 0:
-        return {"found": False, "picked": [], "sum_gw": None, "sum_cbm": None, "method": "invalid"}
-    
-    # For small datasets, use exact matching
-    if N <= MAX_EXACT_N:
-        ok, picked, gw, cbm = exact_subset_match(pkgs_df, k, gw_tgt, cbm_tgt, tol)
-        return {"found": ok, "picked": picked, "sum_gw": gw, "sum_cbm": cbm, "method": "exact"}
-    
-    # For large datasets, use robust greedy-local approach
-    values_gw = pkgs_df["G.W(kgs)"].values.astype(float)
-    values_cbm = pkgs_df["CBM"].values.astype(float)
-    
-    success, picked_indices, sum_gw, sum_cbm = robust_greedy_local(
-        values_gw, values_cbm, k, gw_tgt, cbm_tgt, tol
-    )
-    
-    # Convert indices back to DataFrame indices
-    picked_df_indices = [pkgs_df.index[i] for i in picked_indices] if picked_indices else []
-    
-    return {
-        "found": success,
-        "picked": picked_df_indices,
-        "sum_gw": sum_gw,
-        "sum_cbm": sum_cbm,
-        "method": "robust-greedy-local"
-    }
+    top_k = FUZZY_MATCHING.get("top_k", 3)
+    best = {}
+    for c in codes:
+        for code, score in index["fuzzy"].query(c, top_k=top_k,
+                                                threshold=FUZZY_MATCHING.get("threshold", 0.9),
+                                                max_candidates=FUZZY_MATCHING.get("max_candidates", 50)):
+            best[code] = max(score, best.get(code, 0.0))
+    matches = sorted(best.items(), key=lambda x: (-x[1], x[0]))[:top_k]
+    hits = [index["by_code"][raw] for code, _ in matches for raw in index["fuzzy"].originals(code)]
+    code_pos = np.concatenate(hits) if hits else np.empty(0, dtype=np.intp)
+    return lookup_candidates(index, code_pos, None, ym=ym), matches
 
-def find_subset_match_exploded(cand_df, k, gw_tgt, cbm_tgt, tol=TOL):
+def load_inputs(invoice_path=INVOICE_PATH, all_path=ALL_PATH):
     """
-    Exploded 패키지 단위 매칭 (ONTOLOGY 기반 개선)
-    각 패키지를 개별 단위로 분해하여 더 정확한 매칭 수행
-    
+    인보이스/ALL 엑셀 로드 및 전처리 (숫자 변환, 월 파티션, 코드 파트 채움)
+
     Args:
-        cand_df: candidate DataFrame
-        k: target package count
-        gw_tgt, cbm_tgt: target weights/volumes
-        tol: tolerance
-        
+        invoice_path: 인보이스 엑셀 경로
+        all_path: ALL 엑셀 경로
+
     Returns:
-        dict: matching result
+        tuple: (df_inv, df_all)
     """
-    if cand_df.empty or k <= 0:
-        return {"found": False, "picked": [], "sum_gw": None, "sum_cbm": None, "method": "no-candidate-exploded"}
-    
-    # Explode by package units
-    units = explode_by_pkg(cand_df[["Pkg", "G.W(kgs)", "CBM"]])
-    
-    if len(units) == 0:
-        return {"found": False, "picked": [], "sum_gw": None, "sum_cbm": None, "method": "no-units-exploded"}
-    
-    # Extract values for matching
-    vals_gw = units["G.W(kgs)"].values.astype(float)
-    vals_cbm = units["CBM"].values.astype(float)
-    
-    # Choose matching strategy based on size
-    if len(units) <= MAX_EXACT_N:
-        # Exact matching for small datasets
-        arr_gw = vals_gw
-        arr_cbm = vals_cbm
-        found_exact = False
-        picked_indices = []
-        sum_gw = sum_cbm = None
-        
-        for comb in combinations(range(len(arr_gw)), k):
-            gw = float(np.sum(arr_gw[list(comb)]))
-            cbm = float(np.sum(arr_cbm[list(comb)]))
-            if close2(gw, gw_tgt, tol) and close2(cbm, cbm_tgt, tol):
-                picked_indices = list(comb)
-                sum_gw, sum_cbm = gw, cbm
-                found_exact = True
-                break
-        
-        return {
-            "found": found_exact,
-            "picked": picked_indices,
-            "sum_gw": sum_gw,
-            "sum_cbm": sum_cbm,
-            "method": "exact-exploded"
-        }
+    # Load
+    df_inv = pd.read_excel(invoice_path, sheet_name=0)
+    df_all = pd.read_excel(all_path, sheet_name=0)
+
+    # Numeric
+    for col in ["No. of Pkgs", "Weight (kg)", "CBM"]:
+        if col in df_inv.columns: df_inv[col] = to_num(df_inv[col])
+    for col in ["Pkg", "G.W(kgs)", "CBM"]:
+        if col in df_all.columns: df_all[col] = to_num(df_all[col])
+
+    # Dates
+    if ALL_DATE_COL in df_all.columns:
+        df_all["_ym"] = pd.to_datetime(df_all[ALL_DATE_COL], errors="coerce").dt.to_period("M").astype(str)
     else:
-        # Use robust greedy-local for large datasets
-        success, picked_indices, sum_gw, sum_cbm = robust_greedy_local(
-            vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol
-        )
-        
-        return {
-            "found": success,
-            "picked": picked_indices,
-            "sum_gw": sum_gw,
-            "sum_cbm": sum_cbm,
-            "method": "robust-greedy-local-exploded"
-        }
+        df_all["_ym"] = None
+    if INV_DATE_COL in df_inv.columns:
+        df_inv["_ym"] = pd.to_datetime(df_inv[INV_DATE_COL], errors="coerce").dt.to_period("M").astype(str)
+    else:
+        df_inv["_ym"] = None
+
+    # Parts fill
+    df_inv = extract_parts(df_inv, col_full="HVDC CODE")
+    df_all = extract_parts(df_all, col_full="HVDC CODE")
+    return df_inv, df_all
 
-def enhanced_subset_matching(cand_df, k, gw_tgt, cbm_tgt, tol=TOL, use_exploded=True):
+def match_invoice_codes(df_inv, df_all, workers=PARALLEL_WORKERS, chunksize=PARALLEL_CHUNKSIZE,
+                        cache_db=MATCH_CACHE_DB, fuzzy=FUZZY_FALLBACK, codes=None, cand_index=None,
+                        total_seconds=TIMEOUT_SECONDS, state_db=REVALIDATE_DB):
     """
-    Enhanced subset matching with multiple strategies (ONTOLOGY 기반)
-    
+    인보이스 코드별 후보 풀 구성 → 부분집합 매칭 → 결과/상세 행 생성
+
+    1) 코드별 후보 풀과 unit 배열 준비 (부모 프로세스)
+    2) 매칭 작업만 numpy 배열로 워커에 전달 (workers > 1이면 프로세스 풀)
+    3) 결과를 원래 코드 순서대로 병합 → 직렬 실행과 동일한 출력
+
     Args:
-        cand_df: candidate DataFrame
-        k: target package count
-        gw_tgt, cbm_tgt: target weights/volumes
-        tol: tolerance
-        use_exploded: whether to use exploded matching
-        
+        df_inv: load_inputs 인보이스 DataFrame
+        df_all: load_inputs ALL DataFrame
+        workers: 워커 프로세스 수 (0/1이면 직렬)
+        chunksize: 워커당 한 번에 전달할 코드 수
+        cache_db: 매칭 결과 캐시 DuckDB 경로 (None이면 캐시 미사용)
+        fuzzy: 후보 없음 시 퍼지 코드 fallback 사용 여부
+        codes: 처리할 인보이스 RAW 코드 목록 (None이면 전체, 스트리밍 청크용)
+        cand_index: 미리 만든 build_candidate_index 결과 (None이면 생성)
+        total_seconds: 이번 호출의 전체 탐색 시간 예산
+        state_db: 코드별 지문/결과 저장 DuckDB 경로 (None이면 증분 재검증 미사용)
+
     Returns:
-        dict: best matching result
+        tuple: (df_match, df_detail)
     """
-    if cand_df.empty or k <= 0:
-        return {"found": False, "picked": [], "sum_gw": None, "sum_cbm": None, "method": "no-candidate"}
-    
-    results = []
-    
-    # Strategy 1: Original DataFrame matching
-    result1 = find_subset_match(cand_df[["G.W(kgs)", "CBM"]], k, gw_tgt, cbm_tgt, tol)
-    if result1["found"]:
-        results.append(result1)
-    
-    # Strategy 2: Exploded matching (if enabled)
-    if use_exploded and "Pkg" in cand_df.columns:
-        result2 = find_subset_match_exploded(cand_df, k, gw_tgt, cbm_tgt, tol)
-        if result2["found"]:
-            results.append(result2)
-    
-    # Return best result (prioritize exact matches, then by accuracy)
-    if not results:
-        return result1  # Return original result even if not found
-    
-    # Prioritize exact methods, then by accuracy
-    exact_results = [r for r in results if "exact" in r["method"]]
-    if exact_results:
-        return exact_results[0]
-    
-    # Among non-exact results, pick the one with smallest error
-    def calculate_total_error(result):
-        if (not result["found"] or 
-            result["sum_gw"] is None or 
-            result["sum_cbm"] is None or
-            len(result.get("picked", [])) == 0):
-            return float('inf')
-        gw_error = abs(result["sum_gw"] - gw_tgt)
-        cbm_error = abs(result["sum_cbm"] - cbm_tgt)
-        return gw_error + cbm_error
-    
-    best_result = min(results, key=calculate_total_error)
-    return best_result
-
-def row_key(ix, row):
-    return f"{ix}|GW={row['G.W(kgs)']:.2f}|CBM={row['CBM']:.2f}"
-
-# Load
-df_inv = pd.read_excel(INVOICE_PATH, sheet_name=0)
-df_all = pd.read_excel(ALL_PATH, sheet_name=0)
-
-# Numeric
-for col in ["No. of Pkgs", "Weight (kg)", "CBM"]:
-    if col in df_inv.columns: df_inv[col] = to_num(df_inv[col])
-for col in ["Pkg", "G.W(kgs)", "CBM"]:
-    if col in df_all.columns: df_all[col] = to_num(df_all[col])
-
-# Dates
-if ALL_DATE_COL in df_all.columns:
-    df_all["_ym"] = pd.to_datetime(df_all[ALL_DATE_COL], errors="coerce").dt.to_period("M").astype(str)
-else:
-    df_all["_ym"] = None
-if INV_DATE_COL in df_inv.columns:
-    df_inv["_ym"] = pd.to_datetime(df_inv[INV_DATE_COL], errors="coerce").dt.to_period("M").astype(str)
-else:
-    df_inv["_ym"] = None
-
-# Parts fill
-df_inv = extract_parts(df_inv, col_full="HVDC CODE")
-df_all = extract_parts(df_all, col_full="HVDC CODE")
-
-match_rows = []
-detail_rows = []
-
-for raw_code in df_inv["HVDC CODE"].dropna().unique():
-    inv_rows = df_inv[df_inv["HVDC CODE"] == raw_code]
-    # Expand combined codes from raw_code
-    expanded = expand_combined_codes(raw_code)
-    
-    # Extract REV NO information for identification
-    rev_nos = inv_rows["REV NO"].dropna().unique() if "REV NO" in inv_rows.columns else []
-    rev_no_list = ", ".join([str(rev) for rev in sorted(rev_nos)]) if len(rev_nos) > 0 else "N/A"
-    rev_no_count = len(rev_nos) if len(rev_nos) > 0 else 0
-    
-    # Enhanced vendor code analysis (from invoice parts)
-    p1, p2, p3, p4 = inv_rows.iloc[0]["HVDC CODE 1"], inv_rows.iloc[0]["HVDC CODE 2"], inv_rows.iloc[0]["HVDC CODE 3"], inv_rows.iloc[0]["HVDC CODE 4"]
-    vendor = str(p3).upper() if p3 else None
-    
-    # Enhanced vendor validation with ontology system
-    is_primary_vendor = is_valid_hvdc_vendor(vendor, extended_mode=False)  # HE, SIM only
-    is_extended_vendor = is_valid_hvdc_vendor(vendor, extended_mode=True)  # All known vendors
-    
-    if is_primary_vendor:
-        vmemo = "PRIMARY_VENDOR"
-    elif is_extended_vendor:
-        vmemo = "EXTENDED_VENDOR"
-    else:
-        vmemo = "NO_DATA"
-        
-    ym = inv_rows["_ym"].dropna().unique()
-    ym = ym[0] if len(ym)>0 else None
-
-    # Build candidate pool as union of:
-    #  - FULL code in expanded set
-    #  - OR parts(1..4) exactly equal to invoice parts (for each expanded code we treat same parts base)
-    cand = df_all[
-        (df_all["HVDC CODE"].isin(expanded)) |
-        ((df_all["HVDC CODE 1"] == p1) & (df_all["HVDC CODE 2"] == p2) & (df_all["HVDC CODE 3"] == p3) & (df_all["HVDC CODE 4"] == p4))
-    ].copy()
-
-    # Enhanced filtering logic - allow extended vendors but prefer primary vendors
-    if not is_extended_vendor:
-        cand = cand.iloc[0:0]  # empty if vendor not recognized at all
-
-    if USE_MONTH_FILTER and ym is not None and cand["_ym"].notna().any():
-        cand = cand[cand["_ym"] == ym]
-
-    # Targets
-    k = int(inv_rows["No. of Pkgs"].sum(skipna=True))
-    gw_tgt = float(inv_rows["Weight (kg)"].sum(skipna=True))
-    cbm_tgt = float(inv_rows["CBM"].sum(skipna=True))
-
-    # 🔧 PATCH: Pkg PASS 판정을 sum(Pkg) 기준으로 변경
-    N = len(cand)
-    all_pkgs_sum = int(cand["Pkg"].fillna(0).sum()) if len(cand) > 0 else 0
-    pkg_pass = (all_pkgs_sum >= k)
-
-    # 🔧 PATCH: 후보 없음/패키지 부족시 조기 종료
-    if len(cand) == 0 or all_pkgs_sum == 0 or k <= 0:
-        result = {"found": False, "picked": [], "sum_gw": None, "sum_cbm": None, "method": "no-candidate"}
-        err_gw = err_cbm = None
-        gw_ok = cbm_ok = False
-        match_status = "FAIL"
-    else:
-        # 🔧 PATCH: 항상 unit 단위로 변환 (Pkg 수만큼 분해, GW/CBM은 Pkg로 균등분배)
-        units = explode_by_pkg(cand[["Pkg", "G.W(kgs)", "CBM"]])
-        
-        if len(units) == 0:
-            result = {"found": False, "picked": [], "sum_gw": None, "sum_cbm": None, "method": "no-units"}
-            err_gw = err_cbm = None
-            gw_ok = cbm_ok = False
-            match_status = "FAIL"
+    if codes is not None:
+        df_inv = df_inv[df_inv["HVDC CODE"].isin(codes)]
+    # 후보 풀 인덱스 (ALL 1회 스캔) + 인보이스 코드별 행 위치
+    if cand_index is None:
+        cand_index = build_candidate_index(df_all, fuzzy=fuzzy)
+    expansion, expanded_pos = join_expanded_codes(df_inv, df_all)
+    expanded_sets = expansion.groupby("raw_code", sort=False)["full_code"].agg(set).to_dict()
+    inv_groups = df_inv.groupby("HVDC CODE", sort=False).indices
+
+    contexts = []
+    tasks = []
+
+    for raw_code in df_inv["HVDC CODE"].dropna().unique():
+        inv_rows = df_inv.iloc[inv_groups[raw_code]]
+        # Expand combined codes from raw_code (확장/ALL 조인은 join_expanded_codes에서 1회)
+        expanded = expanded_sets.get(raw_code, set())
+
+        # Extract REV NO information for identification
+        rev_nos = inv_rows["REV NO"].dropna().unique() if "REV NO" in inv_rows.columns else []
+        rev_no_list = ", ".join([str(rev) for rev in sorted(rev_nos)]) if len(rev_nos) > 0 else "N/A"
+        rev_no_count = len(rev_nos) if len(rev_nos) > 0 else 0
+
+        # Enhanced vendor code analysis (from invoice parts)
+        p1, p2, p3, p4 = inv_rows.iloc[0]["HVDC CODE 1"], inv_rows.iloc[0]["HVDC CODE 2"], inv_rows.iloc[0]["HVDC CODE 3"], inv_rows.iloc[0]["HVDC CODE 4"]
+        vendor = str(p3).upper() if p3 else None
+
+        # Enhanced vendor validation with ontology system
+        is_primary_vendor = is_valid_hvdc_vendor(vendor, extended_mode=False)  # HE, SIM only
+        is_extended_vendor = is_valid_hvdc_vendor(vendor, extended_mode=True)  # All known vendors
+
+        if is_primary_vendor:
+            vmemo = "PRIMARY_VENDOR"
+        elif is_extended_vendor:
+            vmemo = "EXTENDED_VENDOR"
+        else:
+            vmemo = "NO_DATA"
+
+        ym = inv_rows["_ym"].dropna().unique()
+        ym = ym[0] if len(ym)>0 else None
+
+        # Build candidate pool as union of:
+        #  - FULL code in expanded set
+        #  - OR parts(1..4) exactly equal to invoice parts (for each expanded code we treat same parts base)
+        # Enhanced filtering logic - allow extended vendors but prefer primary vendors
+        if is_extended_vendor:
+            cand_pos = lookup_candidates(cand_index, expanded_pos.get(raw_code, np.empty(0, dtype=np.intp)),
+                                         (p1, p2, p3, p4),
+                                         ym=ym if USE_MONTH_FILTER else None)
+        else:
+            cand_pos = np.empty(0, dtype=np.intp)  # empty if vendor not recognized at all
+        # 퍼지 fallback: FULL/파트 일치 후보가 없을 때만 유사 코드 후보 사용
+        fuzzy_matches = []
+        if fuzzy and is_extended_vendor and len(cand_pos) == 0:
+            cand_pos, fuzzy_matches = lookup_fuzzy_candidates(cand_index, expanded,
+                                                              ym=ym if USE_MONTH_FILTER else None)
+        cand = df_all.iloc[cand_pos]
+
+        # Targets
+        k = int(inv_rows["No. of Pkgs"].sum(skipna=True))
+        gw_tgt = float(inv_rows["Weight (kg)"].sum(skipna=True))
+        cbm_tgt = float(inv_rows["CBM"].sum(skipna=True))
+
+        # 🔧 PATCH: Pkg PASS 판정을 sum(Pkg) 기준으로 변경
+        N = len(cand)
+        all_pkgs_sum = int(cand["Pkg"].fillna(0).sum()) if len(cand) > 0 else 0
+
+        ctx = {
+            "raw_code": raw_code, "expanded": expanded,
+            "rev_no_list": rev_no_list, "rev_no_count": rev_no_count, "fuzzy_matches": fuzzy_matches,
+            "vendor": vendor, "vmemo": vmemo,
+            "is_primary_vendor": is_primary_vendor, "is_extended_vendor": is_extended_vendor,
+            "cand": cand, "units": None, "N": N, "all_pkgs_sum": all_pkgs_sum,
+            "k": k, "gw_tgt": gw_tgt, "cbm_tgt": cbm_tgt,
+        }
+        ctx["multistart"] = multistart_params(vendor)
+        if state_db:
+            ctx["fingerprint"] = code_fingerprint(inv_rows, cand, (TOL, MAX_EXACT_N, ctx["multistart"], fuzzy_matches))
+        contexts.append(ctx)
+
+    # 증분 재검증: 지문이 같은 코드는 저장된 결과 재사용 (solve 생략)
+    store = RevalidationStore(state_db) if state_db else None
+    if store is not None:
+        stored = store.get_many({ctx["raw_code"]: ctx["fingerprint"] for ctx in contexts})
+        for ctx in contexts:
+            if ctx["raw_code"] in stored:
+                ctx["reused"] = stored[ctx["raw_code"]]
+
+    # restart 병렬은 코드 단위 직렬 실행일 때만 (워커 안에서 프로세스 풀 중첩 방지)
+    restart_workers = MULTISTART.get("workers", 0) if workers <= 1 else 0
+    for ctx in contexts:
+        if "reused" in ctx:
+            continue
+        cand, k, gw_tgt, cbm_tgt = ctx["cand"], ctx["k"], ctx["gw_tgt"], ctx["cbm_tgt"]
+        all_pkgs_sum = ctx["all_pkgs_sum"]
+        # 🔧 PATCH: 후보 없음/패키지 부족시 조기 종료
+        if len(cand) == 0 or all_pkgs_sum == 0 or k <= 0:
+            ctx["result"] = {"found": False, "picked": [], "sum_gw": None, "sum_cbm": None, "method": "no-candidate"}
         else:
-            vals_gw = units["G.W(kgs)"].values.astype(float)
-            vals_cbm = units["CBM"].values.astype(float)
-            
-            if len(units) <= MAX_EXACT_N:
-                # 🔧 PATCH: 정확 매칭 (exploded 기준)
-                found_exact = False
-                picked_indices = []
-                sum_gw = sum_cbm = None
-                
-                for comb in combinations(range(len(vals_gw)), k):
-                    gw = float(np.sum(vals_gw[list(comb)]))
-                    cbm = float(np.sum(vals_cbm[list(comb)]))
-                    if close2(gw, gw_tgt, TOL) and close2(cbm, cbm_tgt, TOL):
-                        picked_indices = list(comb)
-                        sum_gw, sum_cbm = gw, cbm
-                        found_exact = True
-                        break
-                
-                result = {
-                    "found": found_exact,
-                    "picked": picked_indices,
-                    "sum_gw": sum_gw,
-                    "sum_cbm": sum_cbm,
-                    "method": "exact-exploded"
-                }
+            # 🔧 PATCH: 항상 unit 단위로 변환 (Pkg 수만큼 분해, GW/CBM은 Pkg로 균등분배)
+            units = explode_by_pkg(cand[["Pkg", "G.W(kgs)", "CBM"]])
+            ctx["units"] = units
+
+            if len(units) == 0:
+                ctx["result"] = {"found": False, "picked": [], "sum_gw": None, "sum_cbm": None, "method": "no-units"}
             else:
-                # 🔧 PATCH: Robust 그리디-로컬 매칭 (exploded 기준)
-                success, picked_indices, sum_gw, sum_cbm = robust_greedy_local(
-                    vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, TOL
-                )
-                
-                result = {
-                    "found": success,
-                    "picked": picked_indices,
-                    "sum_gw": sum_gw,
-                    "sum_cbm": sum_cbm,
-                    "method": "robust-greedy-local-exploded"
-                }
-            
+                # 매칭 작업: 워커에는 numpy 배열과 스칼라만 전달
+                ctx["task_id"] = len(tasks)
+                restarts, seed, max_evals = ctx["multistart"]
+                tasks.append((units["G.W(kgs)"].values.astype(float), units["CBM"].values.astype(float),
+                              k, gw_tgt, cbm_tgt, TOL, MAX_EXACT_N, max_evals, restarts, seed, restart_workers))
+
+    if workers > 1:
+        print(f"[INFO] Parallel matching: {len(tasks)} codes, workers={workers}, chunksize={chunksize}")
+    cache = MatchCache(cache_db) if cache_db else None
+    try:
+        results = run_match_tasks(tasks, workers=workers, chunksize=chunksize,
+                                  total_seconds=total_seconds, cache=cache)
+    finally:
+        if cache is not None:
+            print(f"🗄️ Match cache: hit={cache.hits}, miss={cache.misses} ({cache_db})")
+            cache.close()
+    exhausted = sum(1 for r in results if r.get("budget_exhausted"))
+    if exhausted:
+        print(f"⏱️ 탐색 예산 소진: {exhausted}개 코드 (best-so-far 결과 사용)")
+
+    match_rows = []
+    pick_frames = []
+    solved_items = []
+
+    for ctx in contexts:
+        if "reused" in ctx:
+            row, picks = ctx["reused"]
+            if picks["Picked_Unit_Idx"]:
+                pick_frames.append(pd.DataFrame({"_match_row": len(match_rows), **picks}))
+            match_rows.append(row)
+            continue
+
+        raw_code, expanded, cand, units = ctx["raw_code"], ctx["expanded"], ctx["cand"], ctx["units"]
+        rev_no_list, rev_no_count = ctx["rev_no_list"], ctx["rev_no_count"]
+        vendor, vmemo = ctx["vendor"], ctx["vmemo"]
+        k, gw_tgt, cbm_tgt = ctx["k"], ctx["gw_tgt"], ctx["cbm_tgt"]
+        pkg_pass = (ctx["all_pkgs_sum"] >= k)
+
+        if "task_id" in ctx:
+            result = results[ctx["task_id"]]
             # 🔧 PATCH: 에러 및 매치 상태 계산
             err_gw = None if result["sum_gw"] is None else (result["sum_gw"] - gw_tgt)
             err_cbm = None if result["sum_cbm"] is None else (result["sum_cbm"] - cbm_tgt)
             gw_ok = (result["sum_gw"] is not None and abs(err_gw) <= TOL)
             cbm_ok = (result["sum_cbm"] is not None and abs(err_cbm) <= TOL)
             match_status = "PASS" if (pkg_pass and gw_ok and cbm_ok) else "FAIL"
-
-    # 🔧 PATCH: Picked keys 처리 (exploded unit 기준)
-    picked_keys = []
-    if result["picked"] and result["method"] not in ["no-candidate", "no-units"]:
-        # exploded unit에서 선택된 인덱스들 처리
-        if "exploded" in result["method"]:
-            # units DataFrame에서 정보 추출
-            if 'units' in locals() and len(units) > 0:
-                for unit_idx in result["picked"]:
-                    if unit_idx < len(units):
-                        unit_row = units.iloc[unit_idx]
-                        original_idx = unit_row.get("Original_Index", unit_idx)
-                        unit_gw = unit_row["G.W(kgs)"]
-                        unit_cbm = unit_row["CBM"]
-                        picked_keys.append(f"Unit_{unit_idx}|GW={unit_gw:.3f}|CBM={unit_cbm:.3f}")
-                        
-                        # 원본 행 정보도 추가 (있는 경우)
-                        if original_idx in cand.index:
-                            orig_row = cand.loc[original_idx]
-                            detail_rows.append({
-                                "REV_NO_List": rev_no_list,
-                                "REV_NO_Count": rev_no_count,
-                                "Invoice_RAW_CODE": raw_code,
-                                "Expanded_Code_Member?": orig_row["HVDC CODE"] in expanded,
-                                "HVDC CODE": orig_row["HVDC CODE"],
-                                "Picked_Unit_Idx": unit_idx,
-                                "Original_Row_Idx": original_idx,
-                                "Unit_GW": unit_gw,
-                                "Unit_CBM": unit_cbm,
-                                "Original_Total_GW": orig_row["G.W(kgs)"],
-                                "Original_Total_CBM": orig_row["CBM"],
-                                "Original_Pkg_Count": orig_row.get("Pkg", 1),
-                                "_ym": orig_row.get("_ym", None),
-                                "Vendor(code3)": vendor,
-                                "Vendor_Type": vmemo,
-                                "Warehouse_Type": classify_warehouse_type(orig_row.get("Location", "")),
-                                "Code_Normalized": normalize_hvdc_code(orig_row["HVDC CODE"])
-                            })
         else:
-            # 기존 방식 (비-exploded)
-            for ix in result["picked"]:
-                if ix in cand.index:
-                    row = cand.loc[ix]
-                    picked_keys.append(row_key(ix, row))
-                    detail_rows.append({
-                        "REV_NO_List": rev_no_list,
-                        "REV_NO_Count": rev_no_count,
-                        "Invoice_RAW_CODE": raw_code,
-                        "Expanded_Code_Member?": row["HVDC CODE"] in expanded,
-                        "HVDC CODE": row["HVDC CODE"],
-                        "Picked_Idx": ix,
-                        "GW": row["G.W(kgs)"],
-                        "CBM": row["CBM"],
-                        "_ym": row.get("_ym", None),
-                        "Vendor(code3)": vendor,
-                        "Vendor_Type": vmemo,
-                        "Warehouse_Type": classify_warehouse_type(row.get("Location", "")),
-                        "Code_Normalized": normalize_hvdc_code(row["HVDC CODE"])
-                    })
-
-    # Enhanced result analysis
-    method_used = result.get("method", "unknown")
-    is_exploded = "exploded" in method_used
-    is_exact = "exact" in method_used
-    is_robust = "robust" in method_used
-    
-    # 🔧 PATCH: 권장 출력 컬럼으로 결과 저장 (리포트 가독성↑)
-    match_rows.append({
-        # 🎯 식별 정보
-        "REV_NO_List": rev_no_list,
-        "REV_NO_Count": rev_no_count,
-        "Invoice_RAW_CODE": raw_code,
-        "Expanded_Set": ", ".join(sorted(expanded)),
-        
-        # 🎯 패키지 분석 (핵심!)
-        "Invoice_Pkgs(k)": k,
-        "All_Pkgs(sum)": all_pkgs_sum,  # 🔧 PATCH: sum(Pkg) 기준 추가
-        "Candidate_Rows(N)": N,
-        "Pkg_Status": "PASS" if pkg_pass else "FAIL",  # 🔧 PATCH: sum(Pkg) 기준 판정
-        
-        # 🎯 무게/부피 분석
-        "GW_Invoice": gw_tgt,
-        "CBM_Invoice": cbm_tgt,
-        "GW_SumPicked": result.get("sum_gw"),
-        "CBM_SumPicked": result.get("sum_cbm"),
-        "Err_GW": err_gw,  # 🔧 PATCH: 직접 계산된 에러값 사용
-        "Err_CBM": err_cbm,  # 🔧 PATCH: 직접 계산된 에러값 사용
-        
-        # 🎯 매치 결과 (핵심!)
-        "GW_Match(±0.10)": "PASS" if gw_ok else "FAIL",  # 🔧 PATCH: 개선된 판정
-        "CBM_Match(±0.10)": "PASS" if cbm_ok else "FAIL",  # 🔧 PATCH: 개선된 판정
-        "Match_Status": match_status,  # 🔧 PATCH: 종합 매치 상태 추가
-        
-        # 🎯 알고리즘 정보
-        "Method": method_used,
-        "Algorithm_Quality": "EXACT" if is_exact else ("ROBUST" if is_robust else "BASIC"),
-        "Is_Exploded_Method": is_exploded,
-        "Is_Exact_Method": is_exact,
-        "Is_Robust_Method": is_robust,
-        
-        # 🎯 벤더 정보
-        "Vendor(code3)": vendor,
-        "Vendor_Type": vmemo,
-        "Is_Primary_Vendor": is_primary_vendor,
-        "Is_Extended_Vendor": is_extended_vendor,
-        
-        # 🎯 상세 정보
-        "Picked_Count": len(result["picked"]) if result.get("picked") else 0,
-        "Picked_List": "; ".join(picked_keys),
-        "Code_Normalized": normalize_hvdc_code(raw_code),
-        "Data_Scope": vmemo  # Keep for backward compatibility
-    })
+            result = ctx["result"]
+            err_gw = err_cbm = None
+            gw_ok = cbm_ok = False
+            match_status = "FAIL"
+
+        # 🔧 PATCH: Picked unit 처리 (exploded unit 기준) - 인덱스 배열로 보관
+        picked = np.asarray(result["picked"] or [], dtype=np.intp)
+        picks = {"Picked_Unit_Idx": [], "Original_Row_Idx": [], "Unit_GW": [], "Unit_CBM": []}
+        if len(picked) and units is not None and "exploded" in result["method"]:
+            picked = picked[picked < len(units)]
+            picks = {
+                "Picked_Unit_Idx": picked.tolist(),
+                "Original_Row_Idx": units["Original_Index"].to_numpy()[picked].tolist(),
+                "Unit_GW": units["G.W(kgs)"].to_numpy()[picked].tolist(),
+                "Unit_CBM": units["CBM"].to_numpy()[picked].tolist(),
+            }
+            pick_frames.append(pd.DataFrame({"_match_row": len(match_rows), **picks}))
+
+        # Enhanced result analysis
+        method_used = result.get("method", "unknown")
+        is_exploded = "exploded" in method_used
+        is_exact = "exact" in method_used
+        is_robust = "robust" in method_used
+
+        # 🔧 PATCH: 권장 출력 컬럼으로 결과 저장 (리포트 가독성↑)
+        match_rows.append({
+            # 🎯 식별 정보
+            "REV_NO_List": rev_no_list,
+            "REV_NO_Count": rev_no_count,
+            "Invoice_RAW_CODE": raw_code,
+            "Expanded_Set": ", ".join(sorted(expanded)),
+            "Fuzzy_Match": "; ".join(f"{code}({score:.2f})" for code, score in ctx["fuzzy_matches"]),
+
+            # 🎯 패키지 분석 (핵심!)
+            "Invoice_Pkgs(k)": k,
+            "All_Pkgs(sum)": ctx["all_pkgs_sum"],  # 🔧 PATCH: sum(Pkg) 기준 추가
+            "Candidate_Rows(N)": ctx["N"],
+            "Pkg_Status": "PASS" if pkg_pass else "FAIL",  # 🔧 PATCH: sum(Pkg) 기준 판정
+
+            # 🎯 무게/부피 분석
+            "GW_Invoice": gw_tgt,
+            "CBM_Invoice": cbm_tgt,
+            "GW_SumPicked": result.get("sum_gw"),
+            "CBM_SumPicked": result.get("sum_cbm"),
+            "Err_GW": err_gw,  # 🔧 PATCH: 직접 계산된 에러값 사용
+            "Err_CBM": err_cbm,  # 🔧 PATCH: 직접 계산된 에러값 사용
+
+            # 🎯 매치 결과 (핵심!)
+            "GW_Match(±0.10)": "PASS" if gw_ok else "FAIL",  # 🔧 PATCH: 개선된 판정
+            "CBM_Match(±0.10)": "PASS" if cbm_ok else "FAIL",  # 🔧 PATCH: 개선된 판정
+            "Match_Status": match_status,  # 🔧 PATCH: 종합 매치 상태 추가
+
+            # 🎯 알고리즘 정보
+            "Method": method_used,
+            "Algorithm_Quality": "EXACT" if is_exact else ("ROBUST" if is_robust else "BASIC"),
+            "Is_Exploded_Method": is_exploded,
+            "Is_Exact_Method": is_exact,
+            "Is_Robust_Method": is_robust,
+            "Budget_Exhausted": bool(result.get("budget_exhausted", False)),
+            "Restart_Seed": result.get("seed"),  # multi-start 채택 restart seed (재현용)
+
+            # 🎯 벤더 정보
+            "Vendor(code3)": vendor,
+            "Vendor_Type": vmemo,
+            "Is_Primary_Vendor": ctx["is_primary_vendor"],
+            "Is_Extended_Vendor": ctx["is_extended_vendor"],
 
-# 🔧 NEW: 사용자-친화형 인보이스 검증 리포트 생성
-df_match = pd.DataFrame(match_rows)
-df_detail = pd.DataFrame(detail_rows)
+            # 🎯 상세 정보
+            "Picked_Count": len(result["picked"]) if result.get("picked") else 0,
+            "Picked_List": "; ".join(f"Unit_{i}|GW={gw:.3f}|CBM={cbm:.3f}" for i, gw, cbm in
+                                     zip(picks["Picked_Unit_Idx"], picks["Unit_GW"], picks["Unit_CBM"])),
+            "Code_Normalized": normalize_hvdc_code(raw_code),
+            "Data_Scope": vmemo  # Keep for backward compatibility
+        })
+        # 예산 소진(best-so-far) 결과는 다음 실행에서 다시 탐색하도록 저장하지 않음
+        if store is not None and not result.get("budget_exhausted"):
+            solved_items.append((raw_code, ctx["fingerprint"], match_rows[-1], picks))
+
+    if store is not None:
+        store.put_many(solved_items)
+        store.close()
+        reused = sum(1 for ctx in contexts if "reused" in ctx)
+        print(f"♻️ 증분 재검증: 재계산 {len(contexts) - reused}/{len(contexts)}개 코드 (재사용 {reused}개)")
+
+    # 🔧 NEW: 사용자-친화형 인보이스 검증 리포트 생성
+    df_match = pd.DataFrame(match_rows)
+    return df_match, build_picked_detail(pick_frames, df_match, df_all, expansion)
+
+def build_picked_detail(pick_frames, df_match, df_all, expansion):
+    """
+    선택 unit 테이블(인덱스 배열)을 매칭 결과/ALL 원본 행과 조인하여 Picked_Detail 생성
+
+    Args:
+        pick_frames: 코드별 선택 unit 프레임 (_match_row, Picked_Unit_Idx, Original_Row_Idx, Unit_GW, Unit_CBM)
+        df_match: 매칭 결과 DataFrame (_match_row = 행 위치)
+        df_all: ALL DataFrame (Original_Row_Idx = index 라벨)
+        expansion: join_expanded_codes 확장 프레임 (raw_code, full_code)
+
+    Returns:
+        DataFrame: 선택 unit별 상세 (선택 없으면 빈 DataFrame)
+    """
+    if not pick_frames:
+        return pd.DataFrame()
+    picks = pd.concat(pick_frames, ignore_index=True)
+
+    ctx = df_match.iloc[picks["_match_row"].to_numpy()].reset_index(drop=True)
+    orig = df_all.loc[picks["Original_Row_Idx"].to_numpy()].reset_index(drop=True)
+    location = orig["Location"] if "Location" in orig.columns else pd.Series("", index=orig.index)
+
+    detail = pd.DataFrame({
+        "REV_NO_List": ctx["REV_NO_List"],
+        "REV_NO_Count": ctx["REV_NO_Count"],
+        "Invoice_RAW_CODE": ctx["Invoice_RAW_CODE"],
+        "Expanded_Code_Member?": pd.MultiIndex.from_arrays([ctx["Invoice_RAW_CODE"], orig["HVDC CODE"]]).isin(
+            pd.MultiIndex.from_arrays([expansion["raw_code"], expansion["full_code"]])),
+        "HVDC CODE": orig["HVDC CODE"],
+        "Picked_Unit_Idx": picks["Picked_Unit_Idx"],
+        "Original_Row_Idx": picks["Original_Row_Idx"],
+        "Unit_GW": picks["Unit_GW"],
+        "Unit_CBM": picks["Unit_CBM"],
+        "Original_Total_GW": orig["G.W(kgs)"],
+        "Original_Total_CBM": orig["CBM"],
+        "Original_Pkg_Count": orig["Pkg"] if "Pkg" in orig.columns else 1,
+        "_ym": orig["_ym"] if "_ym" in orig.columns else None,
+        "Vendor(code3)": ctx["Vendor(code3)"],
+        "Vendor_Type": ctx["Vendor_Type"],
+        "Warehouse_Type": np.asarray(classify_warehouse_types(location), dtype=object),
+        "Code_Normalized": hvdc_code_utils.normalize_series(orig["HVDC CODE"], normalize_hvdc_code),
+    })
+    return detail
 
 # 🎯 1) Exceptions_Only 시트 생성 (예외 전용)
-def create_exceptions_only():
+def create_exceptions_only(df_match, df_inv):
     """FAIL 상태만 포함한 예외 전용 시트 생성"""
     # Operation Date 컬럼이 없는 경우 추가
     if "Operation Date" not in df_match.columns:
-        # df_inv에서 HVDC CODE 매칭으로 Operation Date 가져오기
-        date_mapping = {}
-        for _, row in df_inv.iterrows():
-            hvdc_code = row.get("HVDC CODE")
-            op_date = row.get("Operation Date")
-            if hvdc_code and op_date:
-                date_mapping[hvdc_code] = op_date
-        
-        df_match["Operation Date"] = df_match["Invoice_RAW_CODE"].map(date_mapping)
+        # df_inv에서 HVDC CODE 매칭으로 Operation Date 가져오기 (코드별 마지막 유효 날짜)
+        if "Operation Date" in df_inv.columns:
+            dates = df_inv[["HVDC CODE", "Operation Date"]].dropna()
+            dates = dates[dates["HVDC CODE"].astype(bool) & dates["Operation Date"].astype(bool)]
+            date_mapping = dates.drop_duplicates("HVDC CODE", keep="last").set_index("HVDC CODE")["Operation Date"]
+            df_match["Operation Date"] = df_match["Invoice_RAW_CODE"].map(date_mapping)
+        else:
+            df_match["Operation Date"] = None
     
     # 예외 케이스만 필터링 (PASS가 아닌 모든 경우)
     df_exceptions = df_match.loc[df_match["Match_Status"] != "PASS"].copy()
@@ -914,7 +720,7 @@ def create_exceptions_only():
         "GW_Invoice", "GW_SumPicked", "Err_GW",
         "CBM_Invoice", "CBM_SumPicked", "Err_CBM",
         "GW_Match(±0.10)", "CBM_Match(±0.10)", "Match_Status",
-        "Method", "Picked_Count", "REV_NO_List"
+        "Method", "Budget_Exhausted", "Picked_Count", "REV_NO_List"
     ]
     
     # 사용 가능한 컬럼만 선택
@@ -924,54 +730,34 @@ def create_exceptions_only():
     return df_ex
 
 # 🎯 2) 원본 순서 시트 생성 (기존 함수 개선)
-def create_invoice_original_order_sheet():
+def create_invoice_original_order_sheet(df_match, df_inv):
     """원본 인보이스 순서 + 매칭 결과를 결합한 시트 생성"""
-    df_invoice_original = df_inv.copy()
-    
-    # 매칭 결과 매핑
-    match_dict = {}
-    for _, row in df_match.iterrows():
-        hvdc_code = row['Invoice_RAW_CODE']
-        match_dict[hvdc_code] = {
-            'All_Pkgs(sum)': row.get('All_Pkgs(sum)', 0),
-            'Candidate_Units': row.get('All_Pkgs(sum)', 0),  # 보조 정보
-            'Pkg_Status': row.get('Pkg_Status', 'NO_MATCH'),
-            'GW_SumPicked': row.get('GW_SumPicked', None),
-            'CBM_SumPicked': row.get('CBM_SumPicked', None),
-            'Err_GW': row.get('Err_GW', None),
-            'Err_CBM': row.get('Err_CBM', None),
-            'GW_Match': row.get('GW_Match(±0.10)', 'NO_MATCH'),
-            'CBM_Match': row.get('CBM_Match(±0.10)', 'NO_MATCH'),
-            'Match_Status': row.get('Match_Status', 'NO_MATCH'),
-            'Method': row.get('Method', 'NO_MATCH'),
-            'Picked_Count': row.get('Picked_Count', 0)
-        }
-    
-    # 결과 컬럼 추가
-    result_columns = []
-    for _, row in df_invoice_original.iterrows():
-        hvdc_code = row.get('HVDC CODE', '')
-        if hvdc_code in match_dict:
-            result_columns.append(match_dict[hvdc_code])
-        else:
-            result_columns.append({
-                'All_Pkgs(sum)': 0,
-                'Candidate_Units': 0,
-                'Pkg_Status': 'NO_MATCH',
-                'GW_SumPicked': None,
-                'CBM_SumPicked': None,
-                'Err_GW': None,
-                'Err_CBM': None,
-                'GW_Match': 'NO_MATCH',
-                'CBM_Match': 'NO_MATCH',
-                'Match_Status': 'NO_MATCH',
-                'Method': 'NO_MATCH',
-                'Picked_Count': 0
-            })
-    
+    # 매칭 결과 컬럼 (원본 시트용 이름) - 매칭되지 않은 인보이스 행 기본값
+    result_cols = {
+        'All_Pkgs(sum)': ('All_Pkgs(sum)', 0),
+        'Candidate_Units': ('All_Pkgs(sum)', 0),  # 보조 정보
+        'Pkg_Status': ('Pkg_Status', 'NO_MATCH'),
+        'GW_SumPicked': ('GW_SumPicked', None),
+        'CBM_SumPicked': ('CBM_SumPicked', None),
+        'Err_GW': ('Err_GW', None),
+        'Err_CBM': ('Err_CBM', None),
+        'GW_Match': ('GW_Match(±0.10)', 'NO_MATCH'),
+        'CBM_Match': ('CBM_Match(±0.10)', 'NO_MATCH'),
+        'Match_Status': ('Match_Status', 'NO_MATCH'),
+        'Method': ('Method', 'NO_MATCH'),
+        'Picked_Count': ('Picked_Count', 0),
+    }
+    matches = df_match.drop_duplicates('Invoice_RAW_CODE', keep='last').set_index('Invoice_RAW_CODE')
+    df_results = pd.DataFrame({name: matches[src] for name, (src, _) in result_cols.items()})
+
+    # 인보이스 행 순서 그대로 HVDC CODE → 매칭 결과 조인 (미매칭 행은 기본값)
+    df_results = df_inv[['HVDC CODE']].join(df_results, on='HVDC CODE', how='left').drop(columns='HVDC CODE')
+    matched = df_inv['HVDC CODE'].isin(matches.index)
+    for name, (_, default) in result_cols.items():
+        df_results[name] = df_results[name].where(matched, default)
+
     # 데이터 결합
-    df_results = pd.DataFrame(result_columns)
-    df_combined = pd.concat([df_invoice_original, df_results], axis=1)
+    df_combined = pd.concat([df_inv, df_results], axis=1)
     
     # REV NO 순서대로 정렬
     if 'REV NO' in df_combined.columns:
@@ -980,7 +766,7 @@ def create_invoice_original_order_sheet():
     return df_combined
 
 # 🎯 3) Dashboard KPI 계산
-def calculate_dashboard_kpi():
+def calculate_dashboard_kpi(df_match):
     """대시보드용 KPI 지표 계산"""
     total_lines = len(df_match)
     fail_count = (df_match["Match_Status"] != "PASS").sum()
@@ -1024,148 +810,333 @@ def calculate_dashboard_kpi():
         "Top_Exceptions": df_top_exceptions
     }
 
-# 데이터 생성
-df_exceptions = create_exceptions_only()
-df_invoice_order = create_invoice_original_order_sheet()
-dashboard_data = calculate_dashboard_kpi()
-
 # 🎯 4) 사용자-친화형 Excel 출력
-with pd.ExcelWriter(OUT_PATH, engine="xlsxwriter") as writer:
-    workbook = writer.book
-    
-    # === 스타일 정의 ===
-    header_format = workbook.add_format({
-        'bold': True, 'text_wrap': True, 'valign': 'top',
-        'fg_color': '#D7E4BD', 'border': 1
-    })
-    
-    info_format = workbook.add_format({
-        'fg_color': '#E6F3FF', 'border': 1
-    })
-    
-    pass_format = workbook.add_format({
-        'font_color': '#006400', 'bold': True  # 초록색
-    })
-    
-    fail_format = workbook.add_format({
-        'font_color': '#9C0006', 'bold': True  # 빨강색
-    })
-    
-    warn_format = workbook.add_format({
-        'bg_color': '#FFF2CC', 'border': 1  # 노랑색 배경
-    })
-    
-    error_format = workbook.add_format({
-        'bg_color': '#FFC7CE', 'border': 1  # 빨강색 배경
-    })
-    
-    number_format = workbook.add_format({'num_format': '#,##0.00'})
-    integer_format = workbook.add_format({'num_format': '#,##0'})
-    
-    # === 1) Dashboard 시트 ===
-    # KPI 테이블
-    kpi_df = pd.DataFrame([dashboard_data["KPI"]])
-    kpi_df.to_excel(writer, index=False, sheet_name="Dashboard", startrow=1)
-    
-    # 메서드 성능 테이블
-    dashboard_data["Method_Performance"].to_excel(
-        writer, sheet_name="Dashboard", startrow=4, startcol=0
-    )
-    
-    # Top 예외 케이스
-    if not dashboard_data["Top_Exceptions"].empty:
-        dashboard_data["Top_Exceptions"].to_excel(
-            writer, index=False, sheet_name="Dashboard", startrow=4, startcol=6
+def write_dashboard(df_match, df_detail, df_inv, out_path=OUT_PATH):
+    """Dashboard / Exceptions_Only / Invoice_Original_Order / Picked_Detail 시트 저장"""
+    # 데이터 생성
+    df_exceptions = create_exceptions_only(df_match, df_inv)
+    df_invoice_order = create_invoice_original_order_sheet(df_match, df_inv)
+    dashboard_data = calculate_dashboard_kpi(df_match)
+
+    with pd.ExcelWriter(out_path, engine="xlsxwriter") as writer:
+        workbook = writer.book
+
+        # === 스타일 정의 ===
+        header_format = workbook.add_format({
+            'bold': True, 'text_wrap': True, 'valign': 'top',
+            'fg_color': '#D7E4BD', 'border': 1
+        })
+
+        info_format = workbook.add_format({
+            'fg_color': '#E6F3FF', 'border': 1
+        })
+
+        pass_format = workbook.add_format({
+            'font_color': '#006400', 'bold': True  # 초록색
+        })
+
+        fail_format = workbook.add_format({
+            'font_color': '#9C0006', 'bold': True  # 빨강색
+        })
+
+        warn_format = workbook.add_format({
+            'bg_color': '#FFF2CC', 'border': 1  # 노랑색 배경
+        })
+
+        error_format = workbook.add_format({
+            'bg_color': '#FFC7CE', 'border': 1  # 빨강색 배경
+        })
+
+        number_format = workbook.add_format({'num_format': '#,##0.00'})
+        integer_format = workbook.add_format({'num_format': '#,##0'})
+
+        # === 1) Dashboard 시트 ===
+        # KPI 테이블
+        kpi_df = pd.DataFrame([dashboard_data["KPI"]])
+        kpi_df.to_excel(writer, index=False, sheet_name="Dashboard", startrow=1)
+
+        # 메서드 성능 테이블
+        dashboard_data["Method_Performance"].to_excel(
+            writer, sheet_name="Dashboard", startrow=4, startcol=0
         )
-    
-    # Dashboard 제목 추가
-    dashboard_ws = writer.sheets["Dashboard"]
-    dashboard_ws.write(0, 0, "📊 HVDC 인보이스 검증 대시보드", workbook.add_format({'bold': True, 'font_size': 16}))
-    dashboard_ws.write(3, 0, "알고리즘 성능", workbook.add_format({'bold': True, 'font_size': 12}))
-    dashboard_ws.write(3, 6, "Top 예외 케이스 (상위 10건)", workbook.add_format({'bold': True, 'font_size': 12}))
-    
-    # === 2) Exceptions_Only 시트 ===
-    df_exceptions.to_excel(writer, index=False, sheet_name="Exceptions_Only")
-    exceptions_ws = writer.sheets["Exceptions_Only"]
-    
-    # 헤더 포맷 적용
-    for col_num, value in enumerate(df_exceptions.columns.values):
-        exceptions_ws.write(0, col_num, value, header_format)
-    
-    # Freeze Panes (1행 + 5열 고정)
-    exceptions_ws.freeze_panes(1, 5)
-    
-    # 컬럼 너비 조정
-    exceptions_ws.set_column(0, 4, 12)
-    exceptions_ws.set_column(5, 20, 14)
-    
-    # 조건부 서식 적용
-    if len(df_exceptions) > 0:
-        # Match_Status FAIL 강조
-        match_col = df_exceptions.columns.get_loc("Match_Status") if "Match_Status" in df_exceptions.columns else -1
-        if match_col >= 0:
-            exceptions_ws.conditional_format(
-                1, match_col, len(df_exceptions), match_col,
-                {'type': 'text', 'criteria': 'containing', 'value': 'FAIL', 'format': fail_format}
-            )
-        
-        # Pkg_Status FAIL 강조
-        pkg_col = df_exceptions.columns.get_loc("Pkg_Status") if "Pkg_Status" in df_exceptions.columns else -1
-        if pkg_col >= 0:
-            exceptions_ws.conditional_format(
-                1, pkg_col, len(df_exceptions), pkg_col,
-                {'type': 'text', 'criteria': 'containing', 'value': 'FAIL', 'format': warn_format}
+
+        # Top 예외 케이스
+        if not dashboard_data["Top_Exceptions"].empty:
+            dashboard_data["Top_Exceptions"].to_excel(
+                writer, index=False, sheet_name="Dashboard", startrow=4, startcol=6
             )
-    
-    # === 3) Invoice_Original_Order 시트 ===
-    df_invoice_order.to_excel(writer, index=False, sheet_name="Invoice_Original_Order")
-    invoice_ws = writer.sheets["Invoice_Original_Order"]
-    
-    # 헤더 포맷
-    for col_num, value in enumerate(df_invoice_order.columns.values):
-        invoice_ws.write(0, col_num, value, header_format)
-    
-    # Freeze Panes
-    invoice_ws.freeze_panes(1, 5)
-    
-    # 컬럼 너비 및 서식
-    invoice_ws.set_column(0, 4, 12)
-    invoice_ws.set_column(5, len(df_inv.columns)-1, 14)
-    
-    # 결과 블록 배경색 (하늘색)
-    result_start_col = len(df_inv.columns)
-    for col in range(result_start_col, len(df_invoice_order.columns)):
-        invoice_ws.set_column(col, col, 14, info_format)
-    
-    # === 4) Picked_Detail 시트 ===
-    if not df_detail.empty:
-        # 컬럼 순서 정리
-        detail_cols = ["Invoice_RAW_CODE", "Original_Row_Idx", "Picked_Unit_Idx", 
-                      "Unit_GW", "Unit_CBM", "Original_Total_GW", "Original_Total_CBM", 
-                      "Original_Pkg_Count", "Vendor(code3)", "Warehouse_Type"]
-        available_detail_cols = [col for col in detail_cols if col in df_detail.columns]
-        df_detail_ordered = df_detail[available_detail_cols + [col for col in df_detail.columns if col not in available_detail_cols]]
-        
-        df_detail_ordered.to_excel(writer, index=False, sheet_name="Picked_Detail")
-        detail_ws = writer.sheets["Picked_Detail"]
-        
+
+        # Dashboard 제목 추가
+        dashboard_ws = writer.sheets["Dashboard"]
+        dashboard_ws.write(0, 0, "📊 HVDC 인보이스 검증 대시보드", workbook.add_format({'bold': True, 'font_size': 16}))
+        dashboard_ws.write(3, 0, "알고리즘 성능", workbook.add_format({'bold': True, 'font_size': 12}))
+        dashboard_ws.write(3, 6, "Top 예외 케이스 (상위 10건)", workbook.add_format({'bold': True, 'font_size': 12}))
+
+        # === 2) Exceptions_Only 시트 ===
+        df_exceptions.to_excel(writer, index=False, sheet_name="Exceptions_Only")
+        exceptions_ws = writer.sheets["Exceptions_Only"]
+
+        # 헤더 포맷 적용
+        for col_num, value in enumerate(df_exceptions.columns.values):
+            exceptions_ws.write(0, col_num, value, header_format)
+
+        # Freeze Panes (1행 + 5열 고정)
+        exceptions_ws.freeze_panes(1, 5)
+
+        # 컬럼 너비 조정
+        exceptions_ws.set_column(0, 4, 12)
+        exceptions_ws.set_column(5, 20, 14)
+
+        # 조건부 서식 적용
+        if len(df_exceptions) > 0:
+            # Match_Status FAIL 강조
+            match_col = df_exceptions.columns.get_loc("Match_Status") if "Match_Status" in df_exceptions.columns else -1
+            if match_col >= 0:
+                exceptions_ws.conditional_format(
+                    1, match_col, len(df_exceptions), match_col,
+                    {'type': 'text', 'criteria': 'containing', 'value': 'FAIL', 'format': fail_format}
+                )
+
+            # Pkg_Status FAIL 강조
+            pkg_col = df_exceptions.columns.get_loc("Pkg_Status") if "Pkg_Status" in df_exceptions.columns else -1
+            if pkg_col >= 0:
+                exceptions_ws.conditional_format(
+                    1, pkg_col, len(df_exceptions), pkg_col,
+                    {'type': 'text', 'criteria': 'containing', 'value': 'FAIL', 'format': warn_format}
+                )
+
+        # === 3) Invoice_Original_Order 시트 ===
+        df_invoice_order.to_excel(writer, index=False, sheet_name="Invoice_Original_Order")
+        invoice_ws = writer.sheets["Invoice_Original_Order"]
+
         # 헤더 포맷
-        for col_num, value in enumerate(df_detail_ordered.columns.values):
-            detail_ws.write(0, col_num, value, header_format)
-        
+        for col_num, value in enumerate(df_invoice_order.columns.values):
+            invoice_ws.write(0, col_num, value, header_format)
+
         # Freeze Panes
-        detail_ws.freeze_panes(1, 3)
-        detail_ws.set_column(0, 10, 14)
-
-print(f"Saved: {OUT_PATH}")
-print("🎯 사용자-친화형 인보이스 검증 리포트 생성 완료!")
-print("📋 생성된 시트 (사용 순서):")
-print("  1. 📊 Dashboard - KPI 요약 및 필터")
-print("  2. ⚠️  Exceptions_Only - 예외 케이스 전용 (FAIL만)")
-print("  3. 📝 Invoice_Original_Order - 원본 순서 + 결과")
-print("  4. 🔍 Picked_Detail - 매칭 근거 상세")
-print("\n💡 사용법:")
-print("  • Dashboard에서 전체 현황 파악")
-print("  • Exceptions_Only에서 문제 케이스 우선 검토")  
-print("  • Invoice_Original_Order에서 원본 대조")
-print("  • Picked_Detail에서 매칭 근거 확인")
+        invoice_ws.freeze_panes(1, 5)
+
+        # 컬럼 너비 및 서식
+        invoice_ws.set_column(0, 4, 12)
+        invoice_ws.set_column(5, len(df_inv.columns)-1, 14)
+
+        # 결과 블록 배경색 (하늘색)
+        result_start_col = len(df_inv.columns)
+        for col in range(result_start_col, len(df_invoice_order.columns)):
+            invoice_ws.set_column(col, col, 14, info_format)
+
+        # === 4) Picked_Detail 시트 ===
+        if not df_detail.empty:
+            # 컬럼 순서 정리
+            detail_cols = ["Invoice_RAW_CODE", "Original_Row_Idx", "Picked_Unit_Idx", 
+                          "Unit_GW", "Unit_CBM", "Original_Total_GW", "Original_Total_CBM", 
+                          "Original_Pkg_Count", "Vendor(code3)", "Warehouse_Type"]
+            available_detail_cols = [col for col in detail_cols if col in df_detail.columns]
+            df_detail_ordered = df_detail[available_detail_cols + [col for col in df_detail.columns if col not in available_detail_cols]]
+
+            df_detail_ordered.to_excel(writer, index=False, sheet_name="Picked_Detail")
+            detail_ws = writer.sheets["Picked_Detail"]
+
+            # 헤더 포맷
+            for col_num, value in enumerate(df_detail_ordered.columns.values):
+                detail_ws.write(0, col_num, value, header_format)
+
+            # Freeze Panes
+            detail_ws.freeze_panes(1, 3)
+            detail_ws.set_column(0, 10, 14)
+
+    print(f"Saved: {out_path}")
+    print("🎯 사용자-친화형 인보이스 검증 리포트 생성 완료!")
+    print("📋 생성된 시트 (사용 순서):")
+    print("  1. 📊 Dashboard - KPI 요약 및 필터")
+    print("  2. ⚠️  Exceptions_Only - 예외 케이스 전용 (FAIL만)")
+    print("  3. 📝 Invoice_Original_Order - 원본 순서 + 결과")
+    print("  4. 🔍 Picked_Detail - 매칭 근거 상세")
+    print("\n💡 사용법:")
+    print("  • Dashboard에서 전체 현황 파악")
+    print("  • Exceptions_Only에서 문제 케이스 우선 검토")  
+    print("  • Invoice_Original_Order에서 원본 대조")
+    print("  • Picked_Detail에서 매칭 근거 확인")
+
+# 🎯 5) 스트리밍 실행 (청크 → Parquet 데이터셋 + 체크포인트)
+def _write_checkpoint(path, state):
+    """체크포인트 원자적 저장 (임시 파일 → rename)"""
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+# 스트리밍 DuckDB 테이블 스키마 - 첫 청크 dtype 추론에 맡기면 전부 NULL인 컬럼(Restart_Seed, _ym 등)의
+# 타입이 잘못 고정되어 이후 청크가 변환 실패/강제 변환됨 → 고정 스키마로 생성하고 청크를 CAST
+STREAM_TABLE_SCHEMAS = {
+    "invoice_match": {
+        "REV_NO_List": "VARCHAR", "REV_NO_Count": "BIGINT", "Invoice_RAW_CODE": "VARCHAR",
+        "Expanded_Set": "VARCHAR", "Fuzzy_Match": "VARCHAR",
+        "Invoice_Pkgs(k)": "BIGINT", "All_Pkgs(sum)": "BIGINT", "Candidate_Rows(N)": "BIGINT",
+        "Pkg_Status": "VARCHAR",
+        "GW_Invoice": "DOUBLE", "CBM_Invoice": "DOUBLE", "GW_SumPicked": "DOUBLE", "CBM_SumPicked": "DOUBLE",
+        "Err_GW": "DOUBLE", "Err_CBM": "DOUBLE",
+        "GW_Match(±0.10)": "VARCHAR", "CBM_Match(±0.10)": "VARCHAR", "Match_Status": "VARCHAR",
+        "Method": "VARCHAR", "Algorithm_Quality": "VARCHAR",
+        "Is_Exploded_Method": "BOOLEAN", "Is_Exact_Method": "BOOLEAN", "Is_Robust_Method": "BOOLEAN",
+        "Budget_Exhausted": "BOOLEAN", "Restart_Seed": "BIGINT",
+        "Vendor(code3)": "VARCHAR", "Vendor_Type": "VARCHAR",
+        "Is_Primary_Vendor": "BOOLEAN", "Is_Extended_Vendor": "BOOLEAN",
+        "Picked_Count": "BIGINT", "Picked_List": "VARCHAR", "Code_Normalized": "VARCHAR", "Data_Scope": "VARCHAR",
+    },
+    "invoice_detail": {
+        "REV_NO_List": "VARCHAR", "REV_NO_Count": "BIGINT", "Invoice_RAW_CODE": "VARCHAR",
+        "Expanded_Code_Member?": "BOOLEAN", "HVDC CODE": "VARCHAR",
+        "Picked_Unit_Idx": "BIGINT", "Original_Row_Idx": "BIGINT",
+        "Unit_GW": "DOUBLE", "Unit_CBM": "DOUBLE", "Original_Total_GW": "DOUBLE", "Original_Total_CBM": "DOUBLE",
+        "Original_Pkg_Count": "DOUBLE", "_ym": "VARCHAR",
+        "Vendor(code3)": "VARCHAR", "Vendor_Type": "VARCHAR", "Warehouse_Type": "VARCHAR",
+        "Code_Normalized": "VARCHAR",
+    },
+}
+
+def _quote_ident(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _append_chunk_duckdb(con, table, df, chunk_no):
+    """
+    청크 결과를 DuckDB 테이블에 적재 (재시작 시 같은 청크는 교체)
+    - 테이블은 STREAM_TABLE_SCHEMAS 고정 스키마로 생성, 스키마에 없는 컬럼은 VARCHAR로 추가
+    - 청크 컬럼은 테이블 타입으로 CAST 후 이름 기준 INSERT (변환 불가 값은 오류로 드러남)
+    """
+    types = dict(STREAM_TABLE_SCHEMAS.get(table, {}))
+    for col in df.columns:
+        types.setdefault(col, "VARCHAR")
+    cols_sql = ", ".join(f"{_quote_ident(c)} {t}" for c, t in types.items())
+    con.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({cols_sql}, _chunk INTEGER)')
+    existing = {row[0] for row in con.execute(f'DESCRIBE "{table}"').fetchall()}
+    for col in df.columns:
+        if col not in existing:
+            con.execute(f'ALTER TABLE "{table}" ADD COLUMN {_quote_ident(col)} {types[col]}')
+
+    con.register("chunk_df", df)
+    select = ", ".join(f"CAST({_quote_ident(c)} AS {types[c]}) AS {_quote_ident(c)}" for c in df.columns)
+    con.execute(f'DELETE FROM "{table}" WHERE _chunk = ?', [chunk_no])
+    con.execute(f'INSERT INTO "{table}" BY NAME SELECT {select}, ?::INTEGER AS _chunk FROM chunk_df', [chunk_no])
+    con.unregister("chunk_df")
+
+def read_stream_results(stream_dir):
+    """
+    스트리밍 데이터셋에서 매칭 결과/상세 로드 (청크 순서대로 결합)
+
+    Returns:
+        tuple: (df_match, df_detail)
+    """
+    stream_dir = Path(stream_dir)
+    frames = []
+    for name in ("match", "detail"):
+        parts = sorted((stream_dir / name).glob("part-*.parquet"))
+        # 청크마다 스키마(전부 NULL 컬럼 등)가 다를 수 있어 파일 단위로 읽어 결합 후 dtype 재추론
+        dfs = [df for df in (pd.read_parquet(p) for p in parts) if not df.empty]
+        frames.append(pd.concat(dfs, ignore_index=True).infer_objects() if dfs else pd.DataFrame())
+    return frames[0], frames[1]
+
+def stream_invoice_codes(df_inv, df_all, stream_dir, chunk_codes=STREAM_CHUNK_CODES,
+                         workers=PARALLEL_WORKERS, chunksize=PARALLEL_CHUNKSIZE, cache_db=MATCH_CACHE_DB,
+                         fuzzy=FUZZY_FALLBACK, duckdb_path=STREAM_DUCKDB, state_db=REVALIDATE_DB):
+    """
+    인보이스 코드를 청크 단위로 매칭하고 청크마다 Parquet 파일로 커밋
+    - 청크 결과 기록 후 checkpoint.json 갱신 → 중단 후 재실행 시 마지막 커밋 청크 다음부터 재개
+    - 입력 데이터/청크 크기가 바뀌면 체크포인트를 무시하고 처음부터 실행
+
+    Args:
+        df_inv: load_inputs 인보이스 DataFrame
+        df_all: load_inputs ALL DataFrame
+        stream_dir: 데이터셋 디렉터리 (match/, detail/, checkpoint.json)
+        chunk_codes: 청크당 인보이스 코드 수
+        cache_db: 매칭 결과 캐시 DuckDB 경로 (None이면 캐시 미사용)
+        duckdb_path: 청크 결과를 invoice_match/invoice_detail 테이블에도 적재할 DuckDB 경로
+        state_db: 코드별 지문/결과 저장 DuckDB 경로 (None이면 증분 재검증 미사용)
+
+    Returns:
+        tuple: (df_match, df_detail) - 데이터셋 전체
+    """
+    stream_dir = Path(stream_dir)
+    for name in ("match", "detail"):
+        (stream_dir / name).mkdir(parents=True, exist_ok=True)
+    checkpoint = stream_dir / "checkpoint.json"
+
+    codes = list(df_inv["HVDC CODE"].dropna().unique())
+    chunks = [codes[i:i + chunk_codes] for i in range(0, len(codes), chunk_codes)]
+    run_key = hashlib.sha1(json.dumps([chunk_codes, [str(c) for c in codes]]).encode("utf-8"))
+    for df in (df_inv, df_all):
+        run_key.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    run_key = run_key.hexdigest()
+
+    state = json.loads(checkpoint.read_text(encoding="utf-8")) if checkpoint.exists() else {}
+    fresh = state.get("run_key") != run_key
+    if fresh:
+        for old in list(stream_dir.glob("match/part-*.parquet")) + list(stream_dir.glob("detail/part-*.parquet")):
+            old.unlink()
+        state = {"run_key": run_key, "chunks_total": len(chunks), "chunks_done": 0}
+        _write_checkpoint(checkpoint, state)
+    elif state["chunks_done"]:
+        print(f"[INFO] Resume from checkpoint: {state['chunks_done']}/{len(chunks)} chunks committed")
+
+    con = None
+    if duckdb_path:
+        import duckdb
+        con = duckdb.connect(str(duckdb_path))
+        if fresh:
+            con.execute("DROP TABLE IF EXISTS invoice_match")
+            con.execute("DROP TABLE IF EXISTS invoice_detail")
+    try:
+        cand_index = build_candidate_index(df_all, fuzzy=fuzzy)
+        for chunk_no in range(state["chunks_done"], len(chunks)):
+            chunk = chunks[chunk_no]
+            # 전체 시간 예산은 코드 수 비율로 청크에 분배
+            share = None if TIMEOUT_SECONDS is None else TIMEOUT_SECONDS * len(chunk) / len(codes)
+            df_m, df_d = match_invoice_codes(df_inv, df_all, workers=workers, chunksize=chunksize,
+                                             cache_db=cache_db, fuzzy=fuzzy, codes=chunk,
+                                             cand_index=cand_index, total_seconds=share, state_db=state_db)
+            df_m.to_parquet(stream_dir / "match" / f"part-{chunk_no:05d}.parquet", index=False)
+            df_d.to_parquet(stream_dir / "detail" / f"part-{chunk_no:05d}.parquet", index=False)
+            if con is not None:
+                _append_chunk_duckdb(con, "invoice_match", df_m, chunk_no)
+                if not df_d.empty:
+                    _append_chunk_duckdb(con, "invoice_detail", df_d, chunk_no)
+            state["chunks_done"] = chunk_no + 1
+            _write_checkpoint(checkpoint, state)
+            print(f"[INFO] Chunk {chunk_no + 1}/{len(chunks)} committed ({len(chunk)} codes)")
+    finally:
+        if con is not None:
+            con.close()
+
+    return read_stream_results(stream_dir)
+
+def _beside_output(db, out_path):
+    """DB 경로 결정: 파일명만 주면 out_path와 같은 폴더, 경로/None은 그대로"""
+    if db and Path(db).name == str(db):
+        return Path(out_path).with_name(str(db))
+    return db
+
+def main(invoice_path=INVOICE_PATH, all_path=ALL_PATH, out_path=OUT_PATH,
+         workers=PARALLEL_WORKERS, chunksize=PARALLEL_CHUNKSIZE, cache_db=MATCH_CACHE_NAME,
+         fuzzy=FUZZY_FALLBACK, stream_dir=STREAM_DIR, state_db=REVALIDATE_NAME):
+    """
+    인보이스 검증 파이프라인 실행 (로드 → 매칭 → 대시보드 저장)
+    stream_dir 지정 시 청크 스트리밍 실행 후 데이터셋에서 대시보드 렌더링
+    cache_db / state_db가 파일명이면 out_path와 같은 폴더에 생성
+
+    Returns:
+        tuple: (df_match, df_detail)
+    """
+    cache_db = _beside_output(cache_db, out_path)
+    state_db = _beside_output(state_db, out_path)
+    df_inv, df_all = load_inputs(invoice_path, all_path)
+    if stream_dir:
+        df_match, df_detail = stream_invoice_codes(df_inv, df_all, stream_dir, workers=workers,
+                                                   chunksize=chunksize, cache_db=cache_db, fuzzy=fuzzy,
+                                                   state_db=state_db)
+    else:
+        df_match, df_detail = match_invoice_codes(df_inv, df_all, workers=workers, chunksize=chunksize,
+                                                  cache_db=cache_db, fuzzy=fuzzy, state_db=state_db)
+    write_dashboard(df_match, df_detail, df_inv, out_path)
+    return df_match, df_detail
+
+if __name__ == "__main__":
+    main()
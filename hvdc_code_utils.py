@@ -0,0 +1,267 @@
+"""
+HVDC Code Normalization - 공통 코드 정규화 계층
+invoice / hub / exceptions / SKU 조인이 같은 규칙으로 키를 만들도록 단일화
+- 스칼라 API: lru_cache 메모이제이션 (호출 간 캐시 유지)
+- Series API: 고유값만 정규화 후 원래 행으로 take → 비용 O(고유 코드 수)
+- Fuzzy API: 문자 n-gram blocking 인덱스 → 소수 후보만 유사도 채점
+- 결합 코드 확장: RAW 코드 Series → (raw_code, full_code) 매핑 프레임
+"""
+
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+CACHE_SIZE = 1 << 16
+
+_DASHES = str.maketrans({'–': '-', '—': '-'})
+_NON_CODE_CHARS = re.compile(r'[^\w\-]')
+_MULTI_HYPHEN = re.compile(r'-+')
+_WHITESPACE = re.compile(r'\s+')
+_LEADING_ZEROS = re.compile(r'^0+(?=[A-Z0-9])')
+
+# =============================================================================
+# 1. 스칼라 정규화 (메모이제이션)
+# =============================================================================
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _hvdc_code(s: str) -> str:
+    s = s.strip().upper().translate(_DASHES)   # 대시 통일
+    s = _NON_CODE_CHARS.sub('', s)              # 특수문자·공백 제거 (하이픈 제외)
+    return _MULTI_HYPHEN.sub('-', s)            # 연속된 하이픈 통합
+
+def normalize_hvdc_code(code) -> Optional[str]:
+    """
+    HVDC 코드 정규화 (온톨로지 시스템 기반, 모든 모듈 공통 규칙)
+    예: " hvdc--adopt–he-0325 " → "HVDC-ADOPT-HE-0325"
+
+    Args:
+        code: 정규화할 코드 값
+    Returns:
+        str: 정규화된 코드 (None/NaN이면 None)
+    """
+    if code is None or (isinstance(code, float) and np.isnan(code)):
+        return None
+    return _hvdc_code(str(code))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _sku(s: str) -> str:
+    s = s.strip().upper()
+    s = _WHITESPACE.sub('', s)           # 모든 공백 제거
+    s = s.translate(_DASHES)             # 대시 통일
+    s = _LEADING_ZEROS.sub('', s)        # 선행 0 제거(혼용 케이스 방지)
+    return s
+
+def normalize_sku(s):
+    """
+    SKU 키 정규화: 대소문자·공백·선행 0·하이픈 표준화
+
+    Args:
+        s: SKU 문자열
+
+    Returns:
+        정규화된 SKU 문자열
+    """
+    if s is None:
+        return None
+    return _sku(str(s))
+
+# =============================================================================
+# 2. 벡터화 정규화 (고유값 단위)
+# =============================================================================
+
+def normalize_series(values: pd.Series, normalizer: Callable = normalize_hvdc_code) -> pd.Series:
+    """
+    Series 정규화: factorize → 고유값만 정규화 → take
+    결측값(None/NaN)은 하나의 고유값으로 모아 normalizer(None) 결과로 채움
+
+    Args:
+        values: 코드/SKU Series
+        normalizer: 스칼라 정규화 함수 (normalize_hvdc_code / normalize_sku)
+    Returns:
+        pd.Series: 정규화된 값 (object dtype, 원래 index 유지)
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    normed = np.empty(len(uniques), dtype=object)
+    normed[:] = [normalizer(None if pd.isna(u) else u) for u in uniques]
+    return pd.Series(normed[codes], index=values.index, name=values.name, dtype=object)
+
+def cache_info() -> dict:
+    """스칼라 정규화 캐시 상태 (hits/misses/currsize)"""
+    return {"hvdc_code": _hvdc_code.cache_info()._asdict(), "sku": _sku.cache_info()._asdict()}
+
+# =============================================================================
+# 3. 퍼지 코드 매칭 (n-gram blocking)
+# =============================================================================
+
+class FuzzyCodeIndex:
+    """
+    정규화 코드의 문자 n-gram 역색인
+    쿼리와 공유 gram이 많은 후보만 추린 뒤 SequenceMatcher 유사도로 채점
+    (전체 코드 대상 쌍별 비교 O(N) → 후보 수 O(max_candidates))
+
+    Args:
+        codes: 인덱싱할 코드 목록 (원본 값, 내부에서 정규화)
+        n: gram 길이
+        normalizer: 스칼라 정규화 함수
+    """
+
+    def __init__(self, codes, n: int = 3, normalizer: Callable = normalize_hvdc_code):
+        self.n = n
+        self.normalizer = normalizer
+        originals = {}
+        for c in codes:
+            nc = normalizer(c)
+            if nc:
+                originals.setdefault(nc, []).append(c)
+        self.codes = list(originals)
+        self._originals = originals
+        self._lengths = np.array([len(c) for c in self.codes], dtype=np.intp)
+
+        postings = {}
+        for i, c in enumerate(self.codes):
+            for g in self._grams(c):
+                postings.setdefault(g, []).append(i)
+        self._postings = {g: np.array(ix, dtype=np.intp) for g, ix in postings.items()}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _grams(self, s: str) -> set:
+        s = f"^{s}$"  # 경계 표시 - 짧은 코드와 접두/접미 차이 반영
+        return {s[i:i + self.n] for i in range(max(1, len(s) - self.n + 1))}
+
+    def originals(self, code: str) -> list:
+        """정규화 코드 → 인덱싱된 원본 코드 목록"""
+        return self._originals.get(code, [])
+
+    def query(self, code, top_k: int = 3, threshold: float = 0.9, max_candidates: int = 50) -> list:
+        """
+        유사 코드 Top-k 조회
+
+        Args:
+            code: 조회할 코드 (원본 값)
+            top_k: 반환할 최대 코드 수
+            threshold: 최소 유사도 (SequenceMatcher ratio)
+            max_candidates: 채점할 최대 후보 수 (공유 gram 수 상위)
+        Returns:
+            list: [(정규화 코드, 유사도)] 유사도 내림차순 (동률은 코드순)
+        """
+        q = self.normalizer(code)
+        if not q or not self.codes or top_k <= 0:
+            return []
+        hits = [self._postings[g] for g in self._grams(q) if g in self._postings]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.codes))
+        cand = np.flatnonzero(shared)
+
+        # 길이 상한: ratio <= 2*min(la, lb) / (la + lb)
+        lb = self._lengths[cand]
+        cand = cand[2 * np.minimum(len(q), lb) >= threshold * (len(q) + lb)]
+        # 공유 gram 수 상위 후보만 채점 (동률은 인덱스 순 → 결정적)
+        if len(cand) > max_candidates:
+            cand = cand[np.lexsort((cand, -shared[cand]))[:max_candidates]]
+
+        # difflib.get_close_matches와 같은 방식: 쿼리를 seq2로 고정, 빠른 상한부터 확인
+        sm = SequenceMatcher()
+        sm.set_seq2(q)
+        scored = []
+        for i in cand:
+            sm.set_seq1(self.codes[i])
+            if (sm.real_quick_ratio() >= threshold and sm.quick_ratio() >= threshold
+                    and sm.ratio() >= threshold):
+                scored.append((self.codes[i], sm.ratio()))
+        scored.sort(key=lambda x: (-x[1], x[0]))
+        return scored[:top_k]
+
+# =============================================================================
+# 4. 결합 코드 확장 (예: HVDC-ADOPT-HE-0087,90 → 0087, 0090)
+# =============================================================================
+
+_BASE_CODE = re.compile(r"^(.*-)(\d+)(-[A-Za-z0-9]+)?$")  # 접두(마지막 '-'까지) / 번호 블록 / 서브 접미
+_NUM_BLOCK = re.compile(r"^(\d+)(-[A-Za-z0-9]+)?$")
+
+@lru_cache(maxsize=CACHE_SIZE)
+def expand_combined_code(code: str) -> tuple:
+    """
+    결합 코드 약식 표기 확장 (첫 토큰이 기준 FULL 코드, 인보이스 매칭 규칙)
+    - 숫자 토큰: 기준 번호를 4자리 0-패딩 번호로 치환 ('0087,90' → 0087, 0090 / '0325,26' → 0325, 0026)
+    - 숫자-서브 토큰: 번호+서브 치환 ('0325,0326-2' → 0325, 0326-2)
+    - 그 외 토큰: FULL 코드로 간주하여 그대로 추가
+
+    Args:
+        code: RAW 코드 문자열
+    Returns:
+        tuple: FULL 코드 (입력 순서, 중복 제거)
+    """
+    if "," not in code:
+        return (code,)
+    parts = code.replace(" ", "").split(",")
+    base = parts[0]
+    m = _BASE_CODE.match(base)
+    if m:
+        prefix, num, sub = m.group(1), m.group(2), (m.group(3) or "")
+    else:
+        prefix, tail = base.rsplit("-", 1)[0] + "-", base.rsplit("-", 1)[-1]
+        num = tail if _NUM_BLOCK.match(tail) else None
+        sub = ""
+
+    expanded = [base]
+    for t in parts[1:]:
+        if "-" in t:
+            num_part, sub_part = t.split("-", 1)
+            expanded.append(f"{prefix}{int(num_part):04d}-{sub_part}" if num_part.isdigit() else t)
+        elif t.isdigit() and num is not None:
+            expanded.append(f"{prefix}{int(t):04d}{sub}")
+        else:
+            expanded.append(t)
+    return tuple(dict.fromkeys(expanded))
+
+@lru_cache(maxsize=CACHE_SIZE)
+def expand_numeric_code(code: str) -> tuple:
+    """
+    번호 블록 약식 표기 확장 (Exceptions→SKU 브릿지 규칙)
+    - 2자리 토큰: 기준 토큰 앞 2자리 + 토큰 ('0087,90' → 0087, 0090)
+    - 3자리 이상 토큰: 4자리 0-패딩 ('0087,195' → 0087, 0195)
+    - 1자리/빈 토큰은 무시
+
+    Args:
+        code: RAW 코드 문자열 (앞뒤 공백 제거된 값)
+    Returns:
+        tuple: 4자리 번호 코드 (입력 순서, 중복 제거)
+    """
+    if "," not in code:
+        return (code.zfill(4),)
+    parts = [p.strip() for p in code.split(",")]
+    base = parts[0]
+    codes = [base.zfill(4)] if base else []
+    for part in parts[1:]:
+        if len(part) == 2:
+            codes.append((base[:2] + part).zfill(4))
+        elif len(part) >= 3:
+            codes.append(part.zfill(4))
+    return tuple(dict.fromkeys(codes))
+
+def expand_code_frame(codes: pd.Series, expand: Callable[[str], tuple] = expand_combined_code) -> pd.DataFrame:
+    """
+    RAW 코드 Series → (raw_code, full_code) 분해 매핑 프레임
+    고유 RAW 값만 확장 (메모이제이션), 문자열이 아닌 값/결측은 제외
+
+    Args:
+        codes: RAW 코드 Series
+        expand: 확장 규칙 (expand_combined_code / expand_numeric_code)
+    Returns:
+        pd.DataFrame: raw_code, full_code (RAW 코드 등장 순서)
+    """
+    raw, full = [], []
+    for u in pd.unique(codes.dropna()):
+        if isinstance(u, str):
+            exp = expand(u)
+            raw.extend([u] * len(exp))
+            full.extend(exp)
+    return pd.DataFrame({"raw_code": pd.Series(raw, dtype=object),
+                         "full_code": pd.Series(full, dtype=object)})
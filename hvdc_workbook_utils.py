@@ -0,0 +1,191 @@
+"""
+HVDC Workbook Metadata - 입력 워크북 고속 사전 검증
+openpyxl read_only 모드로 시트명·크기·헤더 행만 읽어 단계별 필수 컬럼 확인
+- 본문 셀은 헤더 행까지만 파싱 (count_rows=True일 때만 시트 전체 행 스트리밍)
+- 헤더는 첫 번째 비어 있지 않은 행 (제목/빈 행 아래 헤더 허용)
+- 헤더 정규화: Reporter와 같은 규칙 (연속 공백 1칸 + strip)
+- Reporter / Stock / Invoice 단계별 필수 시트·컬럼 규칙 단일화
+"""
+
+import re
+from pathlib import Path
+from typing import Iterable, Optional
+from zipfile import BadZipFile
+
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+_WHITESPACE = re.compile(r'\s+')
+
+# =============================================================================
+# 1. 단계별 필수 컬럼 규칙
+# =============================================================================
+
+REPORTER_WAREHOUSES = ['AAA Storage', 'DSV Al Markaz', 'DSV Indoor', 'DSV MZP', 'DSV Outdoor',
+                       'Hauler Indoor', 'MOSB', 'DHL Warehouse']
+REPORTER_SITES = ['AGI', 'DAS', 'MIR', 'SHU']
+
+STAGE_RULES = {
+    # Reporter: 벤더 파일 첫 시트, 창고/현장 날짜 컬럼은 최소 1개 (누락분은 Reporter가 빈 컬럼으로 채움)
+    "reporter": {"sheets": [0], "required": ["Case No.", "Pkg"],
+                 "any_of": REPORTER_WAREHOUSES + REPORTER_SITES},
+    # Invoice 대시보드: 원본 순서 시트 + SKU 컬럼 후보 중 1개
+    "invoice": {"sheets": ["Invoice_Original_Order", "Invoice_Original"], "required": [],
+                "any_of": ["Case No.", "SKU", "CaseNo", "Case_no", "HVDC CODE"]},
+}
+
+STOCK_SHEET_COLUMNS = {
+    '종합_SKU요약': ['SKU', 'Status', 'Last_Seen', 'Last_Location'],
+    '날짜별_추이': ['Date', 'SKU_Count'],
+    '월별_분석': ['Month_Key', 'Total_IN', 'Total_OUT'],
+}
+
+def normalize_header(value) -> Optional[str]:
+    """헤더 셀 정규화 (None/빈 문자열이면 None)"""
+    if value is None:
+        return None
+    s = _WHITESPACE.sub(' ', str(value)).strip()
+    return s or None
+
+# =============================================================================
+# 2. 워크북 메타데이터 (openpyxl read_only)
+# =============================================================================
+
+def _has_value(row) -> bool:
+    return any(v is not None and v != '' for v in row)
+
+def _sheet_meta(ws, count_rows: bool) -> dict:
+    last_row = ws.max_row  # <dimension> 기준 (서식만 있는 빈 행 포함 가능)
+    if count_rows:
+        ws.reset_dimensions()  # 잘못된 <dimension>에 잘리지 않도록 실제 행 기준으로 스트리밍
+
+    # 첫 번째 비어 있지 않은 행 = 헤더, count_rows면 이어서 값이 있는 마지막 행까지 스캔
+    header, header_row, last_value_row = [], 0, 0
+    for idx, row in enumerate(ws.iter_rows(values_only=True), start=1):
+        if not header_row:
+            if _has_value(row):
+                header, header_row = list(row), idx
+                last_value_row = idx
+                if not count_rows:
+                    break
+            continue
+        if _has_value(row):
+            last_value_row = idx
+    while header and header[-1] is None:
+        header.pop()
+
+    # pandas 컬럼명 규칙 재현: 빈 헤더 → 'Unnamed: i', 중복 → '.1', '.2'
+    columns_list, seen = [], {}
+    for i, v in enumerate(header):
+        name = f"Unnamed: {i}" if v is None else v
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns_list.append(name)
+
+    # 행 수: 헤더 아래 데이터 행 (count_rows면 값이 있는 마지막 행까지, 아니면 <dimension>까지)
+    if count_rows:
+        rows = last_value_row - header_row
+    else:
+        rows = None if last_row is None else max(last_row - max(header_row, 1), 0)
+    return {
+        "rows": rows,
+        "header_row": header_row or None,
+        "columns": len(columns_list),
+        "columns_list": columns_list,
+        "headers": [h for h in map(normalize_header, header) if h is not None],
+    }
+
+def read_workbook_meta(path: str, sheets: Optional[Iterable] = None, count_rows: bool = False) -> dict:
+    """
+    워크북 메타데이터만 읽기 (시트명, 크기, 헤더)
+    read_only 모드로 헤더 행(첫 번째 비어 있지 않은 행)까지만 읽음
+
+    Args:
+        path: Excel 파일 경로
+        sheets: 헤더를 읽을 시트 (이름 또는 위치 인덱스, None이면 전체)
+        count_rows: 값이 있는 마지막 행까지 행 수를 셀지 여부 (시트 전체 스트리밍)
+                    (False면 <dimension> 기준, 크기 정보가 없으면 rows=None)
+    Returns:
+        dict: sheet_names, sheets{시트명: {rows, header_row, columns, columns_list, headers}}
+    Raises:
+        FileNotFoundError / ValueError: 파일 없음 / xlsx 형식 아님
+    """
+    try:
+        wb = load_workbook(path, read_only=True, data_only=True)
+    except (BadZipFile, InvalidFileException, KeyError) as e:
+        raise ValueError(f"xlsx 형식이 아님: {path}") from e
+    try:
+        names = wb.sheetnames
+        if sheets is None:
+            targets = names
+        else:
+            targets = [names[s] if isinstance(s, int) and -len(names) <= s < len(names) else s
+                       for s in sheets]
+        # 차트 시트(셀 없음)는 제외
+        meta = {n: _sheet_meta(wb[n], count_rows) for n in dict.fromkeys(targets)
+                if n in names and hasattr(wb[n], "iter_rows")}
+        return {"sheet_names": names, "sheets": meta}
+    finally:
+        wb.close()
+
+def missing_columns(headers: Iterable, required: Iterable = (), any_of: Iterable = ()) -> list:
+    """
+    필수 컬럼 누락 목록
+
+    Args:
+        headers: 정규화된 헤더 목록
+        required: 모두 있어야 하는 컬럼
+        any_of: 하나 이상 있어야 하는 컬럼 후보
+    Returns:
+        list: 누락 컬럼 (any_of 미충족 시 'one of: a|b|...' 항목 추가)
+    """
+    present = set(headers)
+    missing = [c for c in required if c not in present]
+    any_of = list(any_of)
+    if any_of and present.isdisjoint(any_of):
+        missing.append("one of: " + "|".join(any_of))
+    return missing
+
+# =============================================================================
+# 3. 단계별 헤더 검증
+# =============================================================================
+
+def validate_stage_headers(path: str, stage: str) -> dict:
+    """
+    단계별 입력 파일 헤더 검증 (reporter / invoice / stock)
+    - reporter / invoice: 후보 시트 중 처음 존재하는 시트를 단계 입력 시트로 사용
+    - stock: STOCK_SHEET_COLUMNS 중 2개 이상 시트 존재 + 존재 시트별 필수 컬럼
+      (누락 컬럼은 '시트명:컬럼' 형식)
+
+    Args:
+        path: Excel 파일 경로
+        stage: 'reporter' / 'invoice' / 'stock'
+    Returns:
+        dict: sheets, missing_columns, headers_ok (실패 시 error 포함)
+    """
+    result = {"sheets": [], "missing_columns": [], "headers_ok": False}
+    if not Path(path).exists():
+        return {**result, "error": "file not found"}
+
+    wanted = list(STOCK_SHEET_COLUMNS) if stage == "stock" else STAGE_RULES[stage]["sheets"]
+    try:
+        meta = read_workbook_meta(path, sheets=wanted)
+    except Exception as e:
+        return {**result, "error": str(e)}
+
+    found = list(meta["sheets"])
+    if stage == "stock":
+        missing = [f"{sheet}:{c}" for sheet in found
+                   for c in missing_columns(meta["sheets"][sheet]["headers"], STOCK_SHEET_COLUMNS[sheet])]
+        ok = len(found) >= 2 and not missing
+        result = {"sheets": found, "missing_columns": missing, "headers_ok": ok}
+        return result if len(found) >= 2 else {**result, "error": f"required sheets < 2: {found}"}
+
+    if not found:
+        return {**result, "error": f"sheet not found: {wanted}"}
+    rule = STAGE_RULES[stage]
+    missing = missing_columns(meta["sheets"][found[0]]["headers"], rule["required"], rule["any_of"])
+    return {"sheets": found[:1], "missing_columns": missing, "headers_ok": not missing}
@@ -0,0 +1,895 @@
+"""
+HVDC Invoice Validation - Subset Matching Engine
+인보이스 라인(k 패키지, GW/CBM 합계) ↔ ALL 후보 풀 부분집합 매칭 알고리즘 모음
+(프로세스 풀 워커에서 import 가능하도록 인보이스 스크립트에서 분리)
+"""
+
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import Manager
+from itertools import combinations, repeat
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+TOL          = 0.10
+MAX_EXACT_N  = 18
+# 결과 캐시 키에 포함 - solver 결과가 바뀌는 변경 시 반드시 올릴 것
+SOLVER_VERSION = "4"
+
+def close2(a, b, tol=TOL):
+    return (a is not None) and (b is not None) and abs(a - b) <= tol
+
+def total_error(gw, cbm, gw_tgt, cbm_tgt):
+    """GW/CBM 절대 오차 합 (합계가 없으면 None)"""
+    if gw is None or cbm is None:
+        return None
+    return abs(gw - gw_tgt) + abs(cbm - cbm_tgt)
+
+class MatchBudget:
+    """
+    부분집합 탐색 예산 (평가 횟수 + wall-clock)
+    solver는 spend()가 True를 반환하면 탐색을 멈추고 best-so-far 결과를 반환
+
+    Args:
+        max_evals: 최대 조합/교체 평가 횟수 (None이면 무제한)
+        time_limit: 최대 실행 시간(초) (None이면 무제한)
+        stop: 외부 중단 플래그 (Event 호환 is_set(), 프로세스 간 공유 시 Manager().Event())
+        stop_every: stop 확인 간격(평가 횟수) - 프로세스 간 Event 조회 비용 절감
+    """
+
+    def __init__(self, max_evals=None, time_limit=None, stop=None, stop_every=256):
+        self.max_evals = max_evals
+        self.deadline = None if time_limit is None else time.monotonic() + time_limit
+        self.evals = 0
+        self.exhausted = False
+        self.stop = stop
+        self.stop_every = max(1, stop_every)
+        self._next_stop_check = self.stop_every
+
+    def spend(self, n=1):
+        """평가 n회 소비 후 예산 소진 여부 반환"""
+        if self.exhausted:
+            return True
+        self.evals += n
+        if self.max_evals is not None and self.evals > self.max_evals:
+            self.exhausted = True
+        elif self.deadline is not None and time.monotonic() > self.deadline:
+            self.exhausted = True
+        elif self.stop is not None and self.evals >= self._next_stop_check:
+            self._next_stop_check = self.evals + self.stop_every
+            self.exhausted = self.stop.is_set()
+        return self.exhausted
+
+# =============================================================================
+# 1. 패키지 단위 분해
+# =============================================================================
+
+def explode_by_pkg(df_subset):
+    """
+    패키지 단위로 데이터를 explode하여 각 패키지별 단위 데이터 생성
+    (ONTOLOGY 기반 개선, np.repeat 벡터화)
+
+    Args:
+        df_subset: DataFrame with Pkg, G.W(kgs), CBM columns
+
+    Returns:
+        DataFrame: exploded data with unit weights/volumes per package
+                   (Original_Index, Pkg_Unit, Pkg, G.W(kgs), CBM)
+    """
+    if df_subset.empty:
+        return pd.DataFrame(columns=["Pkg", "G.W(kgs)", "CBM"])
+
+    def col(name):
+        if name not in df_subset.columns:
+            return np.zeros(len(df_subset))
+        return pd.to_numeric(df_subset[name], errors="coerce").to_numpy(dtype=float)
+
+    # Pkg는 정수 절사, 0 이하/결측은 제외 (행 단위 int(Pkg) 처리와 동일)
+    pkg = np.nan_to_num(col("Pkg"), nan=0.0)
+    counts = np.where(pkg > 0, np.trunc(pkg), 0).astype(np.int64)
+    safe = np.where(counts > 0, counts, 1)
+    unit_gw = col("G.W(kgs)") / safe
+    unit_cbm = col("CBM") / safe
+
+    rows = np.repeat(np.arange(len(df_subset)), counts)
+    # 행 내 패키지 순번 (1..Pkg)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    return pd.DataFrame({
+        "Original_Index": df_subset.index.to_numpy()[rows],
+        "Pkg_Unit": np.arange(len(rows)) - starts + 1,
+        "Pkg": np.ones(len(rows), dtype=np.int64),  # 각 단위는 1 패키지
+        "G.W(kgs)": unit_gw[rows],
+        "CBM": unit_cbm[rows],
+    })
+
+# =============================================================================
+# 2. 부분집합 탐색 알고리즘 (exact / greedy-local)
+# =============================================================================
+
+def _exact_search(arr_gw, arr_cbm, k, gw_tgt, cbm_tgt, tol=TOL, budget=None):
+    """
+    조합 전수 탐색 (anytime): 허용오차 내 첫 조합 또는 예산 소진/종료 시점의 최소 오차 조합
+
+    Returns:
+        tuple: (success, picked_positions, sum_gw, sum_cbm)
+    """
+    best = None  # (err, comb, gw, cbm)
+    for comb in combinations(range(len(arr_gw)), k):
+        if budget is not None and budget.spend():
+            break
+        gw = float(np.sum(arr_gw[list(comb)]))
+        cbm = float(np.sum(arr_cbm[list(comb)]))
+        if close2(gw, gw_tgt, tol) and close2(cbm, cbm_tgt, tol):
+            return True, list(comb), gw, cbm
+        err = abs(gw - gw_tgt) + abs(cbm - cbm_tgt)
+        if best is None or err < best[0]:
+            best = (err, list(comb), gw, cbm)
+    if best is None:
+        return False, [], None, None
+    return False, best[1], best[2], best[3]
+
+def exact_subset_match(pkgs_df, k, gw_tgt, cbm_tgt, tol=TOL, budget=None):
+    idxs = list(pkgs_df.index)
+    ok, comb, gw, cbm = _exact_search(pkgs_df["G.W(kgs)"].values, pkgs_df["CBM"].values,
+                                      k, gw_tgt, cbm_tgt, tol, budget)
+    return ok, [idxs[i] for i in comb], gw, cbm
+
+def greedy_scores(values_gw, values_cbm, gw_tgt, cbm_tgt):
+    """greedy 초기해 점수 (낮을수록 우선): 0.6·GW/CBM 비율 편차 + 0.4·정규화 크기 편차"""
+    # Enhanced scoring system with ontology-based weights
+    ratio_target = gw_tgt / max(cbm_tgt, 1e-6)
+    ratio = values_gw / np.clip(values_cbm, 1e-6, None)
+    score2 = np.abs(ratio - ratio_target)
+
+    # Normalized scores for balance
+    gw_norm = (values_gw / max(gw_tgt, 1e-6))
+    cbm_norm = (values_cbm / max(cbm_tgt, 1e-6))
+    score = np.abs(gw_norm - gw_norm.mean()) + np.abs(cbm_norm - cbm_norm.mean())
+
+    # Combined scoring with enhanced weights
+    return 0.6 * score2 + 0.4 * score
+
+def robust_greedy_local(values_gw, values_cbm, k, gw_tgt, cbm_tgt, tol=TOL, max_iter=300, budget=None, init=None):
+    """
+    Enhanced robust greedy local search (ONTOLOGY 기반 개선)
+    기존 greedy_local 함수의 mutation 문제를 해결한 robust 버전
+
+    Args:
+        values_gw, values_cbm: numpy arrays of weights/volumes
+        k: number of items to select
+        gw_tgt, cbm_tgt: target weights/volumes
+        tol: tolerance for matching
+        max_iter: maximum iterations for local search
+        budget: MatchBudget (소진 시 best-so-far 반환)
+        init: 초기해 인덱스 k개 (None이면 결정적 greedy 초기해)
+
+    Returns:
+        tuple: (success, picked_indices, sum_gw, sum_cbm)
+    """
+    n = len(values_gw)
+    if n < k or k <= 0:
+        return False, [], None, None
+
+    # Initial greedy selection - immutable approach
+    if init is None:
+        picked_indices = list(np.argsort(greedy_scores(values_gw, values_cbm, gw_tgt, cbm_tgt))[:k])
+    else:
+        picked_indices = list(init)
+    gw = float(values_gw[picked_indices].sum())
+    cbm = float(values_cbm[picked_indices].sum())
+
+    # Early return if already optimal
+    if close2(gw, gw_tgt, tol) and close2(cbm, cbm_tgt, tol):
+        return True, picked_indices, gw, cbm
+
+    def calculate_error(indices):
+        """Calculate total error for given indices"""
+        if len(indices) == 0:
+            return float('inf')
+        gw_sum = values_gw[indices].sum()
+        cbm_sum = values_cbm[indices].sum()
+        return abs(gw_sum - gw_tgt) + abs(cbm_sum - cbm_tgt)
+
+    # Robust local search with immutable operations
+    best_indices = picked_indices.copy()
+    best_error = calculate_error(np.array(best_indices))
+
+    for iteration in range(max_iter):
+        improved = False
+        current_indices = best_indices.copy()
+
+        # Try swapping each selected item
+        for i in range(k):
+            current_set = set(current_indices)
+            out_idx = current_indices[i]
+
+            best_local_error = best_error
+            best_replacement = None
+
+            # Try all possible replacements
+            for in_idx in range(n):
+                if in_idx in current_set:
+                    continue
+                if budget is not None and budget.spend():
+                    break
+
+                # Create trial indices without mutation
+                trial_indices = current_indices.copy()
+                trial_indices[i] = in_idx
+
+                trial_error = calculate_error(np.array(trial_indices))
+
+                if trial_error < best_local_error:
+                    best_local_error = trial_error
+                    best_replacement = in_idx
+
+                    # Early termination if perfect match found
+                    if trial_error == 0:
+                        break
+
+            # Apply best improvement if found
+            if best_replacement is not None and best_local_error < best_error:
+                current_indices[i] = best_replacement
+                best_error = best_local_error
+                improved = True
+
+                # Check if target reached
+                gw_sum = float(values_gw[current_indices].sum())
+                cbm_sum = float(values_cbm[current_indices].sum())
+                if close2(gw_sum, gw_tgt, tol) and close2(cbm_sum, cbm_tgt, tol):
+                    return True, current_indices, gw_sum, cbm_sum
+
+        # Update best solution if improved
+        if improved:
+            best_indices = current_indices.copy()
+        if not improved or (budget is not None and budget.exhausted):
+            break  # No improvement found (or budget exhausted), terminate
+
+    # Final calculation
+    final_gw = float(values_gw[best_indices].sum())
+    final_cbm = float(values_cbm[best_indices].sum())
+    success = close2(final_gw, gw_tgt, tol) and close2(final_cbm, cbm_tgt, tol)
+
+    return success, best_indices, final_gw, final_cbm
+
+def restart_init(values_gw, values_cbm, k, gw_tgt, cbm_tgt, restart, seed):
+    """
+    multi-start 초기해 (restart 번호로 종류 결정, seed로 재현)
+    - restart 0: 결정적 greedy 초기해 (단일 실행과 동일)
+    - 짝수: greedy 점수에 정규 잡음을 더한 섭동 greedy
+    - 홀수: 무작위 k-부분집합
+    """
+    n = len(values_gw)
+    if restart == 0 or n < k or k <= 0:
+        return None
+    rng = np.random.default_rng(seed)
+    if restart % 2 == 0:
+        s = greedy_scores(values_gw, values_cbm, gw_tgt, cbm_tgt)
+        s = s + rng.normal(0.0, float(np.std(s)) + 1e-12, n)
+        return list(np.argsort(s)[:k])
+    return list(np.sort(rng.choice(n, size=k, replace=False)))
+
+def _restart_task(args):
+    """restart 워커 진입점 → (restart, seed, result)"""
+    vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol, restart, seed, max_evals, stop, time_limit = args
+    budget = MatchBudget(max_evals, time_limit, stop=stop)
+    init = restart_init(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, restart, seed)
+    found, picked, sum_gw, sum_cbm = robust_greedy_local(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol,
+                                                         budget=budget, init=init)
+    return restart, seed, _result(found, [int(i) for i in picked], sum_gw, sum_cbm,
+                                  "robust-multistart-local-exploded", gw_tgt, cbm_tgt, budget)
+
+def multistart_local_search(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol=TOL, restarts=8, seed=0, workers=0,
+                            max_evals=None, time_limit=None):
+    """
+    Multi-start randomized local search
+    restart r은 seed+r로 초기해를 만들고 robust_greedy_local로 개선, tolerance 도달 시 조기 종료
+
+    Args:
+        vals_gw, vals_cbm: unit별 GW/CBM numpy arrays
+        k: target package count
+        gw_tgt, cbm_tgt: target weights/volumes
+        tol: tolerance
+        restarts: 재시작 수 (restart 0은 결정적 greedy 초기해)
+        seed: 기준 seed (restart r의 seed = seed + r)
+        workers: restart 병렬 프로세스 수 (0/1이면 직렬, 직렬은 결과가 항상 동일)
+        max_evals: 평가 횟수 예산 - restart 0(단일 실행과 같은 결정적 초기해)은 max_evals 전체,
+                   나머지 restart는 max_evals // restarts씩 (restart 0이 단일 실행과 같은 탐색을 하므로
+                   평가 횟수 예산 기준으로는 결과가 단일 실행보다 나쁘지 않음, 전체 평가는 최대 약 2배)
+        time_limit: 전체 실행 시간 예산(초) (시간 예산은 restart 간 분배되므로 위 보장은 평가 횟수 예산에만 해당)
+
+    Returns:
+        dict: 최선 결과 (found 우선 → 오차 → restart 순) + seed, restart, restarts_run
+    """
+    per_evals = None if max_evals is None else max(1, max_evals // restarts)
+    args = [(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol, r, seed + r, max_evals if r == 0 else per_evals)
+            for r in range(restarts)]
+    done = []
+
+    if workers <= 1:
+        start = time.monotonic()
+        for i, a in enumerate(args):
+            time_share = None
+            if time_limit is not None:
+                # 남은 시간 / 남은 restart 수 (앞 restart가 덜 쓰면 이월)
+                time_share = max(time_limit - (time.monotonic() - start), 0.0) / (restarts - i)
+            done.append(_restart_task(a + (None, time_share)))
+            if done[-1][2]["found"]:
+                break
+    else:
+        time_share = None if time_limit is None else time_limit * min(workers, restarts) / restarts
+        # 먼저 도달한 restart 채택 - 실행 중인 restart는 공유 stop 플래그로 중단, 대기 중인 restart는 취소
+        with Manager() as manager:
+            stop = manager.Event()
+            ex = ProcessPoolExecutor(max_workers=min(workers, restarts))
+            try:
+                futures = [ex.submit(_restart_task, a + (stop, time_share)) for a in args]
+                for fut in as_completed(futures):
+                    if fut.cancelled():
+                        continue
+                    done.append(fut.result())
+                    if done[-1][2]["found"]:
+                        stop.set()
+                        break
+            finally:
+                ex.shutdown(wait=True, cancel_futures=True)
+
+    def rank(item):
+        restart, _, res = item
+        err = res["error"] if res["error"] is not None else float("inf")
+        return (not res["found"], err, restart)
+
+    restart, best_seed, best = min(done, key=rank)
+    best = dict(best)
+    best.update({"seed": best_seed, "restart": restart, "restarts_run": len(done),
+                 "budget_exhausted": any(res["budget_exhausted"] for _, _, res in done) and not best["found"]})
+    return best
+
+# =============================================================================
+# 3. 매칭 전략 (DataFrame / exploded unit)
+# =============================================================================
+
+_BOUND_EPS = 1e-9  # 부동소수 합산 순서 차이로 경계 케이스를 잘못 배제하지 않도록
+
+def presolve_bounds(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol=TOL):
+    """
+    부분집합 탐색 전 presolve (실행 가능성 경계 + 지배 단위 제거)
+    - GW/CBM 각각 k개 최소합 > 목표+tol 또는 k개 최대합 < 목표-tol 이면 해 없음
+    - 모든 값이 음수가 아니면 단독으로 목표+tol을 넘는 단위는 어떤 조합에도 못 들어가므로 제거
+
+    Args:
+        vals_gw, vals_cbm: 후보 GW/CBM 배열
+        k: 선택 개수
+        gw_tgt, cbm_tgt: 목표 합계
+        tol: tolerance
+
+    Returns:
+        tuple: (keep, feasible) - keep은 남길 위치 배열 (원래 순서 유지)
+    """
+    vals_gw = np.asarray(vals_gw, dtype=float)
+    vals_cbm = np.asarray(vals_cbm, dtype=float)
+    keep = np.arange(len(vals_gw))
+    if k <= 0 or np.isnan(vals_gw).any() or np.isnan(vals_cbm).any():
+        return keep, True
+
+    # 지배 단위 제거 (비음수일 때만 유효)
+    if (vals_gw >= 0).all() and (vals_cbm >= 0).all():
+        keep = keep[(vals_gw <= gw_tgt + tol + _BOUND_EPS) & (vals_cbm <= cbm_tgt + tol + _BOUND_EPS)]
+    if len(keep) < k:
+        return keep, False
+
+    # k-최소합 / k-최대합 경계
+    for vals, tgt in ((vals_gw[keep], gw_tgt), (vals_cbm[keep], cbm_tgt)):
+        ordered = np.sort(vals)
+        if ordered[:k].sum() > tgt + tol + _BOUND_EPS or ordered[-k:].sum() < tgt - tol - _BOUND_EPS:
+            return keep, False
+    return keep, True
+
+def _result(found, picked, sum_gw, sum_cbm, method, gw_tgt, cbm_tgt, budget=None):
+    """매칭 결과 dict (best-so-far 오차 + 예산 소진 플래그 포함)"""
+    return {
+        "found": found,
+        "picked": picked,
+        "sum_gw": sum_gw,
+        "sum_cbm": sum_cbm,
+        "method": method,
+        "error": total_error(sum_gw, sum_cbm, gw_tgt, cbm_tgt),
+        "budget_exhausted": bool(budget is not None and budget.exhausted),
+    }
+
+def _bound_pick(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol=TOL):
+    """
+    경계 위반 방향의 k개 조합 (위치 인덱스)
+    k개 최소합이 목표+tol을 넘으면 가장 작은 k개, 아니면 (최대합 부족) 가장 큰 k개
+    """
+    size = vals_gw / max(abs(gw_tgt), 1e-6) + vals_cbm / max(abs(cbm_tgt), 1e-6)
+    order = np.argsort(size, kind="stable")
+    too_big = any(np.sort(vals)[:k].sum() > tgt + tol + _BOUND_EPS
+                  for vals, tgt in ((vals_gw, gw_tgt), (vals_cbm, cbm_tgt)))
+    picked = order[:k] if too_big else order[-k:]
+    return [int(i) for i in picked]
+
+def _infeasible_result(searched, vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol=TOL,
+                       method="infeasible-bound", labels=None):
+    """
+    presolve로 해 없음이 증명된 경우의 결과
+    FAIL 순위용 오차가 presolve=False와 같도록 전체 후보 풀 탐색 결과(searched)와
+    경계 방향 k개 조합(_bound_pick) 중 오차가 작은 쪽을 반환 (found=False, method만 교체)
+
+    Args:
+        searched: 전체 후보 풀에 대한 탐색 결과 dict (picked = labels 기준)
+        vals_gw, vals_cbm: 전체 후보 GW/CBM 배열
+        k: 선택 개수
+        gw_tgt, cbm_tgt: 목표 합계
+        tol: tolerance
+        method: 결과 method 이름
+        labels: 위치 → picked 변환용 index label (None이면 위치 그대로)
+
+    Returns:
+        dict: matching result
+    """
+    result = dict(searched, found=False, method=method)
+    if k <= 0 or len(vals_gw) < k:
+        return result
+    pos = _bound_pick(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol)
+    sum_gw, sum_cbm = float(vals_gw[pos].sum()), float(vals_cbm[pos].sum())
+    err = total_error(sum_gw, sum_cbm, gw_tgt, cbm_tgt)
+    if result["error"] is None or err < result["error"]:
+        picked = pos if labels is None else [labels[i] for i in pos]
+        result.update(_result(False, picked, sum_gw, sum_cbm, method, gw_tgt, cbm_tgt),
+                      budget_exhausted=result["budget_exhausted"])
+    return result
+
+def solve_exploded_units(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol=TOL, max_exact_n=MAX_EXACT_N,
+                         max_evals=None, time_limit=None, restarts=1, seed=0, restart_workers=0,
+                         presolve=True):
+    """
+    Exploded unit 배열 기준 부분집합 매칭 (프로세스 풀 워커 진입점)
+    DataFrame 없이 numpy 배열만 받아 pickle 비용을 최소화
+
+    Args:
+        vals_gw, vals_cbm: unit별 GW/CBM numpy arrays
+        k: target package count
+        gw_tgt, cbm_tgt: target weights/volumes
+        tol: tolerance
+        max_exact_n: exact 열거를 적용할 최대 unit 수
+        max_evals: 조합/교체 평가 횟수 예산 (None이면 무제한)
+        time_limit: 실행 시간 예산(초) (None이면 무제한)
+        restarts: 대형 풀 local search 재시작 수 (1이면 단일 greedy-local)
+        seed: multi-start 기준 seed
+        restart_workers: restart 병렬 프로세스 수
+        presolve: presolve_bounds 적용 - 후보를 줄이고 (N이 max_exact_n 이하가 되면 exact로 전환),
+                  해 없음이 증명되면 전체 unit 풀의 최소 오차 조합을 "infeasible-bound-exploded"로 반환
+                  (picked는 원래 unit 위치 기준)
+
+    Returns:
+        dict: matching result (picked = unit 위치 인덱스, error, budget_exhausted 포함,
+              multi-start이면 seed/restart/restarts_run 포함)
+    """
+    vals_gw = np.asarray(vals_gw, dtype=float)
+    vals_cbm = np.asarray(vals_cbm, dtype=float)
+    if not presolve:
+        return _solve_units(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol, max_exact_n,
+                            max_evals, time_limit, restarts, seed, restart_workers)
+
+    keep, feasible = presolve_bounds(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol)
+    if not feasible:
+        searched = _solve_units(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol, max_exact_n,
+                                max_evals, time_limit, restarts, seed, restart_workers)
+        return _infeasible_result(searched, vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol,
+                                  "infeasible-bound-exploded")
+    if len(keep) == len(vals_gw):
+        return _solve_units(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol, max_exact_n,
+                            max_evals, time_limit, restarts, seed, restart_workers)
+    result = _solve_units(vals_gw[keep], vals_cbm[keep], k, gw_tgt, cbm_tgt, tol, max_exact_n,
+                          max_evals, time_limit, restarts, seed, restart_workers)
+    result["picked"] = [int(keep[i]) for i in result["picked"]]
+    return result
+
+def _solve_units(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol, max_exact_n, max_evals, time_limit,
+                 restarts, seed, restart_workers):
+    """크기별 전략 선택 (exact / multi-start / greedy-local)"""
+    budget = MatchBudget(max_evals, time_limit)
+
+    # Choose matching strategy based on size
+    if len(vals_gw) <= max_exact_n:
+        # Exact matching for small datasets (anytime: 예산 소진 시 최소 오차 조합)
+        found, picked, sum_gw, sum_cbm = _exact_search(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol, budget)
+        return _result(found, picked, sum_gw, sum_cbm, "exact-exploded", gw_tgt, cbm_tgt, budget)
+
+    if restarts > 1:
+        return multistart_local_search(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol, restarts=restarts, seed=seed,
+                                       workers=restart_workers, max_evals=max_evals, time_limit=time_limit)
+
+    # Use robust greedy-local for large datasets
+    success, picked_indices, sum_gw, sum_cbm = robust_greedy_local(
+        vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol, budget=budget
+    )
+    return _result(success, picked_indices, sum_gw, sum_cbm, "robust-greedy-local-exploded",
+                   gw_tgt, cbm_tgt, budget)
+
+def find_subset_match(pkgs_df, k, gw_tgt, cbm_tgt, tol=TOL, max_exact_n=MAX_EXACT_N, budget=None, presolve=False):
+    """
+    Enhanced subset matching with robust algorithms (ONTOLOGY 기반)
+    presolve=True이면 presolve_bounds로 후보를 줄인 뒤 (N이 작아지면 exact로 전환) 탐색,
+    해 없음이 증명되면 전체 후보의 최소 오차 조합을 "infeasible-bound"로 반환
+    """
+    N = len(pkgs_df)
+    if N < k or k <= 0:
+        return _result(False, [], None, None, "invalid", gw_tgt, cbm_tgt)
+
+    if presolve:
+        keep, feasible = presolve_bounds(pkgs_df["G.W(kgs)"].values, pkgs_df["CBM"].values,
+                                         k, gw_tgt, cbm_tgt, tol)
+        if not feasible:
+            searched = find_subset_match(pkgs_df, k, gw_tgt, cbm_tgt, tol, max_exact_n, budget)
+            return _infeasible_result(searched, pkgs_df["G.W(kgs)"].values.astype(float),
+                                      pkgs_df["CBM"].values.astype(float), k, gw_tgt, cbm_tgt, tol,
+                                      labels=pkgs_df.index)
+        pkgs_df = pkgs_df.iloc[keep]  # index label 유지 → picked 그대로 원본 기준
+        N = len(pkgs_df)
+
+    # For small datasets, use exact matching
+    if N <= max_exact_n:
+        ok, picked, gw, cbm = exact_subset_match(pkgs_df, k, gw_tgt, cbm_tgt, tol, budget)
+        return _result(ok, picked, gw, cbm, "exact", gw_tgt, cbm_tgt, budget)
+
+    # For large datasets, use robust greedy-local approach
+    values_gw = pkgs_df["G.W(kgs)"].values.astype(float)
+    values_cbm = pkgs_df["CBM"].values.astype(float)
+
+    success, picked_indices, sum_gw, sum_cbm = robust_greedy_local(
+        values_gw, values_cbm, k, gw_tgt, cbm_tgt, tol, budget=budget
+    )
+
+    # Convert indices back to DataFrame indices
+    picked_df_indices = [pkgs_df.index[i] for i in picked_indices] if picked_indices else []
+
+    return _result(success, picked_df_indices, sum_gw, sum_cbm, "robust-greedy-local",
+                   gw_tgt, cbm_tgt, budget)
+
+def find_subset_match_exploded(cand_df, k, gw_tgt, cbm_tgt, tol=TOL, max_exact_n=MAX_EXACT_N,
+                               max_evals=None, time_limit=None, presolve=False, units=None):
+    """
+    Exploded 패키지 단위 매칭 (ONTOLOGY 기반 개선)
+    각 패키지를 개별 단위로 분해하여 더 정확한 매칭 수행
+
+    Args:
+        cand_df: candidate DataFrame
+        k: target package count
+        gw_tgt, cbm_tgt: target weights/volumes
+        tol: tolerance
+        max_exact_n: exact 열거를 적용할 최대 unit 수
+        max_evals, time_limit: 탐색 예산 (solve_exploded_units 참고)
+        presolve: presolve_bounds 적용 여부 (picked는 원래 unit 위치로 복원)
+        units: 이미 생성한 explode_by_pkg(cand_df) 결과 (후보 풀 단위 공유, None이면 생성)
+
+    Returns:
+        dict: matching result
+    """
+    if cand_df.empty or k <= 0:
+        return _result(False, [], None, None, "no-candidate-exploded", gw_tgt, cbm_tgt)
+
+    # Explode by package units
+    if units is None:
+        units = explode_by_pkg(cand_df[["Pkg", "G.W(kgs)", "CBM"]])
+
+    if len(units) == 0:
+        return _result(False, [], None, None, "no-units-exploded", gw_tgt, cbm_tgt)
+
+    # Extract values for matching
+    vals_gw = units["G.W(kgs)"].values.astype(float)
+    vals_cbm = units["CBM"].values.astype(float)
+
+    return solve_exploded_units(vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol, max_exact_n,
+                                max_evals, time_limit, presolve=presolve)
+
+def enhanced_subset_matching(cand_df, k, gw_tgt, cbm_tgt, tol=TOL, use_exploded=True, max_exact_n=MAX_EXACT_N,
+                             max_evals=None, time_limit=None, presolve=True, units=None):
+    """
+    Enhanced subset matching with multiple strategies (ONTOLOGY 기반)
+
+    Args:
+        cand_df: candidate DataFrame
+        k: target package count
+        gw_tgt, cbm_tgt: target weights/volumes
+        tol: tolerance
+        use_exploded: whether to use exploded matching
+        max_exact_n: exact 열거를 적용할 최대 후보 수
+        max_evals, time_limit: 전체 탐색 예산 (전략 간 분할, 앞 전략 미사용분은 뒤 전략에 이월)
+        presolve: 전략별 presolve_bounds 적용 (해 없음이 증명되면 "infeasible-bound")
+        units: 이미 생성한 explode_by_pkg(cand_df) 결과 (호출자와 unit 테이블 공유)
+
+    Returns:
+        dict: best matching result
+    """
+    if cand_df.empty or k <= 0:
+        return _result(False, [], None, None, "no-candidate", gw_tgt, cbm_tgt)
+
+    results = []
+    result2 = None
+    run_exploded = use_exploded and "Pkg" in cand_df.columns
+
+    # 예산은 전략 간 분할: 전략 1은 절반, 전략 2는 남은 평가 횟수/시간 (미사용분 이월)
+    start = time.monotonic()
+    share = 2 if run_exploded else 1
+    budget1 = MatchBudget(None if max_evals is None else max_evals // share,
+                          None if time_limit is None else time_limit / share)
+
+    # Strategy 1: Original DataFrame matching
+    result1 = find_subset_match(cand_df[["G.W(kgs)", "CBM"]], k, gw_tgt, cbm_tgt, tol, max_exact_n,
+                                budget1, presolve=presolve)
+    if result1["found"]:
+        results.append(result1)
+
+    # Strategy 2: Exploded matching (if enabled)
+    if run_exploded:
+        evals_left = None if max_evals is None else max(max_evals - min(budget1.evals, max_evals), 1)
+        time_left = None if time_limit is None else max(time_limit - (time.monotonic() - start), 0.0)
+        result2 = find_subset_match_exploded(cand_df, k, gw_tgt, cbm_tgt, tol, max_exact_n,
+                                             evals_left, time_left, presolve=presolve, units=units)
+        if result2["found"]:
+            results.append(result2)
+
+    # Return best result (prioritize exact matches, then by accuracy)
+    if not results:
+        # 행 단위로 해 없음이 증명돼도 unit 단위는 가능할 수 있음 → 모든 전략이 infeasible일 때만 반환
+        if (result1["method"] == "infeasible-bound" and result2 is not None
+                and not result2["method"].startswith("infeasible-bound")):
+            return result2
+        return result1  # Return original result even if not found
+
+    # Prioritize exact methods, then by accuracy
+    exact_results = [r for r in results if "exact" in r["method"]]
+    if exact_results:
+        return exact_results[0]
+
+    # Among non-exact results, pick the one with smallest error
+    def calculate_total_error(result):
+        if (not result["found"] or
+            result["sum_gw"] is None or
+            result["sum_cbm"] is None or
+            len(result.get("picked", [])) == 0):
+            return float('inf')
+        gw_error = abs(result["sum_gw"] - gw_tgt)
+        cbm_error = abs(result["sum_cbm"] - cbm_tgt)
+        return gw_error + cbm_error
+
+    best_result = min(results, key=calculate_total_error)
+    return best_result
+
+# =============================================================================
+# 4. 병렬 실행 (ProcessPoolExecutor)
+# =============================================================================
+
+def _solve_task(task, time_limit=None):
+    """
+    워커 진입점: (vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol, max_exact_n, max_evals
+                 [, restarts, seed, restart_workers]) 튜플 언패킹
+    """
+    extra = dict(zip(("restarts", "seed", "restart_workers"), task[8:]))
+    return solve_exploded_units(*task[:8], time_limit=time_limit, **extra)
+
+def _run_tasks(tasks, workers=0, chunksize=8, total_seconds=None):
+    """
+    매칭 작업 실행 (직렬 또는 프로세스 풀, 입력 순서 유지)
+
+    전체 실행 시간 예산(total_seconds)은 작업 간 공평 분배:
+    - 직렬: 남은 시간 / 남은 작업 수 (앞 작업이 덜 쓰면 뒤 작업에 이월)
+    - 병렬: total_seconds * workers / 작업 수 (고정 분배)
+    """
+    if workers <= 1 or len(tasks) < 2:
+        results = []
+        start = time.monotonic()
+        for i, task in enumerate(tasks):
+            time_limit = None
+            if total_seconds is not None:
+                remaining = max(total_seconds - (time.monotonic() - start), 0.0)
+                time_limit = remaining / (len(tasks) - i)
+            results.append(_solve_task(task, time_limit))
+        return results
+
+    share = None if total_seconds is None else total_seconds * workers / len(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(_solve_task, tasks, repeat(share), chunksize=max(1, chunksize)))
+
+def run_match_tasks(tasks, workers=0, chunksize=8, total_seconds=None, cache=None):
+    """
+    인보이스 코드별 매칭 작업 일괄 실행 (직렬 또는 프로세스 풀)
+    결과는 항상 입력 순서대로 반환되므로 직렬/병렬 출력이 동일함
+
+    Args:
+        tasks: solve_exploded_units 인자 튜플 목록 (numpy 배열 + 스칼라)
+        workers: 워커 프로세스 수 (0/1이면 직렬 실행)
+        chunksize: 워커에 한 번에 전달할 작업 수
+        total_seconds: 전체 매칭 시간 예산(초) (None이면 무제한, 캐시 miss 작업끼리 분배)
+        cache: MatchCache (hit이면 solve 생략, miss 결과는 저장)
+
+    Returns:
+        list: 작업 순서와 동일한 매칭 결과 dict 목록
+    """
+    if cache is None:
+        return _run_tasks(tasks, workers, chunksize, total_seconds)
+
+    keys = [task_key(t) for t in tasks]
+    results = cache.get_many(keys)
+    todo = [i for i, key in enumerate(keys) if key not in results]
+    solved = _run_tasks([tasks[i] for i in todo], workers, chunksize, total_seconds)
+    # 예산 소진 결과는 실행 시간에 따라 달라지므로 캐시하지 않음
+    cache.put_many([(keys[i], r) for i, r in zip(todo, solved) if not r.get("budget_exhausted")])
+
+    results.update({keys[i]: r for i, r in zip(todo, solved)})
+    return [results[key] for key in keys]
+
+# =============================================================================
+# 5. 결과 캐시 (DuckDB)
+# =============================================================================
+
+def task_key(task):
+    """
+    매칭 작업 캐시 키: unit GW/CBM 배열(원래 순서) + k + 목표값 + tol + exact 임계값 + SOLVER_VERSION
+    (+ multi-start 재시작 수/seed - 병렬 프로세스 수는 결과 키에서 제외)
+    picked가 unit 위치 인덱스이고 exact는 첫 일치 조합을 반환하므로 배열은 정렬하지 않음
+    """
+    vals_gw, vals_cbm, k, gw_tgt, cbm_tgt, tol, max_exact_n = task[:7]
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(vals_gw, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(vals_cbm, dtype=np.float64).tobytes())
+    h.update(repr((int(k), float(gw_tgt), float(cbm_tgt), float(tol), int(max_exact_n), SOLVER_VERSION)
+                  + tuple(task[8:10])).encode())
+    return h.hexdigest()
+
+class MatchCache:
+    """
+    부분집합 매칭 결과 영구 캐시 (DuckDB match_cache 테이블)
+    실행 간 동일한 인보이스 라인/후보 풀은 solve 없이 저장된 결과 재사용
+
+    Args:
+        db_path: DuckDB 파일 경로
+    """
+
+    def __init__(self, db_path):
+        self.con = duckdb.connect(str(db_path))
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS match_cache (
+                key VARCHAR PRIMARY KEY,
+                found BOOLEAN,
+                picked VARCHAR,
+                sum_gw DOUBLE,
+                sum_cbm DOUBLE,
+                error DOUBLE,
+                method VARCHAR,
+                solver_version VARCHAR,
+                created_at TIMESTAMP DEFAULT current_timestamp
+            )
+        """)
+        self.con.execute("ALTER TABLE match_cache ADD COLUMN IF NOT EXISTS seed BIGINT")
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys):
+        """키 목록 조회 → {key: result dict} (hit/miss 카운터 갱신)"""
+        if not keys:
+            return {}
+        keys_df = pd.DataFrame({"key": list(dict.fromkeys(keys))})
+        self.con.register("_cache_keys", keys_df)
+        rows = self.con.execute("""
+            SELECT c.key, c.found, c.picked, c.sum_gw, c.sum_cbm, c.error, c.method, c.seed
+            FROM match_cache c JOIN _cache_keys k ON c.key = k.key
+        """).fetchall()
+        self.con.unregister("_cache_keys")
+
+        found = {}
+        for key, ok, picked, sum_gw, sum_cbm, error, method, seed in rows:
+            found[key] = {
+                "found": bool(ok),
+                "picked": json.loads(picked),
+                "sum_gw": sum_gw,
+                "sum_cbm": sum_cbm,
+                "method": method,
+                "error": error,
+                "budget_exhausted": False,
+            }
+            if seed is not None:
+                found[key]["seed"] = seed
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items):
+        """(key, result) 목록 저장 (동일 키는 덮어씀)"""
+        if not items:
+            return
+        # executemany: None 합계를 NaN이 아닌 NULL로 저장 (조회 시 None 복원)
+        self.con.executemany("""
+            INSERT OR REPLACE INTO match_cache (key, found, picked, sum_gw, sum_cbm, error, method, solver_version, seed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(key, bool(r["found"]), json.dumps([int(i) for i in r["picked"]]),
+               r["sum_gw"], r["sum_cbm"], r.get("error"), r["method"], SOLVER_VERSION, r.get("seed"))
+              for key, r in dict(items).items()])
+
+    def close(self):
+        self.con.close()
+
+# =============================================================================
+# 6. 코드별 증분 재검증 상태 (DuckDB)
+# =============================================================================
+
+def code_fingerprint(inv_rows, cand, params=()):
+    """
+    인보이스 코드 지문: 코드의 인보이스 행 + 후보 풀(ALL 행 라벨 포함) + 매칭 파라미터
+    지문이 같으면 매칭 결과도 같으므로 재검증 생략 가능
+
+    Args:
+        inv_rows: 코드의 인보이스 행 DataFrame
+        cand: 후보 풀 DataFrame (index = ALL 행 라벨)
+        params: 결과에 영향을 주는 설정값 튜플
+    Returns:
+        str: sha1 hex
+    """
+    h = hashlib.sha1(repr((tuple(params), SOLVER_VERSION)).encode("utf-8"))
+    h.update(repr(list(inv_rows.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(inv_rows, index=False).to_numpy().tobytes())
+    h.update(repr(list(cand.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(cand, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+def _json_default(o):
+    # numpy 스칼라 → 파이썬 값
+    return o.item() if hasattr(o, "item") else str(o)
+
+class RevalidationStore:
+    """
+    인보이스 코드별 지문 + 결과 행/선택 unit 저장 (DuckDB code_state 테이블)
+    지문이 바뀐 코드만 재검증하고 나머지는 저장된 결과 재사용
+
+    Args:
+        db_path: DuckDB 파일 경로
+    """
+
+    def __init__(self, db_path):
+        self.con = duckdb.connect(str(db_path))
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS code_state (
+                raw_code VARCHAR PRIMARY KEY,
+                fingerprint VARCHAR,
+                match_row VARCHAR,
+                picks VARCHAR,
+                updated_at TIMESTAMP DEFAULT current_timestamp
+            )
+        """)
+        self.reused = 0
+        self.solved = 0
+
+    def get_many(self, fingerprints):
+        """{raw_code: 지문} → 지문이 일치하는 코드의 {raw_code: (match_row, picks)}"""
+        if not fingerprints:
+            return {}
+        keys_df = pd.DataFrame({"raw_code": [str(c) for c in fingerprints],
+                                "fingerprint": list(fingerprints.values())})
+        self.con.register("_state_keys", keys_df)
+        rows = self.con.execute("""
+            SELECT s.raw_code, s.match_row, s.picks
+            FROM code_state s JOIN _state_keys k
+              ON s.raw_code = k.raw_code AND s.fingerprint = k.fingerprint
+        """).fetchall()
+        self.con.unregister("_state_keys")
+        by_key = {raw: (json.loads(row), json.loads(picks)) for raw, row, picks in rows}
+        return {code: by_key[str(code)] for code in fingerprints if str(code) in by_key}
+
+    def put_many(self, items):
+        """(raw_code, 지문, match_row dict, picks dict) 목록 저장 (동일 코드는 덮어씀)"""
+        if not items:
+            return
+        self.con.executemany("""
+            INSERT OR REPLACE INTO code_state (raw_code, fingerprint, match_row, picks)
+            VALUES (?, ?, ?, ?)
+        """, [(str(code), fp, json.dumps(row, default=_json_default), json.dumps(picks, default=_json_default))
+              for code, fp, row, picks in items])
+
+    def close(self):
+        self.con.close()
@@ -11,6 +11,7 @@ import duckdb
 from typing import Optional, Dict, Any
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from hvdc_code_utils import normalize_series
 
 def exceptions_to_sku(
     invoice_dashboard_xlsx: str, 
@@ -57,11 +58,11 @@ def exceptions_to_sku(
         
         print(f"[INFO] SKU mapping loaded: {sku_mapping.shape}")
         
-        # 3) Invoice RAW CODE 정규화 및 매핑
+        # 3) Invoice RAW CODE 정규화 및 매핑 (Hub hvdc_code_norm과 동일 규칙)
         if "Invoice_RAW_CODE" in ex.columns:
-            ex["hvdc_code_norm"] = ex["Invoice_RAW_CODE"].astype(str).str.upper().str.replace(" ", "")
+            ex["hvdc_code_norm"] = normalize_series(ex["Invoice_RAW_CODE"])
         elif "HVDC_CODE" in ex.columns:
-            ex["hvdc_code_norm"] = ex["HVDC_CODE"].astype(str).str.upper().str.replace(" ", "")
+            ex["hvdc_code_norm"] = normalize_series(ex["HVDC_CODE"])
         else:
             print("[WARN] No HVDC code column found in exceptions")
             ex["hvdc_code_norm"] = None
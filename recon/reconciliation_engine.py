@@ -14,6 +14,8 @@ from typing import Dict, Any, Optional
 # 현재 디렉토리를 Python 경로에 추가
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from hvdc_workbook_utils import validate_stage_headers
+
 # 기존 어댑터들 import (동적 로드)
 import importlib.util
 
@@ -334,9 +336,11 @@ def validate_reconciliation_inputs(
 ) -> Dict[str, Any]:
     """
     Reconciliation 입력 파일 검증
+    존재 여부 + 단계별 헤더 행 필수 컬럼 (Reporter / Stock / Invoice)을
+    read_only 메타데이터만으로 확인
     
     Returns:
-        dict: 검증 결과
+        dict: 검증 결과 (파일별 headers_ok / missing_columns 포함)
     """
     validation = {
         "hitachi_file": {"path": hitachi_file, "exists": Path(hitachi_file).exists()},
@@ -354,6 +358,23 @@ def validate_reconciliation_inputs(
             validation["all_required_exist"] = False
             validation["validation_passed"] = False
     
+    # 헤더 검증 (존재하는 파일만, 시트 본문 미파싱)
+    checks = [("hitachi_file", "reporter"), ("siemens_file", "reporter"),
+              ("stock_file", "stock"), ("invoice_file", "invoice")]
+    for key, stage in checks:
+        entry = validation[key]
+        if not entry["exists"]:
+            continue
+        headers = validate_stage_headers(entry["path"], stage)
+        entry["headers_ok"] = headers["headers_ok"]
+        entry["missing_columns"] = headers["missing_columns"]
+        if "error" in headers:
+            entry["error"] = headers["error"]
+    
+    # Invoice는 선택 입력 - 헤더 문제는 보고만 하고 통과 여부에 반영하지 않음
+    if any(not validation[key].get("headers_ok", True) for key, _ in checks[:3]):
+        validation["validation_passed"] = False
+    
     return validation
 
 if __name__ == "__main__":
@@ -77,6 +77,8 @@ def main():
         if isinstance(info, dict) and "exists" in info:
             status = "✅" if info["exists"] else "❌"
             print(f"  {status} {file_type}: {info['path']}")
+            if info.get("missing_columns") or info.get("error"):
+                print(f"     ⚠️ 헤더 검증: {info.get('error') or info['missing_columns']}")
     
     if not input_validation["validation_passed"]:
         print("❌ 입력 파일 검증 실패")
@@ -1,25 +1,102 @@
+import os
+import duckdb
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, date
-from collections import defaultdict, Counter
+from collections import OrderedDict, defaultdict
 import openpyxl
+from openpyxl.utils import get_column_letter
 from openpyxl.utils.dataframe import dataframe_to_rows
 import re
 import warnings
 warnings.filterwarnings('ignore')
 
+# "16-Feb", "23-Apr" 처럼 년도 없는 일-월 날짜
+SHORT_DAY_MONTH = re.compile(r'^\d{1,2}-[A-Za-z]{3}$')
+# 범용 파서 이전에 일괄 적용할 형식 (범용 파서와 결과가 같은 형식만)
+KNOWN_DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%Y/%m/%d', '%d-%b-%Y']
+
+# 입출고 이벤트 테이블 컬럼
+EVENT_COLUMNS = ['CASE_NO', 'DATE', 'LOCATION', 'DIRECTION', 'SHEET']
+# 집계용 시트 (CASE가 아닌 날짜/월/창고/통계 행) - 스냅샷 CASE 목록에서 제외
+ANALYSIS_SHEETS = ['날짜별_추이', '월별_분석', '창고별_현황', '분석_통계']
+
+# 파싱된 시트 공유 캐시: (절대경로, mtime_ns, 크기) -> {시트명: DataFrame}
+# 같은 프로세스의 모든 분석 진입점(run_analysis / analyze_hvdc_inventory / 어댑터)이 재사용
+# 장기 실행 프로세스에서 워크북별 DataFrame이 쌓이지 않도록 최근 사용 워크북 N개만 유지 (LRU)
+SHEET_CACHE_MAX_WORKBOOKS = 2
+_SHEET_CACHE = OrderedDict()
+
+def _workbook_key(path):
+    """시트 캐시 키 (파일이 바뀌면 키도 바뀜)"""
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+def _cached_sheets(key):
+    """워크북 키의 시트 캐시 슬롯 (최근 사용으로 갱신, 같은 경로의 이전 버전·오래된 워크북은 폐기)"""
+    for stale in [k for k in _SHEET_CACHE if k[0] == key[0] and k != key]:
+        del _SHEET_CACHE[stale]  # 파일이 바뀐 경우 이전 파싱 결과 폐기
+    cached = _SHEET_CACHE.pop(key, {})
+    _SHEET_CACHE[key] = cached
+    while len(_SHEET_CACHE) > SHEET_CACHE_MAX_WORKBOOKS:
+        _SHEET_CACHE.popitem(last=False)
+    return cached
+
+def _parse_sheet(args):
+    """워커 프로세스용 시트 파싱: (파일 경로, 시트명) → DataFrame (헤더 1행)"""
+    path, sheet_name = args
+    return pd.read_excel(path, sheet_name=sheet_name, header=0)
+
+def _event_keys(events):
+    """이벤트 중복 판정 키 목록: (방향, CASE, 날짜 정수값, 위치)"""
+    dates = events['DATE'].to_numpy().astype('datetime64[us]').view('i8')
+    return list(zip(np.asarray(events['DIRECTION']), np.asarray(events['CASE_NO']),
+                    dates.tolist(), np.asarray(events['LOCATION'])))
+
+def _format_dates(dates):
+    """datetime64 Series → 'yyyy-mm-dd' 문자열 배열 (NaT는 "", 고유값 단위 포맷)"""
+    codes, uniques = pd.factorize(dates)
+    text = np.array([d.strftime('%Y-%m-%d') for d in uniques] + [""], dtype=object)
+    return text[codes]
+
+def _sorted_group_spans(keys):
+    """정렬된 키 배열 → (고유 키, 구간 시작, 구간 끝) - groupby 없이 CASE 단위 집계용"""
+    if len(keys) == 0:
+        empty = np.array([], dtype=np.intp)
+        return keys[:0], empty, empty
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    return keys[starts], starts, ends
+
+def _join_spans(values, starts, ends, sep=', '):
+    """구간별 문자열 결합 (values[start:end] → 'a, b, c')"""
+    values = values.tolist()
+    return np.array([sep.join(values[a:b]) for a, b in zip(starts, ends)], dtype=object)
+
+def clear_sheet_cache():
+    """파싱된 시트 캐시 비우기"""
+    _SHEET_CACHE.clear()
+
 class InventoryTracker:
-    def __init__(self, excel_file_path):
+    def __init__(self, excel_file_path, parse_workers=0):
         """
         창고 재고 추적 시스템 초기화
         
         Args:
             excel_file_path (str): Excel 파일 경로
+            parse_workers (int): 시트 병렬 파싱 워커 프로세스 수 (0/1이면 열린 워크북 핸들로 직렬 파싱)
         """
         self.excel_file = excel_file_path
+        self.parse_workers = parse_workers
         self.workbook = None
-        self.case_data = defaultdict(list)  # CASE -> [(date, location), ...]
-        self.out_data = defaultdict(list)   # 출고 데이터
+        # 입출고 이벤트 테이블 (시트별 프레임 추가, (입출고, CASE, 날짜, 위치) 키로 중복 제거)
+        self._entry_frames = []
+        self._entry_keys = set()
+        self._entries_cache = None
+        self._views_cache = None
+        self._date_cache = {}  # current_year -> {원시값: datetime64}
+        self._summary_cache = None  # (global_max_date, 요약 DataFrame)
         self.global_max_date = None
         
         # 컬럼 매핑 (VBA와 동일: B=2, D=4, H=8 -> 0-based index)
@@ -28,7 +105,9 @@ class InventoryTracker:
         self.DATE_COL = 7    # Column H (0-based: 7)
     
     def load_workbook(self):
-        """Excel 워크북 로드"""
+        """Excel 워크북 로드 (이미 열려 있으면 재사용)"""
+        if self.workbook is not None:
+            return True
         try:
             self.workbook = pd.ExcelFile(self.excel_file)
             print(f"✅ 워크북 로드 완료: {len(self.workbook.sheet_names)}개 시트 발견")
@@ -38,36 +117,114 @@ class InventoryTracker:
             return False
     
     def normalize_date(self, date_val, current_year=2024):
-        """날짜 정규화: yyyy-mm-dd 형식으로 변환"""
-        if pd.isna(date_val) or date_val == "":
-            return ""
+        """날짜 정규화: yyyy-mm-dd 형식으로 변환 (단일 값, 규칙은 normalize_dates와 동일)"""
+        parsed_date = self.normalize_dates(pd.Series([date_val], dtype=object), current_year).iloc[0]
+        return parsed_date.strftime('%Y-%m-%d') if pd.notna(parsed_date) else ""
+    
+    def normalize_dates(self, values, current_year=2024):
+        """
+        날짜 컬럼 일괄 정규화 (고유 원시값 단위, 결과 캐시)
+        1) datetime/date → 일 단위 절삭
+        2) "16-Feb" 형식 → '%d-%b' + current_year
+        3) 알려진 형식(KNOWN_DATE_FORMATS) 순서대로 일괄 파싱
+        4) 나머지만 범용 파서(pd.to_datetime) 개별 적용, 실패 시 NaT
         
-        try:
-            if isinstance(date_val, (datetime, date)):
-                return date_val.strftime('%Y-%m-%d')
-            elif isinstance(date_val, str):
-                date_val = date_val.strip()
-                if date_val == "":
-                    return ""
-                
-                # "16-Feb", "23-Apr" 형식 처리 (년도 없는 경우)
-                if re.match(r'^\d{1,2}-[A-Za-z]{3}$', date_val):
+        Args:
+            values: 원시 날짜 Series
+            current_year: 년도 없는 날짜에 붙일 년도
+        
+        Returns:
+            pd.Series: datetime64[us] (원래 index 유지, 빈 값/실패는 NaT)
+        """
+        codes, uniques = pd.factorize(values)  # 결측은 -1 → NaT
+        cache = self._date_cache.setdefault(current_year, {})
+        missing = [u for u in uniques if u not in cache]
+        if missing:
+            cache.update(zip(missing, self._parse_dates(missing, current_year)))
+        parsed = np.array([cache[u] for u in uniques] + [np.datetime64('NaT')], dtype='datetime64[us]')
+        return pd.Series(parsed[codes], index=values.index, name=values.name)
+    
+    def _parse_dates(self, raw_values, current_year):
+        """원시 날짜 목록 → datetime64 값 목록 (normalize_dates 내부용)"""
+        raw = pd.Series(raw_values, dtype=object)
+        result = pd.Series(pd.NaT, index=raw.index, dtype='datetime64[us]')
+        valid = raw.map(lambda v: not (pd.isna(v) or (isinstance(v, str) and v.strip() == "")))
+        
+        is_dt = raw.map(lambda v: isinstance(v, (datetime, date))) & valid
+        if is_dt.any():
+            dt_values = raw[is_dt].map(lambda v: pd.Timestamp(v).replace(tzinfo=None).normalize())
+            result[is_dt] = pd.to_datetime(dt_values, errors='coerce')
+        
+        text = raw[valid & ~is_dt].map(lambda v: v.strip() if isinstance(v, str) else str(v))
+        
+        # "16-Feb", "23-Apr" 형식 처리 (년도 없는 경우, 현재 년도 추가)
+        short = text[text.str.match(SHORT_DAY_MONTH.pattern)]
+        if len(short):
+            parsed = pd.to_datetime(short + f"-{current_year}", format='%d-%b-%Y', errors='coerce')
+            result[parsed.index] = parsed
+            text = text.drop(parsed.index[parsed.notna()])
+        
+        # 알려진 형식: 일치하는 값만 일괄 변환, 나머지는 다음 형식으로
+        for fmt in KNOWN_DATE_FORMATS:
+            if text.empty:
+                break
+            parsed = pd.to_datetime(text, format=fmt, errors='coerce').dropna()
+            result[parsed.index] = parsed.dt.normalize()
+            text = text.drop(parsed.index)
+        
+        # 일반적인 날짜 형식 처리 (남은 값만 개별 파싱)
+        for idx, date_str in text.items():
+            try:
+                parsed_date = pd.Timestamp(pd.to_datetime(date_str))
+                result[idx] = parsed_date.replace(tzinfo=None).normalize()
+            except Exception:
+                continue
+        
+        return list(result.to_numpy())
+    
+    def load_sheets(self, sheet_names=None):
+        """
+        시트 일괄 파싱 (파일당 1회): 이미 파싱된 시트는 공유 캐시에서 재사용
+        파싱 실패 시트는 캐시에 넣지 않음 (process_sheet에서 오류 보고)
+        
+        Args:
+            sheet_names: 파싱할 시트 목록 (None이면 Onhand_Summary 제외 전체)
+        
+        Returns:
+            dict: {시트명: DataFrame}
+        """
+        if not self.load_workbook():
+            return {}
+        if sheet_names is None:
+            sheet_names = [s for s in self.workbook.sheet_names if s != 'Onhand_Summary']
+        
+        cached = _cached_sheets(_workbook_key(self.excel_file))
+        
+        missing = [s for s in sheet_names if s not in cached]
+        if len(missing) > 1 and self.parse_workers > 1:
+            print(f"⚙️  시트 병렬 파싱: {len(missing)}개, workers={self.parse_workers}")
+            with ProcessPoolExecutor(max_workers=min(self.parse_workers, len(missing))) as ex:
+                futures = {s: ex.submit(_parse_sheet, (self.excel_file, s)) for s in missing}
+                for sheet_name, fut in futures.items():
                     try:
-                        # 현재 년도 추가하여 파싱
-                        full_date = f"{date_val}-{current_year}"
-                        parsed_date = pd.to_datetime(full_date, format='%d-%b-%Y')
-                        return parsed_date.strftime('%Y-%m-%d')
-                    except:
-                        pass
-                
-                # 일반적인 날짜 형식 처리
-                parsed_date = pd.to_datetime(date_val)
-                return parsed_date.strftime('%Y-%m-%d')
-            else:
-                parsed_date = pd.to_datetime(str(date_val))
-                return parsed_date.strftime('%Y-%m-%d')
-        except:
-            return ""
+                        cached[sheet_name] = fut.result()
+                    except Exception:
+                        continue
+        else:
+            for sheet_name in missing:
+                try:
+                    cached[sheet_name] = self.workbook.parse(sheet_name, header=0)
+                except Exception:
+                    continue
+        
+        return {s: cached[s] for s in sheet_names if s in cached}
+    
+    def get_sheet(self, sheet_name):
+        """파싱된 시트 DataFrame (캐시 우선, 실패 시트는 다시 파싱해 오류 전달)"""
+        sheets = self.load_sheets([sheet_name])
+        if sheet_name in sheets:
+            return sheets[sheet_name]
+        return self.workbook.parse(sheet_name, header=0)
     
     def is_out_sheet(self, sheet_name):
         """출고 시트 판별: 이름에 OUT 또는 DISPATCH 포함"""
@@ -77,8 +234,8 @@ class InventoryTracker:
     def process_sheet(self, sheet_name):
         """개별 시트 처리 - 통합분석 파일 구조에 맞게 수정"""
         try:
-            # 시트 데이터 로드 (헤더 1행, 데이터 2행부터)
-            df = pd.read_excel(self.excel_file, sheet_name=sheet_name, header=0)
+            # 시트 데이터 로드 (헤더 1행, 데이터 2행부터, 파싱 결과 공유)
+            df = self.get_sheet(sheet_name)
             
             print(f"📋 {sheet_name} 처리 중... (행: {len(df)}, 열: {len(df.columns)})")
             print(f"   컬럼: {list(df.columns)}")
@@ -106,164 +263,208 @@ class InventoryTracker:
             import traceback
             print(f"   상세 오류: {traceback.format_exc()}")
     
+    def _text(self, values, missing=""):
+        """셀 값 → 문자열 (strip, 결측은 missing)"""
+        return values.map(lambda v: str(v).strip() if pd.notna(v) else missing)
+    
+    def _add_entries(self, sheet_name, case_no, dates, location, is_out):
+        """
+        시트에서 추출한 (CASE, 날짜, 위치) 컬럼을 이벤트 테이블에 추가
+        시트 내 중복은 drop_duplicates, 시트 간 중복은 (방향, CASE, 날짜, 위치) 키 집합으로 제거
+        
+        Args:
+            sheet_name: 원본 시트명
+            case_no, location: 같은 index의 문자열 Series
+            dates: 같은 index의 datetime64 Series (normalize_dates 결과, 실패는 NaT)
+            is_out: 출고 여부 (bool 또는 bool Series)
+        
+        Returns:
+            int: 새로 추가된 건수
+        """
+        entries = pd.DataFrame({
+            'CASE_NO': case_no,
+            'DATE': dates.astype('datetime64[us]'),
+            'LOCATION': location,
+            'DIRECTION': np.where(pd.Series(is_out, index=case_no.index).astype(bool), 'OUT', 'IN'),
+        }, index=case_no.index).drop_duplicates()
+        
+        keys = _event_keys(entries)
+        is_new = np.fromiter((k not in self._entry_keys for k in keys), dtype=bool, count=len(keys))
+        self._entry_keys.update(keys)
+        
+        new_entries = entries[is_new].assign(SHEET=sheet_name).reset_index(drop=True)
+        if len(new_entries):
+            self._entry_frames.append(new_entries)
+            self._entries_cache = None
+            self._summary_cache = None
+        return len(new_entries)
+    
+    @property
+    def entries(self):
+        """
+        중복 제거된 입출고 이벤트 테이블 (추가 순서 유지)
+        CASE_NO/LOCATION/SHEET: category, DATE: datetime64 (NaT=날짜 없음), DIRECTION: category(IN/OUT)
+        """
+        if self._entries_cache is None:
+            frames = self._entry_frames or [pd.DataFrame({c: pd.Series(dtype=object) for c in EVENT_COLUMNS})]
+            events = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            events = events[EVENT_COLUMNS].astype({
+                'CASE_NO': 'category', 'DATE': 'datetime64[us]', 'LOCATION': 'category',
+                'DIRECTION': pd.CategoricalDtype(['IN', 'OUT']), 'SHEET': 'category'})
+            self._entry_frames = [events]  # 시트별 프레임을 하나의 컬럼형 테이블로 압축
+            self._entries_cache = events
+            self._views_cache = None
+        return self._entries_cache
+    
+    def save_events(self, path):
+        """
+        이벤트 테이블 Parquet 저장 (category/datetime64 타입 유지)
+        
+        Args:
+            path: 저장 경로 (.parquet)
+        
+        Returns:
+            str: 저장 경로
+        """
+        self.entries.to_parquet(path, index=False)
+        print(f"💾 이벤트 테이블 저장: {path} ({len(self.entries)}건)")
+        return path
+    
+    def load_events(self, path):
+        """
+        Parquet 이벤트 테이블 로드 (기존 이벤트 대체, 중복 키/캐시 재구성)
+        
+        Args:
+            path: save_events로 저장한 파일 경로
+        
+        Returns:
+            int: 로드된 이벤트 건수
+        """
+        events = pd.read_parquet(path)
+        self._entry_frames = [events]
+        self._entry_keys = set(_event_keys(events))
+        self._entries_cache = None
+        self._summary_cache = None
+        return len(self.entries)
+    
+    def _entry_views(self):
+        """이벤트 테이블 → (입고, 출고) CASE별 [(date, location), ...] 딕셔너리"""
+        events = self.entries
+        if self._views_cache is None:
+            views = (defaultdict(list), defaultdict(list))
+            for is_out, case_no, date_str, location in zip(
+                    (events['DIRECTION'] == 'OUT').to_numpy(), events['CASE_NO'].to_numpy(),
+                    _format_dates(events['DATE']), events['LOCATION'].to_numpy()):
+                views[bool(is_out)][case_no].append((date_str, location))
+            self._views_cache = views
+        return self._views_cache
+    
+    @property
+    def case_data(self):
+        """입고 데이터: CASE -> [(date, location), ...] (호환용 뷰)"""
+        return self._entry_views()[0]
+    
+    @property
+    def out_data(self):
+        """출고 데이터: CASE -> [(date, location), ...] (호환용 뷰)"""
+        return self._entry_views()[1]
+    
     def process_sku_summary_sheet(self, df, sheet_name):
         """종합_SKU요약 시트 처리"""
-        processed_count = 0
-        
-        for idx, row in df.iterrows():
-            if pd.notna(row['SKU']):
-                case_no = str(row['SKU']).strip()
-                location = str(row['Last_Location']).strip() if pd.notna(row['Last_Location']) else ""
-                date_raw = row['Last_Seen'] if pd.notna(row['Last_Seen']) else ""
-                date_normalized = self.normalize_date(date_raw)
-                
-                if case_no and case_no.lower() != 'nan':
-                    entry = (date_normalized, location)
-                    
-                    # 상태에 따라 입고/출고 분류
-                    if 'OUT' in str(row.get('Status', '')):
-                        if entry not in self.out_data[case_no]:
-                            self.out_data[case_no].append(entry)
-                            processed_count += 1
-                    else:
-                        if entry not in self.case_data[case_no]:
-                            self.case_data[case_no].append(entry)
-                            processed_count += 1
-        
-        return processed_count
+        df = df[df['SKU'].notna()]
+        case_no = self._text(df['SKU'])
+        valid = (case_no != '') & (case_no.str.lower() != 'nan')
+        df, case_no = df[valid], case_no[valid]
+        
+        # 상태에 따라 입고/출고 분류
+        status = df['Status'] if 'Status' in df.columns else pd.Series('', index=df.index)
+        is_out = status.map(lambda v: 'OUT' in str(v)).astype(bool)
+        
+        return self._add_entries(sheet_name, case_no, self.normalize_dates(df['Last_Seen']),
+                                 self._text(df['Last_Location']), is_out)
     
     def process_date_trend_sheet(self, df, sheet_name):
         """날짜별_추이 시트 처리"""
-        processed_count = 0
-        
-        for idx, row in df.iterrows():
-            if pd.notna(row['Date']):
-                case_no = f"날짜추이_{row['Date'].strftime('%Y-%m-%d')}"
-                location = f"SKU수량:{row['SKU_Count']}"
-                date_raw = row['Date']
-                date_normalized = self.normalize_date(date_raw)
-                
-                entry = (date_normalized, location)
-                if entry not in self.case_data[case_no]:
-                    self.case_data[case_no].append(entry)
-                    processed_count += 1
+        df = df[df['Date'].notna()]
+        dates = df['Date'].map(lambda d: d.strftime('%Y-%m-%d'))
         
-        return processed_count
+        return self._add_entries(sheet_name, "날짜추이_" + dates, self.normalize_dates(df['Date']),
+                                 "SKU수량:" + df['SKU_Count'].map(str), False)
     
     def process_monthly_analysis_sheet(self, df, sheet_name):
         """월별_분석 시트 처리"""
-        processed_count = 0
-        
-        for idx, row in df.iterrows():
-            if pd.notna(row['Month_Key']):
-                case_no = str(row['Month_Key']).strip()
-                location = f"IN:{row['Total_IN']}_OUT:{row['Total_OUT']}"
-                # 월 키를 날짜로 변환 (예: 2024-06 -> 2024-06-01)
-                date_raw = f"{row['Month_Key']}-01"
-                date_normalized = self.normalize_date(date_raw)
-                
-                entry = (date_normalized, location)
-                if entry not in self.case_data[case_no]:
-                    self.case_data[case_no].append(entry)
-                    processed_count += 1
+        df = df[df['Month_Key'].notna()]
+        month_key = df['Month_Key'].map(str)
+        # 월 키를 날짜로 변환 (예: 2024-06 -> 2024-06-01)
+        dates = self.normalize_dates(month_key + "-01")
         
-        return processed_count
+        return self._add_entries(sheet_name, month_key.str.strip(), dates,
+                                 "IN:" + df['Total_IN'].map(str) + "_OUT:" + df['Total_OUT'].map(str), False)
     
     def process_warehouse_status_sheet(self, df, sheet_name):
         """창고별_현황 시트 처리"""
-        processed_count = 0
-        
-        for idx, row in df.iterrows():
-            if pd.notna(row['Warehouse']):
-                case_no = f"창고_{row['Warehouse']}"
-                location = f"현재재고:{row['Current_Stock']}_총이력:{row['Total_Historical']}"
-                date_normalized = datetime.now().strftime('%Y-%m-%d')  # 현재 날짜 사용
-                
-                entry = (date_normalized, location)
-                if entry not in self.case_data[case_no]:
-                    self.case_data[case_no].append(entry)
-                    processed_count += 1
+        df = df[df['Warehouse'].notna()]
+        today = pd.Timestamp(datetime.now().date())  # 현재 날짜 사용
         
-        return processed_count
+        return self._add_entries(sheet_name, "창고_" + df['Warehouse'].map(str),
+                                 pd.Series(today, index=df.index),
+                                 "현재재고:" + df['Current_Stock'].map(str) + "_총이력:" + df['Total_Historical'].map(str),
+                                 False)
     
     def process_statistics_sheet(self, df, sheet_name):
         """분석_통계 시트 처리"""
-        processed_count = 0
+        key = self._text(df.iloc[:, 0], missing='nan')
+        value = self._text(df.iloc[:, 1], missing='nan')
+        valid = (key != '') & (key != 'nan') & (value != '') & (value != 'nan')
+        today = pd.Timestamp(datetime.now().date())  # 현재 날짜 사용
         
-        for idx, row in df.iterrows():
-            if pd.notna(row.iloc[0]) and pd.notna(row.iloc[1]):
-                key = str(row.iloc[0]).strip()
-                value = str(row.iloc[1]).strip()
-                
-                if key and key != 'nan' and value and value != 'nan':
-                    case_no = f"통계_{key}"
-                    location = value
-                    date_normalized = datetime.now().strftime('%Y-%m-%d')  # 현재 날짜 사용
-                    
-                    entry = (date_normalized, location)
-                    if entry not in self.case_data[case_no]:
-                        self.case_data[case_no].append(entry)
-                        processed_count += 1
-        
-        return processed_count
+        return self._add_entries(sheet_name, "통계_" + key[valid],
+                                 pd.Series(today, index=key.index[valid]),
+                                 value[valid], False)
     
     def process_general_sheet(self, df, sheet_name):
-        """일반 재고 시트 처리 (기존 로직)"""
-        processed_count = 0
-        
+        """일반 재고 시트 처리 (B/D/H 컬럼 추출)"""
         if len(df.columns) <= max(self.CASE_COL, self.LOCATION_COL, self.DATE_COL):
             print(f"⚠️  {sheet_name}: 컬럼 수 부족 (필요: {max(self.CASE_COL, self.LOCATION_COL, self.DATE_COL)+1}, 실제: {len(df.columns)}), 건너뜀")
             return 0
         
-        # 필요한 컬럼만 추출 (안전하게)
-        case_col = df.iloc[:, self.CASE_COL] if len(df.columns) > self.CASE_COL else pd.Series()
-        location_col = df.iloc[:, self.LOCATION_COL] if len(df.columns) > self.LOCATION_COL else pd.Series()
-        date_col = df.iloc[:, self.DATE_COL] if len(df.columns) > self.DATE_COL else pd.Series()
+        # 필요한 컬럼만 추출
+        df = df.iloc[:, [self.CASE_COL, self.LOCATION_COL, self.DATE_COL]]
+        case_no = self._text(df.iloc[:, 0])
         
         # 빈 CASE_NO 제거
-        valid_rows = case_col.notna() & (case_col.astype(str).str.strip() != '')
-        
-        is_out = self.is_out_sheet(sheet_name)
+        valid = (case_no != '') & (case_no.str.lower() != 'nan')
+        df, case_no = df[valid], case_no[valid]
         
-        for idx in df.index[valid_rows]:
-            case_no = str(case_col.iloc[idx]).strip()
-            location = str(location_col.iloc[idx]).strip() if idx < len(location_col) and pd.notna(location_col.iloc[idx]) else ""
-            date_raw = date_col.iloc[idx] if idx < len(date_col) else ""
-            date_normalized = self.normalize_date(date_raw)
-            
-            if case_no and case_no.lower() != 'nan':
-                entry = (date_normalized, location)
-                
-                if is_out:
-                    # 출고 데이터에 중복 체크 후 추가
-                    if entry not in self.out_data[case_no]:
-                        self.out_data[case_no].append(entry)
-                        processed_count += 1
-                else:
-                    # 입고 데이터에 중복 체크 후 추가
-                    if entry not in self.case_data[case_no]:
-                        self.case_data[case_no].append(entry)
-                        processed_count += 1
-        
-        return processed_count
+        return self._add_entries(sheet_name, case_no, self.normalize_dates(df.iloc[:, 2]),
+                                 self._text(df.iloc[:, 1]), self.is_out_sheet(sheet_name))
     
     def calculate_global_max_date(self):
         """전역 최신 날짜 계산 (입고 데이터 기준)"""
-        max_date = None
-        
-        for case_entries in self.case_data.values():
-            for date_str, _ in case_entries:
-                try:
-                    current_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                    if max_date is None or current_date > max_date:
-                        max_date = current_date
-                except:
-                    continue
+        events = self.entries
+        latest = events.loc[events['DIRECTION'] == 'IN', 'DATE'].max()
+        max_date = latest.date() if pd.notna(latest) else None
         
         self.global_max_date = max_date
         if max_date:
             print(f"🗓️  전역 최신 스냅샷 날짜: {max_date}")
     
+    def latest_snapshot(self):
+        """
+        최신 스냅샷: 입고 이벤트 중 최신 날짜에 관측된 CASE와 위치 (집계용 시트 제외)
+        
+        Returns:
+            tuple: (스냅샷 날짜 date 또는 None, DataFrame[CASE_NO, LOCATION])
+        """
+        events = self.entries
+        stock = events[(events['DIRECTION'] == 'IN') & events['DATE'].notna()
+                       & ~events['SHEET'].isin(ANALYSIS_SHEETS)]
+        if stock.empty:
+            return None, pd.DataFrame(columns=['CASE_NO', 'LOCATION'])
+        latest = stock['DATE'].max()
+        snapshot = stock.loc[stock['DATE'] == latest, ['CASE_NO', 'LOCATION']].astype(str)
+        return latest.date(), snapshot.drop_duplicates('CASE_NO', keep='last').reset_index(drop=True)
+    
     def determine_status(self, case_no, in_entries, out_entries):
         """재고 상태 결정"""
         if out_entries:
@@ -291,41 +492,109 @@ class InventoryTracker:
             return "UNKNOWN", ""
     
     def create_summary(self):
-        """요약 리포트 생성"""
-        # 모든 CASE 수집
-        all_cases = set(self.case_data.keys()) | set(self.out_data.keys())
+        """
+        요약 리포트 생성 (CASE 정렬 구간 단위 벡터 계산, 결과 캐시)
+        캐시는 새 입출고 데이터 추가 또는 전역 최신 날짜 변경 시 무효화
+        
+        Returns:
+            pd.DataFrame: CASE_NO, Count, First_IN_Date, All_IN_Dates, LastSeen, Last_Location, Status, Note
+        """
+        if self._summary_cache is not None and self._summary_cache[0] == self.global_max_date:
+            return self._summary_cache[1].copy()
+        
+        # CASE → 날짜 순 정렬 (같은 날짜는 추가 순서 유지, 날짜 없음은 맨 앞)
+        events = self.entries.sort_values(['CASE_NO', 'DATE'], kind='stable', na_position='first')
+        is_out = (events['DIRECTION'] == 'OUT').to_numpy()
+        in_events = events[~is_out]
+        out_events = events[is_out & events['DATE'].notna().to_numpy()]
+        
+        # 기본 정보 (정렬된 CASE 구간 단위: 첫/마지막 행, 건수, 날짜 목록)
+        in_cases, starts, ends = _sorted_group_spans(np.asarray(in_events['CASE_NO'], dtype=object))
+        in_dates = _format_dates(in_events['DATE'])
+        summary = pd.DataFrame({
+            'Count': ends - starts,
+            'First_IN_Date': in_dates[starts],
+            'All_IN_Dates': _join_spans(in_dates, starts, ends),
+            'LastSeen': in_dates[ends - 1],
+            'Last_Location': np.asarray(in_events['LOCATION'], dtype=object)[ends - 1],
+            'LastSeen_Date': in_events['DATE'].to_numpy()[ends - 1],
+        }, index=pd.Index(in_cases, dtype=object))
+        out_case_values = np.asarray(events['CASE_NO'], dtype=object)[is_out]
+        all_cases = summary.index.union(pd.Index(pd.unique(out_case_values), dtype=object))
+        summary = summary.reindex(all_cases)
+        summary['Count'] = summary['Count'].fillna(0).astype('int64')
+        
+        # 상태 결정: 출고 기록 → OUT, 입고만 → 최신 스냅샷 날짜와 비교
+        has_out = all_cases.isin(out_case_values)
+        has_in = summary['Count'].to_numpy() > 0
+        out_cases, starts, ends = _sorted_group_spans(np.asarray(out_events['CASE_NO'], dtype=object))
+        out_note = "OutDates: " + pd.Series(_join_spans(_format_dates(out_events['DATE']), starts, ends),
+                                            index=pd.Index(out_cases, dtype=object)).reindex(all_cases, fill_value='')
+        if self.global_max_date:
+            absent = has_in & (summary['LastSeen_Date'] < pd.Timestamp(self.global_max_date)).to_numpy()  # NaT → False
+        else:
+            absent = np.zeros(len(all_cases), dtype=bool)
+        summary = summary.drop(columns='LastSeen_Date').fillna('')
+        absent_note = "LastSeen: " + summary['LastSeen'] + f" ; GlobalLatest: {self.global_max_date}"
+        
+        summary['Status'] = np.select([has_out, absent, has_in],
+                                      ["OUT (by OUTsheet)", "OUT (absent in latest snapshot)", "IN"], "UNKNOWN")
+        summary['Note'] = np.select([has_out, absent], [out_note.to_numpy(), absent_note.to_numpy()], "")
+        
+        summary = summary.rename_axis('CASE_NO').reset_index()
+        text_cols = ['CASE_NO', 'First_IN_Date', 'All_IN_Dates', 'LastSeen', 'Last_Location', 'Status', 'Note']
+        summary = summary.astype({c: str for c in text_cols})[
+            ['CASE_NO', 'Count', 'First_IN_Date', 'All_IN_Dates', 'LastSeen', 'Last_Location', 'Status', 'Note']]
+        self._summary_cache = (self.global_max_date, summary)
+        return summary.copy()
+    
+    def _column_widths(self, df, max_width=50):
+        """컬럼 너비: 헤더/값 문자열 최대 길이 + 2 (pandas 벡터 계산, 상한 max_width)"""
+        widths = []
+        for col in df.columns:
+            lengths = df[col].astype(str).str.len()
+            max_length = max(len(str(col)), int(lengths.max()) if lengths.notna().any() else 0)
+            widths.append(min(max_length + 2, max_width))
+        return widths
+    
+    def export_summary(self, output_file=None, fmt='xlsx'):
+        """
+        요약 결과를 별도 파일로 내보내기 (원본 워크북 로드 없음)
+        - xlsx: xlsxwriter 쓰기 전용, 컬럼 너비는 pandas로 계산
+        - parquet: 컬럼형 저장
         
-        summary_data = []
+        Args:
+            output_file: 출력 경로 (None이면 원본명_onhand_summary.xlsx / .parquet)
+            fmt: 'xlsx' 또는 'parquet'
         
-        for case_no in sorted(all_cases):
-            in_entries = sorted(self.case_data.get(case_no, []), key=lambda x: x[0])
-            out_entries = sorted(self.out_data.get(case_no, []), key=lambda x: x[0])
+        Returns:
+            str: 저장된 파일 경로 (실패 시 None)
+        """
+        if output_file is None:
+            output_file = os.path.splitext(self.excel_file)[0] + f'_onhand_summary.{fmt}'
+        
+        try:
+            summary_df = self.create_summary()
             
-            # 기본 정보
-            count = len(in_entries)
-            first_in_date = in_entries[0][0] if in_entries else ""
-            all_in_dates = ", ".join([entry[0] for entry in in_entries])
-            last_seen = in_entries[-1][0] if in_entries else ""
-            last_location = in_entries[-1][1] if in_entries else ""
+            if fmt == 'parquet':
+                summary_df.to_parquet(output_file, index=False)
+            else:
+                with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
+                    summary_df.to_excel(writer, sheet_name='Onhand_Summary', index=False)
+                    ws = writer.sheets['Onhand_Summary']
+                    for col_idx, width in enumerate(self._column_widths(summary_df)):
+                        ws.set_column(col_idx, col_idx, width)
             
-            # 상태 결정
-            status, note = self.determine_status(case_no, in_entries, out_entries)
+            print(f"✅ 요약 파일 저장 완료: {output_file}")
+            print(f"📊 총 {len(summary_df)}건 처리")
+            return output_file
             
-            summary_data.append({
-                'CASE_NO': case_no,
-                'Count': count,
-                'First_IN_Date': first_in_date,
-                'All_IN_Dates': all_in_dates,
-                'LastSeen': last_seen,
-                'Last_Location': last_location,
-                'Status': status,
-                'Note': note
-            })
-        
-        return pd.DataFrame(summary_data)
+        except Exception as e:
+            print(f"❌ 파일 저장 실패: {e}")
+            return None
     
     def save_summary_to_excel(self, output_file=None):
-        """요약 결과를 Excel 파일로 저장"""
+        """요약 결과를 원본 워크북 사본에 Onhand_Summary 시트로 추가 저장 (전체 로드/저장)"""
         if output_file is None:
             output_file = self.excel_file.replace('.xlsx', '_with_summary.xlsx')
         
@@ -345,18 +614,9 @@ class InventoryTracker:
             for r in dataframe_to_rows(summary_df, index=False, header=True):
                 ws.append(r)
             
-            # 컬럼 너비 자동 조정
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
+            # 컬럼 너비 자동 조정 (셀 순회 없이 pandas로 계산)
+            for col_idx, width in enumerate(self._column_widths(summary_df), start=1):
+                ws.column_dimensions[get_column_letter(col_idx)].width = width
             
             wb.save(output_file)
             print(f"✅ 요약 파일 저장 완료: {output_file}")
@@ -367,16 +627,22 @@ class InventoryTracker:
             print(f"❌ 파일 저장 실패: {e}")
             return None
     
-    def run_analysis(self):
-        """전체 분석 실행"""
+    def analyze(self):
+        """
+        메모리 내 분석 (워크북 쓰기 없음): 시트 1회 파싱 → 시트 처리 → 전역 최신 날짜 계산
+        
+        Returns:
+            pd.DataFrame: 요약 리포트 (워크북 로드 실패 시 None)
+        """
         print("🚀 재고 추적 분석 시작...")
         
         # 1. 워크북 로드
         if not self.load_workbook():
             return None
         
-        # 2. 모든 시트 처리
+        # 2. 모든 시트 처리 (시트 파싱은 1회)
         print("\n📂 시트 처리 중...")
+        self.load_sheets()
         for sheet_name in self.workbook.sheet_names:
             if sheet_name not in ['Onhand_Summary']:  # 요약 시트 제외
                 self.process_sheet(sheet_name)
@@ -385,9 +651,24 @@ class InventoryTracker:
         print("\n📅 날짜 분석 중...")
         self.calculate_global_max_date()
         
+        return self.create_summary()
+    
+    def run_analysis(self, export_format='xlsx', in_place=False):
+        """
+        전체 분석 실행 (analyze + 요약 저장)
+        
+        Args:
+            export_format: 별도 요약 파일 형식 ('xlsx' / 'parquet')
+            in_place: True면 원본 워크북 사본에 Onhand_Summary 시트 추가 (기존 방식)
+        """
+        if self.analyze() is None:
+            return None
+        
         # 4. 요약 리포트 생성 및 저장
         print("\n📋 요약 리포트 생성 중...")
-        return self.save_summary_to_excel()
+        if in_place:
+            return self.save_summary_to_excel()
+        return self.export_summary(fmt=export_format)
     
     def get_status_summary(self):
         """상태별 요약 통계"""
@@ -401,14 +682,201 @@ class InventoryTracker:
         return status_counts
 
 
+class StockHistoryStore:
+    """
+    일별 Stock On Hand 스냅샷 이력 저장소 (DuckDB, append-only)
+    - snapshots / snapshot_cases: 스냅샷별 CASE·위치 원본 이력
+    - case_state: CASE별 First/Last Seen, 최종 위치, 최신 스냅샷 보유 여부 (증분 갱신)
+    - snapshot_deltas: 직전 스냅샷 대비 APPEARED / DISAPPEARED / MOVED
+    스냅샷 1건 적재 비용은 O(스냅샷 크기) - 과거 이력 재처리 없음
+    
+    Args:
+        db_path: DuckDB 파일 경로
+    """
+    
+    def __init__(self, db_path):
+        self.con = duckdb.connect(str(db_path))
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                snapshot_date DATE PRIMARY KEY,
+                source VARCHAR,
+                case_count INTEGER,
+                ingested_at TIMESTAMP DEFAULT current_timestamp
+            )
+        """)
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS snapshot_cases (
+                snapshot_date DATE,
+                case_no VARCHAR,
+                location VARCHAR
+            )
+        """)
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS case_state (
+                case_no VARCHAR PRIMARY KEY,
+                first_seen DATE,
+                last_seen DATE,
+                last_location VARCHAR,
+                present BOOLEAN
+            )
+        """)
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS snapshot_deltas (
+                snapshot_date DATE,
+                case_no VARCHAR,
+                change VARCHAR,
+                prev_location VARCHAR,
+                location VARCHAR
+            )
+        """)
+    
+    def latest_date(self):
+        """마지막으로 적재된 스냅샷 날짜 (없으면 None)"""
+        return self.con.execute("SELECT max(snapshot_date) FROM snapshots").fetchone()[0]
+    
+    def ingest(self, snapshot, snapshot_date, source=None):
+        """
+        새 스냅샷 적재 + 직전 스냅샷 대비 변화 계산 (집합 차)
+        
+        Args:
+            snapshot: CASE_NO, LOCATION 컬럼 DataFrame (같은 CASE는 마지막 행 사용)
+            snapshot_date: 스냅샷 날짜 (직전 적재분보다 이후여야 함)
+            source: 원본 파일 경로 등 메모
+        
+        Returns:
+            dict: snapshot_date, previous_date, appeared, disappeared, moved (건수), deltas (DataFrame)
+        """
+        snapshot_date = pd.Timestamp(snapshot_date).date()
+        previous_date = self.latest_date()
+        if previous_date is not None and snapshot_date <= previous_date:
+            raise ValueError(f"스냅샷 날짜 {snapshot_date}가 마지막 적재 {previous_date} 이후가 아님 (append-only)")
+        
+        snap = (snapshot[['CASE_NO', 'LOCATION']].astype(str)
+                .drop_duplicates('CASE_NO', keep='last').reset_index(drop=True))
+        prev = self.con.execute(
+            "SELECT case_no AS CASE_NO, location AS PREV_LOCATION FROM snapshot_cases WHERE snapshot_date = ?",
+            [previous_date]).df() if previous_date is not None else pd.DataFrame(columns=['CASE_NO', 'PREV_LOCATION'])
+        
+        # 직전 스냅샷과의 집합 차: 신규 / 사라짐 / 위치 변경
+        merged = prev.merge(snap, on='CASE_NO', how='outer', indicator=True)
+        change = np.select(
+            [merged['_merge'] == 'right_only', merged['_merge'] == 'left_only',
+             merged['PREV_LOCATION'] != merged['LOCATION']],
+            ['APPEARED', 'DISAPPEARED', 'MOVED'], '')
+        deltas = pd.DataFrame({
+            'snapshot_date': snapshot_date,
+            'case_no': merged['CASE_NO'],
+            'change': change,
+            'prev_location': merged['PREV_LOCATION'],
+            'location': merged['LOCATION'],
+        })
+        deltas = deltas[deltas['change'] != ''].sort_values(['change', 'case_no']).reset_index(drop=True)
+        
+        self.con.register("_snap", snap.assign(snapshot_date=snapshot_date))
+        self.con.register("_deltas", deltas)
+        self.con.execute("BEGIN TRANSACTION")
+        try:
+            self.con.execute("INSERT INTO snapshot_cases SELECT snapshot_date, CASE_NO, LOCATION FROM _snap")
+            self.con.execute("""
+                INSERT INTO case_state
+                SELECT CASE_NO, snapshot_date, snapshot_date, LOCATION, TRUE FROM _snap
+                ON CONFLICT (case_no) DO UPDATE SET
+                    last_seen = excluded.last_seen,
+                    last_location = excluded.last_location,
+                    present = TRUE
+            """)
+            self.con.execute("""
+                UPDATE case_state SET present = FALSE
+                WHERE case_no IN (SELECT case_no FROM _deltas WHERE change = 'DISAPPEARED')
+            """)
+            self.con.execute("INSERT INTO snapshot_deltas SELECT * FROM _deltas")
+            self.con.execute("INSERT INTO snapshots (snapshot_date, source, case_count) VALUES (?, ?, ?)",
+                             [snapshot_date, source, len(snap)])
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+        finally:
+            self.con.unregister("_snap")
+            self.con.unregister("_deltas")
+        
+        counts = deltas['change'].value_counts()
+        return {
+            "snapshot_date": snapshot_date,
+            "previous_date": previous_date,
+            "appeared": int(counts.get('APPEARED', 0)),
+            "disappeared": int(counts.get('DISAPPEARED', 0)),
+            "moved": int(counts.get('MOVED', 0)),
+            "deltas": deltas,
+        }
+    
+    def case_status(self):
+        """
+        CASE별 이력 상태 (최신 스냅샷 보유 → IN, 이전 스냅샷에만 존재 → OUT)
+        
+        Returns:
+            pd.DataFrame: CASE_NO, First_Seen, Last_Seen, Last_Location, Status
+        """
+        return self.con.execute("""
+            SELECT case_no AS CASE_NO, first_seen AS First_Seen, last_seen AS Last_Seen,
+                   last_location AS Last_Location,
+                   CASE WHEN present THEN 'IN' ELSE 'OUT (absent in latest snapshot)' END AS Status
+            FROM case_state ORDER BY case_no
+        """).df()
+    
+    def deltas(self, snapshot_date=None):
+        """스냅샷 변화 이력 (snapshot_date 지정 시 해당 날짜만)"""
+        if snapshot_date is None:
+            return self.con.execute("SELECT * FROM snapshot_deltas ORDER BY snapshot_date, change, case_no").df()
+        return self.con.execute("SELECT * FROM snapshot_deltas WHERE snapshot_date = ? ORDER BY change, case_no",
+                                [pd.Timestamp(snapshot_date).date()]).df()
+    
+    def close(self):
+        self.con.close()
+
+
+def ingest_stock_snapshot(excel_file_path, db_path, parse_workers=0):
+    """
+    일별 Stock On Hand 리포트 1건을 이력 저장소에 적재
+    
+    Args:
+        excel_file_path (str): 당일 Stock Excel 파일 경로
+        db_path (str): StockHistoryStore DuckDB 경로
+        parse_workers (int): 시트 병렬 파싱 워커 수 (0/1이면 직렬)
+    
+    Returns:
+        dict: StockHistoryStore.ingest 결과 (스냅샷이 없으면 None)
+    """
+    tracker = InventoryTracker(excel_file_path, parse_workers=parse_workers)
+    if tracker.analyze() is None:
+        return None
+    snapshot_date, snapshot = tracker.latest_snapshot()
+    if snapshot_date is None:
+        print("❌ 스냅샷 날짜를 찾을 수 없음")
+        return None
+    
+    store = StockHistoryStore(db_path)
+    try:
+        result = store.ingest(snapshot, snapshot_date, source=str(excel_file_path))
+    finally:
+        store.close()
+    
+    print(f"📥 스냅샷 적재: {result['snapshot_date']} (이전: {result['previous_date']}, {len(snapshot)}개 CASE)")
+    print(f"   신규 {result['appeared']} / 사라짐 {result['disappeared']} / 위치 변경 {result['moved']}")
+    return result
+
+
 # 사용 예시 및 메인 실행 함수
-def main(excel_file_path, output_file=None):
+def main(excel_file_path, output_file=None, parse_workers=0, export_format='xlsx', in_place=False):
     """
     메인 실행 함수
     
     Args:
         excel_file_path (str): 분석할 Excel 파일 경로
         output_file (str): 출력 파일 경로 (선택사항)
+        parse_workers (int): 시트 병렬 파싱 워커 수 (0/1이면 직렬)
+        export_format (str): 요약 파일 형식 ('xlsx' / 'parquet')
+        in_place (bool): True면 원본 워크북 사본에 요약 시트 추가 (기존 방식)
     
     Returns:
         str: 생성된 요약 파일 경로
@@ -417,10 +885,10 @@ def main(excel_file_path, output_file=None):
     print("🏭 HVDC 프로젝트 재고 추적 시스템 v2.0")
     print("=" * 60)
     
-    tracker = InventoryTracker(excel_file_path)
+    tracker = InventoryTracker(excel_file_path, parse_workers=parse_workers)
     
     # 분석 실행
-    result_file = tracker.run_analysis()
+    result_file = tracker.run_analysis(export_format=export_format, in_place=in_place)
     
     if result_file:
         # 상태별 통계 출력
@@ -453,20 +921,23 @@ def main(excel_file_path, output_file=None):
         print("❌ 분석 실패")
         return None
 
-def analyze_hvdc_inventory(file_path, show_details=True):
+def analyze_hvdc_inventory(file_path, show_details=True, parse_workers=0, in_place=False):
     """
     HVDC 프로젝트 전용 재고 분석 함수
     
     Args:
         file_path (str): Excel 파일 경로
         show_details (bool): 상세 정보 출력 여부
+        parse_workers (int): 시트 병렬 파싱 워커 수 (0/1이면 직렬)
+        in_place (bool): True면 원본 워크북 사본에 요약 시트 추가 (기존 방식)
     """
     print("🔍 HVDC 재고 상세 분석 시작...")
     
-    tracker = InventoryTracker(file_path)
+    tracker = InventoryTracker(file_path, parse_workers=parse_workers)
     
     if not tracker.load_workbook():
         return None
+    tracker.load_sheets()
     
     # 시트별 상세 분석
     sheet_analysis = {}
@@ -487,270 +958,15 @@ def analyze_hvdc_inventory(file_path, show_details=True):
             print(f"   {sheet} ({info['type']}): {info['case_count']}개 CASE")
     
     tracker.calculate_global_max_date()
-    summary_file = tracker.save_summary_to_excel()
+    summary_file = tracker.save_summary_to_excel() if in_place else tracker.export_summary()
     
     return summary_file
 
-# 직접 실행 시 테스트
-if __name__ == "__main__":
-    # 실제 사용 예시
-    print("🧪 테스트 모드")
-    print("실제 사용법:")
-    print("   result = main('your_inventory_file.xlsx')")
-    print("   또는")  
-    print("   result = analyze_hvdc_inventory('your_inventory_file.xlsx')")
-    
-    # 실제 파일이 있다면 주석 해제
-    # test_file = "hvdc_inventory.xlsx"
-    # result = main(test_file)
-    
-    # if result:
-    #     print(f"\n🎉 분석 완료! 결과 파일: {result}")
-    
-    def is_out_sheet(self, sheet_name):
-        """출고 시트 판별: 이름에 OUT 또는 DISPATCH 포함"""
-        sheet_upper = sheet_name.upper()
-        return 'OUT' in sheet_upper or 'DISPATCH' in sheet_upper
-    
-    def process_sheet(self, sheet_name):
-        """개별 시트 처리"""
-        try:
-            # 시트 데이터 로드 (헤더 1행, 데이터 2행부터)
-            df = pd.read_excel(self.excel_file, sheet_name=sheet_name, header=0)
-            
-            if len(df.columns) <= max(self.CASE_COL, self.LOCATION_COL, self.DATE_COL):
-                print(f"⚠️  {sheet_name}: 컬럼 수 부족, 건너뜀")
-                return
-            
-            # 필요한 컬럼만 추출
-            df_filtered = df.iloc[:, [self.CASE_COL, self.LOCATION_COL, self.DATE_COL]]
-            df_filtered.columns = ['CASE_NO', 'LOCATION', 'DATE_RECEIVE']
-            
-            # 빈 CASE_NO 제거
-            df_filtered = df_filtered[df_filtered['CASE_NO'].notna()]
-            df_filtered = df_filtered[df_filtered['CASE_NO'].astype(str).str.strip() != '']
-            
-            is_out = self.is_out_sheet(sheet_name)
-            processed_count = 0
-            
-            for _, row in df_filtered.iterrows():
-                case_no = str(row['CASE_NO']).strip()
-                location = str(row['LOCATION']).strip() if pd.notna(row['LOCATION']) else ""
-                date_normalized = self.normalize_date(row['DATE_RECEIVE'])
-                
-                if case_no and date_normalized:
-                    entry = (date_normalized, location)
-                    
-                    if is_out:
-                        # 출고 데이터에 중복 체크 후 추가
-                        if entry not in self.out_data[case_no]:
-                            self.out_data[case_no].append(entry)
-                            processed_count += 1
-                    else:
-                        # 입고 데이터에 중복 체크 후 추가
-                        if entry not in self.case_data[case_no]:
-                            self.case_data[case_no].append(entry)
-                            processed_count += 1
-            
-            sheet_type = "출고" if is_out else "입고"
-            print(f"📋 {sheet_name} ({sheet_type}): {processed_count}건 처리")
-            
-        except Exception as e:
-            print(f"❌ {sheet_name} 처리 실패: {e}")
-    
-    def calculate_global_max_date(self):
-        """전역 최신 날짜 계산 (입고 데이터 기준)"""
-        max_date = None
-        
-        for case_entries in self.case_data.values():
-            for date_str, _ in case_entries:
-                try:
-                    current_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                    if max_date is None or current_date > max_date:
-                        max_date = current_date
-                except:
-                    continue
-        
-        self.global_max_date = max_date
-        if max_date:
-            print(f"🗓️  전역 최신 스냅샷 날짜: {max_date}")
-    
-    def determine_status(self, case_no, in_entries, out_entries):
-        """재고 상태 결정"""
-        if out_entries:
-            # 출고 기록이 있으면 OUT
-            out_dates = [entry[0] for entry in out_entries if entry[0]]
-            return "OUT (by OUTsheet)", f"OutDates: {', '.join(out_dates)}"
-        
-        elif in_entries:
-            # 입고 기록만 있는 경우 - 최신 스냅샷과 비교
-            sorted_entries = sorted(in_entries, key=lambda x: x[0])
-            last_seen_str = sorted_entries[-1][0]
-            
-            try:
-                last_seen_date = datetime.strptime(last_seen_str, '%Y-%m-%d').date()
-                
-                if self.global_max_date and last_seen_date < self.global_max_date:
-                    return "OUT (absent in latest snapshot)", \
-                           f"LastSeen: {last_seen_str} ; GlobalLatest: {self.global_max_date}"
-                else:
-                    return "IN", ""
-            except:
-                return "IN", ""
-        
-        else:
-            return "UNKNOWN", ""
-    
-    def create_summary(self):
-        """요약 리포트 생성"""
-        # 모든 CASE 수집
-        all_cases = set(self.case_data.keys()) | set(self.out_data.keys())
-        
-        summary_data = []
-        
-        for case_no in sorted(all_cases):
-            in_entries = sorted(self.case_data.get(case_no, []), key=lambda x: x[0])
-            out_entries = sorted(self.out_data.get(case_no, []), key=lambda x: x[0])
-            
-            # 기본 정보
-            count = len(in_entries)
-            first_in_date = in_entries[0][0] if in_entries else ""
-            all_in_dates = ", ".join([entry[0] for entry in in_entries])
-            last_seen = in_entries[-1][0] if in_entries else ""
-            last_location = in_entries[-1][1] if in_entries else ""
-            
-            # 상태 결정
-            status, note = self.determine_status(case_no, in_entries, out_entries)
-            
-            summary_data.append({
-                'CASE_NO': case_no,
-                'Count': count,
-                'First_IN_Date': first_in_date,
-                'All_IN_Dates': all_in_dates,
-                'LastSeen': last_seen,
-                'Last_Location': last_location,
-                'Status': status,
-                'Note': note
-            })
-        
-        return pd.DataFrame(summary_data)
-    
-    def save_summary_to_excel(self, output_file=None):
-        """요약 결과를 Excel 파일로 저장"""
-        if output_file is None:
-            output_file = self.excel_file.replace('.xlsx', '_with_summary.xlsx')
-        
-        try:
-            # 기존 워크북 복사
-            wb = openpyxl.load_workbook(self.excel_file)
-            
-            # 기존 Onhand_Summary 시트 삭제 (있다면)
-            if 'Onhand_Summary' in wb.sheetnames:
-                wb.remove(wb['Onhand_Summary'])
-            
-            # 새 요약 시트 생성
-            summary_df = self.create_summary()
-            ws = wb.create_sheet('Onhand_Summary')
-            
-            # 데이터프레임을 시트에 쓰기
-            for r in dataframe_to_rows(summary_df, index=False, header=True):
-                ws.append(r)
-            
-            # 컬럼 너비 자동 조정
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
-            
-            wb.save(output_file)
-            print(f"✅ 요약 파일 저장 완료: {output_file}")
-            print(f"📊 총 {len(summary_df)}건 처리")
-            return output_file
-            
-        except Exception as e:
-            print(f"❌ 파일 저장 실패: {e}")
-            return None
-    
-    def run_analysis(self):
-        """전체 분석 실행"""
-        print("🚀 재고 추적 분석 시작...")
-        
-        # 1. 워크북 로드
-        if not self.load_workbook():
-            return None
-        
-        # 2. 모든 시트 처리
-        print("\n📂 시트 처리 중...")
-        for sheet_name in self.workbook.sheet_names:
-            if sheet_name not in ['Onhand_Summary']:  # 요약 시트 제외
-                self.process_sheet(sheet_name)
-        
-        # 3. 전역 최신 날짜 계산
-        print("\n📅 날짜 분석 중...")
-        self.calculate_global_max_date()
-        
-        # 4. 요약 리포트 생성 및 저장
-        print("\n📋 요약 리포트 생성 중...")
-        return self.save_summary_to_excel()
-    
-    def get_status_summary(self):
-        """상태별 요약 통계"""
-        summary_df = self.create_summary()
-        status_counts = summary_df['Status'].value_counts()
-        
-        print("\n📈 상태별 통계:")
-        for status, count in status_counts.items():
-            print(f"   {status}: {count}건")
-        
-        return status_counts
-
-
-# 사용 예시 및 메인 실행 함수
-def main(excel_file_path):
-    """
-    메인 실행 함수
-    
-    Args:
-        excel_file_path (str): 분석할 Excel 파일 경로
-    
-    Returns:
-        str: 생성된 요약 파일 경로
-    """
-    tracker = InventoryTracker(excel_file_path)
-    
-    # 분석 실행
-    output_file = tracker.run_analysis()
-    
-    if output_file:
-        # 상태별 통계 출력
-        tracker.get_status_summary()
-        
-        # 요약 데이터프레임 미리보기
-        summary_df = tracker.create_summary()
-        print(f"\n📋 요약 데이터 미리보기 (상위 10건):")
-        print(summary_df.head(10).to_string(index=False))
-        
-        return output_file
-    else:
-        print("❌ 분석 실패")
-        return None
-
 # 직접 실행 시 테스트
 if __name__ == "__main__":
     # HVDC 프로젝트 재고 데이터 분석 - 통합분석 파일
     test_file = r"HVDC WH DATA\Stock On Hand Report_통합분석_20250919_1604.xlsx"
     
-    print("=" * 60)
-    print("🏭 HVDC 프로젝트 재고 추적 시스템 v2.0")
-    print("=" * 60)
-    
     result = main(test_file)
     
     if result:
@@ -8,6 +8,8 @@ import pandas as pd
 import numpy as np
 import sys
 import os
+import json
+import time
 from datetime import datetime, timedelta
 
 # Enhanced utilities import
@@ -15,7 +17,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from enhanced_sku_utils import (
     normalize_sku, guarded_join, validate_flow_transitions,
     get_tolerance, topn_alternatives, daily_occupancy,
-    add_provenance, robust_outliers, validate_sku_master_quality
+    add_provenance, robust_outliers, validate_sku_master_quality,
+    upsert_sku_master
 )
 
 # Test data fixtures
@@ -99,6 +102,59 @@ class TestSKUNormalization:
         
         result = guarded_join(left, right, on='SKU')
         assert len(result) > 0  # 조인은 성공해야 함
+    
+    def test_guarded_join_keeps_inputs(self, sample_sku_data):
+        """조인 시 입력 프레임 키를 변경하지 않음"""
+        left = pd.DataFrame({'SKU': [' sku001', 'SKU–002'], 'Vendor': ['A', 'B']})
+        right = pd.DataFrame({'SKU': ['SKU001', 'SKU-002'], 'GW': [1.0, 2.0]})
+        
+        result = guarded_join(left, right, on='SKU')
+        assert list(result['GW']) == [1.0, 2.0]
+        assert list(left['SKU']) == [' sku001', 'SKU–002']
+    
+    def test_normalize_series_matches_scalar(self):
+        """Series 정규화 = 스칼라 정규화 결과"""
+        from hvdc_code_utils import normalize_series, normalize_hvdc_code
+        s = pd.Series([' hvdc--adopt–he-0325 ', None, 'HVDC-ADOPT-HE-0325', ' sku 01', ' hvdc--adopt–he-0325 '],
+                      dtype=object)
+        assert normalize_series(s).tolist() == [normalize_hvdc_code(v) for v in s]
+        assert normalize_series(s, normalize_sku).tolist() == [normalize_sku(v) for v in s]
+    
+    def test_fuzzy_code_index_matches_brute_force(self):
+        """n-gram blocking 조회 = 전체 쌍별 유사도 Top-k"""
+        from difflib import SequenceMatcher
+        from hvdc_code_utils import FuzzyCodeIndex
+        codes = [f"HVDC-ADOPT-{v}-{i:04d}" for v in ("HE", "SIM", "SCT") for i in range(1, 120)]
+        index = FuzzyCodeIndex(codes)
+        for q in ("HVDC-ADOPT-HE-0325", "hvdc adopt sim 0017", "HVDC-ADOPT-SCT-17"):
+            nq = index.normalizer(q)
+            brute = sorted(((c, SequenceMatcher(None, c, nq).ratio()) for c in index.codes),
+                           key=lambda x: (-x[1], x[0]))
+            expected = [x for x in brute if x[1] >= 0.9][:3]
+            assert index.query(q, top_k=3, threshold=0.9, max_candidates=len(codes)) == expected
+    
+    def test_expand_code_frame(self):
+        """결합 코드 확장 → (raw_code, full_code) 프레임"""
+        from hvdc_code_utils import expand_code_frame
+        raw = pd.Series(['HVDC-ADOPT-HE-0087,90', 'HVDC-ADOPT-SIM-0325-1,26', None,
+                         'HVDC-ADOPT-HE-0087,90', 'HVDC-ADOPT-HE-0001'])
+        frame = expand_code_frame(raw)
+        assert frame.groupby('raw_code', sort=False)['full_code'].agg(list).to_dict() == {
+            'HVDC-ADOPT-HE-0087,90': ['HVDC-ADOPT-HE-0087', 'HVDC-ADOPT-HE-0090'],
+            'HVDC-ADOPT-SIM-0325-1,26': ['HVDC-ADOPT-SIM-0325-1', 'HVDC-ADOPT-SIM-0325-0026'],
+            'HVDC-ADOPT-HE-0001': ['HVDC-ADOPT-HE-0001'],
+        }
+
+    def test_expand_rules_keep_baseline(self):
+        """인보이스(0-패딩 치환) / 브릿지(앞 2자리 유지) 확장 규칙은 각각 기존 동작 유지"""
+        from hvdc_code_utils import expand_combined_code, expand_code_frame, expand_numeric_code
+        assert expand_combined_code('HVDC-ADOPT-HE-0325,26') == ('HVDC-ADOPT-HE-0325', 'HVDC-ADOPT-HE-0026')
+        assert expand_combined_code('HVDC-ADOPT-HE-0087,195,0090-2') == (
+            'HVDC-ADOPT-HE-0087', 'HVDC-ADOPT-HE-0195', 'HVDC-ADOPT-HE-0090-2')
+        assert expand_numeric_code('0325,26') == ('0325', '0326')
+        assert expand_numeric_code('87,195,5') == ('0087', '0195')
+        frame = expand_code_frame(pd.Series(['5625,24', '0087']), expand=expand_numeric_code)
+        assert frame['full_code'].tolist() == ['5625', '5624', '0087']
 
 # =============================================================================
 # Flow 전이 검증 테스트
@@ -130,6 +186,33 @@ class TestFlowTransitions:
         assert 'SKU001' in illegal_flows.values
         assert 'SKU002' in illegal_flows.values
 
+# =============================================================================
+# 증분 허브 빌드(UPSERT) 테스트
+# =============================================================================
+
+class TestIncrementalUpsert:
+    """SKU 키 기반 증분 UPSERT 테스트"""
+    
+    def test_upsert_counts_and_key_update(self, sample_sku_data, tmp_path):
+        """신규/변경/불변 집계, 변경 행은 SKU 기준으로 덮어씀 (행 누적 없음)"""
+        import duckdb
+        db = str(tmp_path / "hub.duckdb")
+        hub = sample_sku_data.copy()
+        
+        assert upsert_sku_master(hub, db) == {"inserted": 5, "updated": 0, "unchanged": 0, "skipped": 0}
+        assert upsert_sku_master(hub, db)["unchanged"] == 5
+        
+        hub.loc[1, 'GW'] = 999.0
+        new_row = pd.DataFrame({'SKU': ['SKU006'], 'Vendor': ['SIEMENS'], 'GW': [1.0], 'CBM': [0.1],
+                                'Final_Location': ['MIR']})
+        stats = upsert_sku_master(pd.concat([hub, new_row], ignore_index=True), db)
+        assert (stats["inserted"], stats["updated"], stats["unchanged"]) == (1, 1, 4)
+        
+        con = duckdb.connect(db)
+        rows = con.execute("SELECT count(*), max(GW) FILTER (WHERE SKU = 'sku-002') FROM sku_master").fetchone()
+        con.close()
+        assert rows == (6, 999.0)
+
 # =============================================================================
 # 톨러런스 프로파일 테스트
 # =============================================================================
@@ -202,6 +285,38 @@ class TestAlternativeSuggestions:
         # k가 데이터 크기보다 클 때도 처리되어야 함
         assert len(alternatives) <= 3
 
+    def test_topn_alternatives_matches_full_enumeration(self, sample_units_data):
+        """가지치기 탐색 결과가 전수 열거 Top-N과 동일한지 테스트"""
+        from itertools import combinations
+        gw = sample_units_data['G.W(kgs)'].values
+        cbm = sample_units_data['CBM'].values
+        expected = []
+        for r in range(2, 7):
+            for comb in combinations(range(len(gw)), r):
+                gw_s = float(gw[list(comb)].sum())
+                cbm_s = float(cbm[list(comb)].sum())
+                expected.append((abs(gw_s - 155) + abs(cbm_s - 1.55), list(comb)))
+        expected.sort(key=lambda x: x[0])
+
+        alternatives = topn_alternatives(sample_units_data, k=4, gw_tgt=155, cbm_tgt=1.55, n=5)
+        assert [alt['pick'] for alt in alternatives] == [pick for _, pick in expected[:5]]
+
+    def test_topn_alternatives_no_unit_cap(self):
+        """22개 이후 유닛도 탐색 대상인지 테스트"""
+        units = pd.DataFrame({
+            'G.W(kgs)': [500.0] * 25 + [12.5, 17.5] + [500.0] * 3,
+            'CBM': [9.0] * 25 + [0.12, 0.18] + [9.0] * 3
+        })
+        alternatives = topn_alternatives(units, k=2, gw_tgt=30, cbm_tgt=0.3, n=1)
+        assert alternatives[0]['pick'] == [25, 26]
+        assert alternatives[0]['err'] == pytest.approx(0.0)
+
+    def test_topn_alternatives_zero_k(self, sample_units_data):
+        """k=0 (Pkg 0 입력)도 크기 1..2 조합을 제안 (0 나눗셈 없음)"""
+        alternatives = topn_alternatives(sample_units_data, k=0, gw_tgt=30, cbm_tgt=0.3, n=2)
+        assert [alt['pick'] for alt in alternatives] == [[2], [0, 1]]
+        assert topn_alternatives(sample_units_data, k=-3, gw_tgt=30, cbm_tgt=0.3) == []
+
 # =============================================================================
 # 일자별 점유 테스트
 # =============================================================================
@@ -344,6 +459,503 @@ class TestSKUMasterQuality:
         assert results['sku_integrity'] == False  # 중복 있음
         assert results['location_coverage'] < 1.0  # 완전성 부족
 
+# =============================================================================
+# 인보이스 부분집합 매칭 (invoice_matching.py) 테스트
+# =============================================================================
+
+class TestInvoiceMatching:
+    """인보이스 부분집합 매칭 엔진 테스트"""
+
+    def test_presolve_prunes_units(self):
+        """presolve로 제거된 unit은 선택되지 않고, picked는 원래 unit 위치 기준"""
+        from invoice_matching import solve_exploded_units
+        gw = np.array([900.0, 10.0, 20.0, 950.0, 30.0, 40.0, 50.0, 990.0, 60.0])
+        cbm = np.array([9.0, 0.1, 0.2, 9.5, 0.3, 0.4, 0.5, 9.9, 0.6])
+        result = solve_exploded_units(gw, cbm, 2, 70.0, 0.7, max_exact_n=3)
+        assert result['found']
+        assert not set(result['picked']) & {0, 3, 7}
+        assert gw[result['picked']].sum() == pytest.approx(result['sum_gw'])
+
+    def test_presolve_switches_to_exact(self):
+        """pruning 후 N이 max_exact_n 이하가 되면 exact로 전환"""
+        from invoice_matching import solve_exploded_units
+        gw = np.r_[np.full(20, 500.0), [12.0, 18.0, 25.0]]
+        cbm = np.r_[np.full(20, 5.0), [0.12, 0.18, 0.25]]
+        result = solve_exploded_units(gw, cbm, 2, 30.0, 0.3)
+        assert result['method'] == 'exact-exploded'
+        assert sorted(result['picked']) == [20, 21]
+        assert solve_exploded_units(gw, cbm, 2, 30.0, 0.3, presolve=False)['method'] != 'exact-exploded'
+
+    def test_presolve_infeasible_keeps_error(self):
+        """해 없음이 증명돼도 FAIL 순위용 오차는 presolve=False 이하 (전체 풀의 최소 오차 조합)"""
+        from invoice_matching import solve_exploded_units, find_subset_match
+        gw = np.array([100.0, 120.0, 130.0, 140.0])
+        cbm = np.array([1.0, 1.2, 1.3, 1.4])
+        result = solve_exploded_units(gw, cbm, 3, 50.0, 0.5)
+        assert result['method'] == 'infeasible-bound-exploded'
+        assert not result['found']
+        assert sorted(result['picked']) == [0, 1, 2]
+        assert result['error'] == pytest.approx(gw[result['picked']].sum() - 50.0 + cbm[result['picked']].sum() - 0.5)
+
+        rng = np.random.default_rng(7)
+        for n, k, gw_tgt, cbm_tgt in ((12, 4, 40.0, 0.4), (60, 5, 2000.0, 20.0), (60, 5, 10.0, 0.1)):
+            gw = rng.uniform(50.0, 150.0, n)
+            cbm = gw / 100.0 * rng.uniform(0.8, 1.2, n)
+            result = solve_exploded_units(gw, cbm, k, gw_tgt, cbm_tgt, max_exact_n=12)
+            baseline = solve_exploded_units(gw, cbm, k, gw_tgt, cbm_tgt, max_exact_n=12, presolve=False)
+            assert result['method'] == 'infeasible-bound-exploded'
+            assert result['error'] <= baseline['error'] + 1e-9
+
+            df = pd.DataFrame({'G.W(kgs)': gw, 'CBM': cbm}, index=np.arange(n) + 100)
+            result = find_subset_match(df, k, gw_tgt, cbm_tgt, max_exact_n=12, presolve=True)
+            baseline = find_subset_match(df, k, gw_tgt, cbm_tgt, max_exact_n=12)
+            assert result['method'] == 'infeasible-bound'
+            assert set(result['picked']) <= set(df.index)
+            assert result['error'] <= baseline['error'] + 1e-9
+
+    def test_match_budget_expiry(self):
+        """평가 횟수 / wall-clock 예산 소진 후 계속 소진 상태, solver는 best-so-far 반환"""
+        from invoice_matching import MatchBudget, solve_exploded_units
+        budget = MatchBudget(max_evals=3)
+        assert [budget.spend() for _ in range(4)] == [False, False, False, True]
+        assert budget.spend() and budget.exhausted
+
+        budget = MatchBudget(time_limit=0.0)
+        time.sleep(0.01)
+        assert budget.spend() and budget.exhausted
+        assert MatchBudget().spend(10 ** 9) == False
+
+        rng = np.random.default_rng(3)
+        gw, cbm = rng.uniform(10, 100, 14), rng.uniform(0.1, 1.0, 14)
+        result = solve_exploded_units(gw, cbm, 5, 1.0, 0.01, max_evals=50, presolve=False)
+        assert result['budget_exhausted'] and not result['found']
+        assert len(result['picked']) == 5
+        assert result['sum_gw'] == pytest.approx(gw[result['picked']].sum())
+
+    def test_run_match_tasks_serial_equals_parallel(self):
+        """프로세스 풀 실행 결과 = 직렬 실행 결과 (입력 순서 유지)"""
+        from invoice_matching import run_match_tasks
+        rng = np.random.default_rng(11)
+        tasks = []
+        for i in range(6):
+            n = 8 + 3 * i
+            gw, cbm = rng.uniform(10, 100, n), rng.uniform(0.1, 1.0, n)
+            k = 3 + i % 3
+            pick = rng.choice(n, size=k, replace=False)
+            tasks.append((gw, cbm, k, float(gw[pick].sum()) + (5.0 if i % 2 else 0.0), float(cbm[pick].sum()),
+                          0.10, 12, 20000))
+        serial = run_match_tasks(tasks, workers=0)
+        parallel = run_match_tasks(tasks, workers=2, chunksize=2)
+        assert parallel == serial
+        assert {r['found'] for r in serial} == {True, False}
+
+    def test_match_cache_roundtrip(self, tmp_path, monkeypatch):
+        """캐시 저장/재조회 = solve 결과, 예산 소진 결과는 저장 안 함, SOLVER_VERSION 변경 시 무효화"""
+        import invoice_matching
+        from invoice_matching import MatchCache, run_match_tasks, task_key
+        gw, cbm = np.array([10.0, 20.0, 30.0, 40.0]), np.array([0.1, 0.2, 0.3, 0.4])
+        solved_task = (gw, cbm, 2, 50.0, 0.5, 0.10, 12, None)
+        exhausted_task = (gw * 3, cbm, 2, 100.0, 0.5, 0.10, 12, 1)
+        db = tmp_path / "cache.duckdb"
+
+        cache = MatchCache(db)
+        first = run_match_tasks([solved_task, exhausted_task], cache=cache)
+        assert first[1]['budget_exhausted']
+        cache.close()
+
+        cache = MatchCache(db)
+        stored = cache.get_many([task_key(solved_task), task_key(exhausted_task)])
+        assert list(stored) == [task_key(solved_task)]
+        assert {k: stored[task_key(solved_task)][k] for k in ('found', 'picked', 'sum_gw', 'sum_cbm', 'error')} == \
+            {k: first[0][k] for k in ('found', 'picked', 'sum_gw', 'sum_cbm', 'error')}
+        assert run_match_tasks([solved_task], cache=cache)[0]['picked'] == first[0]['picked']
+        assert cache.hits == 2
+
+        monkeypatch.setattr(invoice_matching, "SOLVER_VERSION", invoice_matching.SOLVER_VERSION + "-next")
+        assert cache.get_many([task_key(solved_task)]) == {}
+        cache.close()
+
+    def test_revalidation_store_roundtrip(self, tmp_path):
+        """지문이 같은 코드만 저장 결과 재사용, 인보이스/후보/파라미터 변경 시 지문이 바뀜"""
+        from invoice_matching import RevalidationStore, code_fingerprint
+        inv = pd.DataFrame({'HVDC CODE': ['HVDC-ADOPT-HE-0001'], 'No. of Pkgs': [2], 'Weight (kg)': [30.0]})
+        cand = pd.DataFrame({'G.W(kgs)': [10.0, 20.0], 'CBM': [0.1, 0.2]}, index=[5, 9])
+        fp = code_fingerprint(inv, cand, params=(0.10,))
+        assert fp == code_fingerprint(inv.copy(), cand.copy(), params=(0.10,))
+        changed = [
+            code_fingerprint(inv.assign(**{'Weight (kg)': [31.0]}), cand, params=(0.10,)),
+            code_fingerprint(inv, cand.assign(CBM=[0.1, 0.3]), params=(0.10,)),
+            code_fingerprint(inv, cand.set_axis([5, 10]), params=(0.10,)),
+            code_fingerprint(inv, cand, params=(0.20,)),
+        ]
+        assert fp not in changed and len(set(changed)) == len(changed)
+
+        db = tmp_path / "state.duckdb"
+        store = RevalidationStore(db)
+        row = {'Invoice_RAW_CODE': 'HVDC-ADOPT-HE-0001', 'Err_GW': np.float64(0.0), 'Picked_Count': np.int64(2)}
+        picks = {'Original_Row_Idx': [5, 9], 'Unit_GW': [10.0, 20.0]}
+        store.put_many([('HVDC-ADOPT-HE-0001', fp, row, picks)])
+        store.close()
+
+        store = RevalidationStore(db)
+        assert store.get_many({'HVDC-ADOPT-HE-0001': fp}) == {'HVDC-ADOPT-HE-0001': (
+            {'Invoice_RAW_CODE': 'HVDC-ADOPT-HE-0001', 'Err_GW': 0.0, 'Picked_Count': 2}, picks)}
+        assert store.get_many({'HVDC-ADOPT-HE-0001': changed[0], 'HVDC-ADOPT-HE-0002': fp}) == {}
+        store.close()
+
+    def test_explode_by_pkg_matches_row_loop(self):
+        """벡터화 explode_by_pkg = 행 단위 루프 결과 (Pkg 절사, 0 이하 제외, 원래 index 유지)"""
+        from invoice_matching import explode_by_pkg
+        df = pd.DataFrame({'Pkg': [2, 0, 3.7, -1, 1], 'G.W(kgs)': [100.0, 50.0, 90.0, 10.0, 7.5],
+                           'CBM': [1.0, 0.5, 0.9, 0.1, 0.05]}, index=[10, 11, 12, 13, 14])
+        expected = []
+        for idx, row in df.iterrows():
+            pkg_count = int(row['Pkg'])
+            for unit in range(pkg_count if pkg_count > 0 else 0):
+                expected.append({'Original_Index': idx, 'Pkg_Unit': unit + 1, 'Pkg': 1,
+                                 'G.W(kgs)': row['G.W(kgs)'] / pkg_count, 'CBM': row['CBM'] / pkg_count})
+        pd.testing.assert_frame_equal(explode_by_pkg(df), pd.DataFrame(expected), check_dtype=False)
+        assert explode_by_pkg(df.iloc[:0]).empty
+
+    def test_multistart_deterministic_for_seed(self):
+        """같은 seed면 직렬 multi-start 결과가 항상 같고, 평가 예산 기준 단일 실행보다 나쁘지 않음"""
+        from invoice_matching import MatchBudget, multistart_local_search, robust_greedy_local, total_error
+        rng = np.random.default_rng(5)
+        gw, cbm = rng.uniform(10, 100, 40), rng.uniform(0.1, 1.0, 40)
+        args = (gw, cbm, 7, 333.3, 3.21)
+
+        first = multistart_local_search(*args, restarts=6, seed=42, max_evals=3000)
+        assert first == multistart_local_search(*args, restarts=6, seed=42, max_evals=3000)
+        assert first['seed'] == 42 + first['restart']
+        assert len(first['picked']) == 7 and len(set(first['picked'])) == 7
+
+        # 도달 불가 목표: 모든 restart 실행, restart 0이 단일 실행과 같은 예산을 받으므로 오차 ≤ 단일 실행
+        unreachable = (gw, cbm, 7, 333.3, 9.0)
+        best = multistart_local_search(*unreachable, restarts=6, seed=42, max_evals=3000)
+        assert not best['found'] and best['restarts_run'] == 6
+        _, _, sum_gw, sum_cbm = robust_greedy_local(*unreachable, budget=MatchBudget(3000))
+        assert best['error'] <= total_error(sum_gw, sum_cbm, 333.3, 9.0) + 1e-9
+
+# =============================================================================
+# 인보이스 검증 스크립트 (hvdc wh invoice (1).py) 테스트
+# =============================================================================
+
+@pytest.fixture
+def invoice_module():
+    """hvdc wh invoice (1).py 모듈 (파일명에 공백이 있어 경로로 로드)"""
+    import importlib.util
+    spec = importlib.util.spec_from_file_location(
+        "hvdc_invoice", os.path.join(os.path.dirname(os.path.abspath(__file__)), "hvdc wh invoice (1).py"))
+    invoice = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(invoice)
+    return invoice
+
+class TestInvoicePipeline:
+    """인보이스 코드 파트 추출 / 스트리밍 실행 테스트"""
+
+    def test_extract_parts_matches_scalar(self, invoice_module):
+        """벡터화 코드 파트 추출 = 행 단위 split_hvdc_code 결과"""
+        codes = ['HVDC-ADOPT-HE-0325-1', ' hvdc–adopt-sim-0017 ', 'HVDC--ADOPT-SCT-0001', '-HVDC-ADOPT-XX-2-',
+                 None, 12345, 'HVDC-ADOPT-HE-0325-1', '']
+        split = invoice_module.split_hvdc_codes(pd.Series(codes, index=range(100, 108), dtype=object))
+        assert split.index.tolist() == list(range(100, 108))
+        assert split.values.tolist() == [invoice_module.split_hvdc_code(c) for c in codes]
+
+        df = pd.DataFrame({'HVDC CODE': codes, 'HVDC CODE 3': [None, 'he', None, None, None, None, None, None],
+                           'Location': ['DSV Indoor', 'MOSB', None, 'AGI', 'DSV Outdoor', 'X', 'DSV Indoor', '']})
+        result = invoice_module.extract_parts(df.copy())
+        parts = [f'HVDC CODE {i}' for i in range(1, 6)]
+        for pos, (code, preset) in enumerate(zip(codes, df['HVDC CODE 3'])):
+            expected = invoice_module.split_hvdc_code(code)
+            if not pd.isna(preset):
+                expected[2] = preset
+            expected = [None if v is None else str(v).strip().upper() for v in expected]
+            assert [None if pd.isna(v) else v for v in result.loc[pos, parts]] == [v or None for v in expected]
+            assert result.loc[pos, 'HVDC CODE 3_VALID'] == invoice_module.is_valid_hvdc_vendor(
+                result.loc[pos, 'HVDC CODE 3'], extended_mode=True)
+        assert result['WAREHOUSE_TYPE'].astype(object).tolist() == [
+            invoice_module.classify_warehouse_type(v) for v in df['Location']]
+
+    def test_dashboard_sheet_joins(self, invoice_module):
+        """원본 순서 시트: 코드별 마지막 매칭 행 조인 + 미매칭 기본값, 예외 시트: 코드별 마지막 유효 날짜"""
+        df_match = pd.DataFrame({
+            'Invoice_RAW_CODE': ['A', 'B', 'A'], 'All_Pkgs(sum)': [3, 5, 4], 'Pkg_Status': ['PASS', 'FAIL', 'PASS'],
+            'GW_SumPicked': [1.0, 2.0, 3.0], 'CBM_SumPicked': [0.1, 0.2, 0.3], 'Err_GW': [0.0, 5.0, 0.0],
+            'Err_CBM': [0.0, 0.5, 0.0], 'GW_Match(±0.10)': ['PASS', 'FAIL', 'PASS'],
+            'CBM_Match(±0.10)': ['PASS', 'FAIL', 'PASS'], 'Match_Status': ['PASS', 'FAIL', 'PASS'],
+            'Method': ['exact', 'greedy', 'exact-exploded'], 'Picked_Count': [1, 2, 3],
+        })
+        df_inv = pd.DataFrame({'REV NO': [3, 1, 2, 4], 'HVDC CODE': ['B', 'A', 'C', 'B'],
+                               'Operation Date': ['2024-01-02', '2024-01-01', None, '']})
+
+        sheet = invoice_module.create_invoice_original_order_sheet(df_match, df_inv)
+        assert sheet['REV NO'].tolist() == [1, 2, 3, 4]
+        assert sheet['Method'].tolist() == ['exact-exploded', 'NO_MATCH', 'greedy', 'greedy']
+        assert sheet['Picked_Count'].tolist() == [3, 0, 2, 2]
+        assert sheet['Candidate_Units'].tolist() == sheet['All_Pkgs(sum)'].tolist() == [4, 0, 5, 5]
+        assert pd.isna(sheet.loc[sheet['HVDC CODE'] == 'C', 'GW_SumPicked']).all()
+
+        exceptions = invoice_module.create_exceptions_only(df_match.copy(), df_inv)
+        assert exceptions['Invoice_RAW_CODE'].tolist() == ['B']
+        assert exceptions['Operation Date'].tolist() == ['2024-01-02']
+
+    def test_stream_resume_equals_full_run(self, invoice_module, tmp_path, monkeypatch):
+        """청크 커밋 후 중단 → 체크포인트에서 재개한 결과 = 중단 없는 전체 실행 결과"""
+        import duckdb
+        codes = [f'HVDC-ADOPT-HE-{i:04d}' for i in range(1, 6)]
+        all_rows = pd.DataFrame({
+            'HVDC CODE': [c for c in codes for _ in range(3)],
+            'Pkg': [1, 2, 1] * 5,
+            'G.W(kgs)': [10.0 + i for i in range(15)],
+            'CBM': [0.1 + i / 100 for i in range(15)],
+            'Location': ['DSV Indoor', 'MOSB', 'AGI'] * 5,
+        })
+        inv_rows = pd.DataFrame({
+            'REV NO': range(1, 6), 'HVDC CODE': codes, 'No. of Pkgs': [1, 2, 1, 3, 2],
+            'Weight (kg)': [10.0, 14.0, 16.0, 50.0, 99.0], 'CBM': [0.1, 0.14, 0.16, 0.5, 0.99],
+        })
+        all_rows.to_excel(tmp_path / 'all.xlsx', index=False)
+        inv_rows.to_excel(tmp_path / 'inv.xlsx', index=False)
+        df_inv, df_all = invoice_module.load_inputs(tmp_path / 'inv.xlsx', tmp_path / 'all.xlsx')
+        options = dict(chunk_codes=2, workers=0, cache_db=None, state_db=None)
+
+        full = invoice_module.stream_invoice_codes(df_inv, df_all, tmp_path / 'full',
+                                                   duckdb_path=tmp_path / 'full.duckdb', **options)
+        assert len(full[0]) == 5 and not full[1].empty
+        assert full[0]['Picked_List'].str.fullmatch(r'(Unit_\d+\|GW=[\d.]+\|CBM=[\d.]+(; )?)*').all()
+        assert (full[0]['Picked_List'].str.count('Unit_') == full[0]['Picked_Count']).all()
+
+        match_codes = invoice_module.match_invoice_codes
+        calls, fail_on = [], [2]
+        def interrupted(*args, **kwargs):
+            calls.append(kwargs['codes'])
+            if len(calls) in fail_on:
+                raise RuntimeError("interrupted")
+            return match_codes(*args, **kwargs)
+        monkeypatch.setattr(invoice_module, 'match_invoice_codes', interrupted)
+        with pytest.raises(RuntimeError, match="interrupted"):
+            invoice_module.stream_invoice_codes(df_inv, df_all, tmp_path / 'resumed',
+                                                duckdb_path=tmp_path / 'resumed.duckdb', **options)
+        assert json.loads((tmp_path / 'resumed' / 'checkpoint.json').read_text())['chunks_done'] == 1
+
+        calls.clear()
+        fail_on.clear()
+        resumed = invoice_module.stream_invoice_codes(df_inv, df_all, tmp_path / 'resumed',
+                                                      duckdb_path=tmp_path / 'resumed.duckdb', **options)
+        assert calls == [codes[2:4], codes[4:]]
+        for got, expected in zip(resumed, full):
+            pd.testing.assert_frame_equal(got, expected)
+
+        query = 'SELECT * EXCLUDE (_chunk) FROM invoice_match ORDER BY _chunk, "Invoice_RAW_CODE"'
+        with duckdb.connect(str(tmp_path / 'full.duckdb')) as a, duckdb.connect(str(tmp_path / 'resumed.duckdb')) as b:
+            pd.testing.assert_frame_equal(b.execute(query).df(), a.execute(query).df())
+            types = {name: kind for name, kind, *_ in b.execute('DESCRIBE invoice_match').fetchall()}
+            assert types['Restart_Seed'] == 'BIGINT' and types['Err_GW'] == 'DOUBLE'
+            assert types['Picked_List'] == 'VARCHAR'
+
+# =============================================================================
+# 재고 추적 (stock (1).py) 테스트
+# =============================================================================
+
+@pytest.fixture
+def stock_module():
+    """stock (1).py 모듈 (파일명에 공백이 있어 경로로 로드)"""
+    import importlib.util
+    spec = importlib.util.spec_from_file_location(
+        "stock", os.path.join(os.path.dirname(os.path.abspath(__file__)), "stock (1).py"))
+    stock = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(stock)
+    return stock
+
+@pytest.fixture
+def inventory_tracker(stock_module):
+    """InventoryTracker 인스턴스 (파일 로드 없음)"""
+    return stock_module.InventoryTracker("unused.xlsx")
+
+class TestInventoryTracker:
+    """재고 추적 날짜 정규화 / 중복 제거 테스트"""
+    
+    def test_normalize_dates_rules(self, inventory_tracker):
+        """일괄 날짜 정규화: 단축 형식, 알려진 형식, 범용 파서, 결측"""
+        values = pd.Series(['16-Feb', ' 3-mar ', '31-Feb', '2024-06-01 10:30:00', 'June 5, 2024',
+                            datetime(2024, 3, 5, 10, 1), None, '', 'garbage', '16-Feb'], dtype=object)
+        result = inventory_tracker.normalize_dates(values)
+        
+        assert str(result.dtype).startswith('datetime64')
+        expected = ['2024-02-16', '2024-03-03', None, '2024-06-01', '2024-06-05',
+                    '2024-03-05', None, None, None, '2024-02-16']
+        assert [d.strftime('%Y-%m-%d') if pd.notna(d) else None for d in result] == expected
+        assert inventory_tracker.normalize_date('16-Feb', current_year=2023) == '2023-02-16'
+    
+    def test_general_sheet_dedup(self, inventory_tracker):
+        """일반 시트: 시트 내/시트 간 중복은 한 번만 기록"""
+        df = pd.DataFrame({
+            'A': [0] * 4, 'CASE': ['C1', 'C1', 'C2', None], 'C': [0] * 4, 'LOC': ['DSV', 'DSV', 'MOSB', 'X'],
+            'E': [0] * 4, 'F': [0] * 4, 'G': [0] * 4, 'DATE': ['16-Feb', '2024-02-16', '17-Feb', '18-Feb']
+        })
+        
+        assert inventory_tracker.process_general_sheet(df, 'Stock_0216') == 2
+        assert inventory_tracker.process_general_sheet(df, 'Stock_0217') == 0
+        assert inventory_tracker.process_general_sheet(df, 'DISPATCH') == 2
+        assert inventory_tracker.case_data['C1'] == [('2024-02-16', 'DSV')]
+        assert inventory_tracker.out_data['C2'] == [('2024-02-17', 'MOSB')]
+    
+    def test_create_summary_cache_invalidation(self, inventory_tracker):
+        """요약 캐시: 새 데이터 추가 / 전역 최신 날짜 변경 시 다시 계산"""
+        df = pd.DataFrame({
+            'A': [0, 0], 'CASE': ['C1', 'C2'], 'C': [0, 0], 'LOC': ['DSV', 'MOSB'],
+            'E': [0, 0], 'F': [0, 0], 'G': [0, 0], 'DATE': ['16-Feb', '17-Feb']
+        })
+        inventory_tracker.process_general_sheet(df, 'Stock')
+        inventory_tracker.calculate_global_max_date()
+        summary = inventory_tracker.create_summary()
+        assert summary['Status'].tolist() == ['OUT (absent in latest snapshot)', 'IN']
+        assert summary['Note'].iloc[0] == 'LastSeen: 2024-02-16 ; GlobalLatest: 2024-02-17'
+        
+        inventory_tracker.process_general_sheet(df.iloc[[1]], 'DISPATCH')
+        summary = inventory_tracker.create_summary()
+        assert summary['Status'].tolist() == ['OUT (absent in latest snapshot)', 'OUT (by OUTsheet)']
+        assert summary['Note'].iloc[1] == 'OutDates: 2024-02-17'
+        
+        inventory_tracker.global_max_date = None
+        assert inventory_tracker.create_summary()['Status'].iloc[0] == 'IN'
+    
+    def test_event_store_parquet_roundtrip(self, inventory_tracker, tmp_path):
+        """이벤트 테이블: 컬럼 타입 유지 Parquet 저장/로드, 로드 후 중복 키 유지"""
+        df = pd.DataFrame({
+            'A': [0, 0], 'CASE': ['C1', 'C2'], 'C': [0, 0], 'LOC': ['DSV', None],
+            'E': [0, 0], 'F': [0, 0], 'G': [0, 0], 'DATE': ['16-Feb', None]
+        })
+        inventory_tracker.process_general_sheet(df, 'DISPATCH')
+        events = inventory_tracker.entries
+        assert str(events['DATE'].dtype).startswith('datetime64')
+        assert events['CASE_NO'].dtype == 'category' and events['DIRECTION'].tolist() == ['OUT', 'OUT']
+        
+        path = inventory_tracker.save_events(tmp_path / "events.parquet")
+        tracker = type(inventory_tracker)("unused.xlsx")
+        assert tracker.load_events(path) == 2
+        assert tracker.out_data == {'C1': [('2024-02-16', 'DSV')], 'C2': [('', '')]}
+        assert tracker.process_general_sheet(df, 'DISPATCH') == 0
+    
+    def test_history_store_snapshot_deltas(self, stock_module, tmp_path):
+        """스냅샷 이력: 직전 스냅샷 대비 신규/사라짐/위치 변경, First/Last Seen 증분 갱신"""
+        store = stock_module.StockHistoryStore(tmp_path / "history.duckdb")
+        day1 = pd.DataFrame({'CASE_NO': ['C1', 'C2', 'C3'], 'LOCATION': ['DSV', 'MOSB', 'DAS']})
+        day2 = pd.DataFrame({'CASE_NO': ['C2', 'C3', 'C4'], 'LOCATION': ['MOSB', 'DSV', 'DAS']})
+        
+        assert store.ingest(day1, '2024-06-01')['appeared'] == 3
+        result = store.ingest(day2, '2024-06-02')
+        assert (result['appeared'], result['disappeared'], result['moved']) == (1, 1, 1)
+        assert result['deltas'][['case_no', 'change']].values.tolist() == [
+            ['C4', 'APPEARED'], ['C1', 'DISAPPEARED'], ['C3', 'MOVED']]
+        with pytest.raises(ValueError):
+            store.ingest(day2, '2024-06-02')
+        
+        status = store.case_status().set_index('CASE_NO')
+        assert status.loc['C1', 'Status'] == 'OUT (absent in latest snapshot)'
+        assert str(status.loc['C3', 'First_Seen'].date()) == '2024-06-01'
+        assert str(status.loc['C3', 'Last_Seen'].date()) == '2024-06-02'
+        assert status.loc['C3', 'Last_Location'] == 'DSV'
+        store.close()
+
+    def test_sheet_cache_is_bounded(self, stock_module, tmp_path):
+        """시트 캐시: 최근 사용 워크북 N개만 유지, 재사용 시 다시 파싱하지 않음"""
+        paths = []
+        for i in range(stock_module.SHEET_CACHE_MAX_WORKBOOKS + 2):
+            path = tmp_path / f"stock_{i}.xlsx"
+            pd.DataFrame({'CASE': [f'C{i}'], 'DATE': ['16-Feb']}).to_excel(path, sheet_name='Stock', index=False)
+            paths.append(path)
+
+        first = stock_module.InventoryTracker(str(paths[0])).load_sheets(['Stock'])['Stock']
+        assert stock_module.InventoryTracker(str(paths[0])).load_sheets(['Stock'])['Stock'] is first
+        for path in paths[1:]:
+            stock_module.InventoryTracker(str(path)).load_sheets(['Stock'])
+
+        cached_paths = [key[0] for key in stock_module._SHEET_CACHE]
+        assert len(cached_paths) == stock_module.SHEET_CACHE_MAX_WORKBOOKS
+        assert cached_paths == [os.path.abspath(p) for p in paths[-stock_module.SHEET_CACHE_MAX_WORKBOOKS:]]
+        stock_module.clear_sheet_cache()
+
+# =============================================================================
+# 입력 워크북 메타데이터 검증 테스트
+# =============================================================================
+
+class TestWorkbookMeta:
+    """헤더 행만 읽는 단계별 입력 검증 테스트"""
+
+    def test_stage_headers_and_row_counts(self, tmp_path):
+        """헤더 정규화·필수 컬럼 누락·행 수가 pandas 기준과 일치"""
+        from hvdc_workbook_utils import read_workbook_meta, validate_stage_headers
+
+        vendor = tmp_path / "vendor.xlsx"
+        pd.DataFrame({"Case  No. ": ["A", "B", None], "DSV Indoor": [None, "2024-01-01", None],
+                      "Qty": [1, 2, None]}).to_excel(vendor, index=False)
+        check = validate_stage_headers(str(vendor), "reporter")
+        assert check["missing_columns"] == ["Pkg"]
+        assert check["headers_ok"] == False
+
+        meta = read_workbook_meta(str(vendor), count_rows=True)
+        stats = meta["sheets"][meta["sheet_names"][0]]
+        assert stats["rows"] == len(pd.read_excel(vendor))
+        assert stats["headers"] == ["Case No.", "DSV Indoor", "Qty"]
+
+        assert validate_stage_headers(str(tmp_path / "missing.xlsx"), "invoice")["headers_ok"] == False
+
+    def test_header_below_first_row(self, tmp_path):
+        """제목/빈 행 아래 헤더 - 첫 번째 비어 있지 않은 행을 헤더로 사용"""
+        from hvdc_workbook_utils import read_workbook_meta, validate_stage_headers
+
+        stock = tmp_path / "stock.xlsx"
+        with pd.ExcelWriter(stock) as writer:
+            summary = pd.DataFrame({"SKU": ["A", "B"], "Status": ["IN", "OUT"],
+                                    "Last_Seen": ["2024-06-01", "2024-06-02"], "Last_Location": ["DSV", None]})
+            summary.to_excel(writer, sheet_name="종합_SKU요약", index=False, startrow=2)
+            pd.DataFrame({"Date": ["2024-06-01"], "SKU_Count": [2]}).to_excel(
+                writer, sheet_name="날짜별_추이", index=False)
+
+        check = validate_stage_headers(str(stock), "stock")
+        assert check["missing_columns"] == []
+        assert check["headers_ok"] == True
+
+        for count_rows in (False, True):
+            stats = read_workbook_meta(str(stock), sheets=["종합_SKU요약"], count_rows=count_rows)["sheets"]["종합_SKU요약"]
+            assert stats["header_row"] == 3
+            assert stats["rows"] == 2
+            assert stats["columns_list"] == ["SKU", "Status", "Last_Seen", "Last_Location"]
+
+    def test_stock_validation_uses_dimension(self, tmp_path):
+        """Stock 검증은 시트 본문을 스트리밍하지 않음 - 행 수는 <dimension> 기준, 없으면 None"""
+        import importlib.util
+        import re
+        import zipfile
+
+        spec = importlib.util.spec_from_file_location("stock_adapter_v2", os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "adapters (1)", "stock_adapter_v2.py"))
+        adapter = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(adapter)
+
+        stock = tmp_path / "stock.xlsx"
+        with pd.ExcelWriter(stock) as writer:
+            pd.DataFrame({"SKU": ["A", "B", "C"], "Status": ["IN", "OUT", "IN"],
+                          "Last_Seen": ["2024-06-01"] * 3, "Last_Location": ["DSV"] * 3}).to_excel(
+                writer, sheet_name="종합_SKU요약", index=False)
+            pd.DataFrame({"Date": ["2024-06-01"], "SKU_Count": [3]}).to_excel(
+                writer, sheet_name="날짜별_추이", index=False)
+        result = adapter.validate_stock_data(str(stock))
+        assert result["validation_passed"] == True
+        assert result["sheet_stats"]["종합_SKU요약"]["rows"] == 3
+
+        no_dim = tmp_path / "no_dimension.xlsx"
+        with zipfile.ZipFile(stock) as src, zipfile.ZipFile(no_dim, "w") as dst:
+            for item in src.infolist():
+                data = src.read(item.filename)
+                if item.filename.startswith("xl/worksheets/"):
+                    data = re.sub(rb"<dimension[^>]*/>", b"", data)
+                dst.writestr(item, data)
+        result = adapter.validate_stock_data(str(no_dim))
+        assert result["validation_passed"] == True
+        assert result["sheet_stats"]["종합_SKU요약"]["rows"] is None
+
 # =============================================================================
 # 통합 테스트
 # =============================================================================